@@ -5,17 +5,115 @@ class Settings(BaseSettings):
     JWT_SECRET: str = "your-super-secret-jwt-key-change-this-in-production"
     JWT_ALGO: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    # Authenticated users are cached by id for this many seconds (0 disables)
+    PRINCIPAL_CACHE_TTL: float = 60.0
+    PRINCIPAL_CACHE_SIZE: int = 1024
+    # Threads that may hash/verify passwords at once
+    PASSWORD_HASH_WORKERS: int = 2
     DB_FILE: str = "./fraud_detection.db"
+    # SQLite engine tuning (see backend/db/session.py)
+    DB_POOL_SIZE: int = 8
+    DB_MAX_OVERFLOW: int = 8
+    DB_BUSY_TIMEOUT: float = 30.0
+    DB_CACHE_SIZE_KB: int = 65536
+    DB_STATEMENT_CACHE_SIZE: int = 256
+    DB_QUERY_CACHE_SIZE: int = 1000
+    # Rows per executemany call in bulk inserts
+    DB_BULK_BATCH_SIZE: int = 10000
     
     SMTP_SERVER: str = "smtp.gmail.com"
     SMTP_PORT: int = 587
     SMTP_USER: str = ""
     SMTP_PASSWORD: str = ""
     ADMIN_EMAIL: str = ""
+    SMTP_USE_TLS: bool = True
+    SMTP_TIMEOUT: float = 10.0
+    # Connections kept open (and sender threads) for alert delivery
+    SMTP_POOL_SIZE: int = 1
+    # Alerts queued within this many seconds of each other go out as one digest
+    NOTIFY_DIGEST_WINDOW: float = 5.0
+    NOTIFY_MAX_RETRIES: int = 5
+    NOTIFY_RETRY_BACKOFF: float = 1.0
     
+    # A .forest artifact (exported by ml_model/train_model.py) is memory-mapped and
+    # includes the scaler, so SCALER_PATH is then ignored
     MODEL_PATH: str = "ml_model/model.joblib"
     SCALER_PATH: str = "ml_model/scaler.joblib"
-    ALERT_THRESHOLD: float = 0.8
+    # Risk tiers by fraud_score (lower is more suspicious): below RISK_HIGH_THRESHOLD
+    # is high, below RISK_MEDIUM_THRESHOLD is medium, the rest is low
+    RISK_HIGH_THRESHOLD: float = -0.1
+    RISK_MEDIUM_THRESHOLD: float = 0.0
+    # Admin alerts list the flagged transactions scoring below this
+    ALERT_THRESHOLD: float = 0.0
+    # Features listed in each flagged row's top_features explanation (0 disables)
+    EXPLAIN_TOP_K: int = 3
+    USE_COMPILED_FOREST: bool = True
+    # Seconds between checks of MODEL_PATH/SCALER_PATH (and the .meta.json) for a new model
+    # (0 disables); a change is only loaded once the files have stopped changing for one interval
+    # and the .meta.json names the version of the files on disk
+    MODEL_WATCH_INTERVAL: float = 5.0
+    MODEL_REGISTRY_SIZE: int = 3
+    # Batches waiting for the shadow model; further batches are not shadow-scored until it catches up
+    SHADOW_QUEUE_SIZE: int = 4
+    ADMIN_USERS: str = ""
+    # Worker processes for scoring large batches (0 or 1 scores in-process)
+    SCORING_WORKERS: int = 0
+    PARALLEL_MIN_ROWS: int = 100000
+
+    # Drift monitoring of scored batches against the training data (0 rows disables)
+    DRIFT_WINDOW_ROWS: int = 100000
+    # Rows of each scored batch sampled into the drift sketches
+    DRIFT_SAMPLE_ROWS: int = 2000
+    # Histogram bins per feature and for fraud_score: equal-mass bins of the training
+    # data (recorded by train_model.py), else even bins over +-DRIFT_Z_RANGE training
+    # standard deviations and +-DRIFT_SCORE_RANGE
+    DRIFT_BINS: int = 20
+    DRIFT_Z_RANGE: float = 5.0
+    DRIFT_SCORE_RANGE: float = 0.5
+    # Alert when a feature's PSI or KS distance crosses these
+    DRIFT_PSI_THRESHOLD: float = 0.25
+    DRIFT_KS_THRESHOLD: float = 0.2
+    # /api/model/drift reports the window in progress once it holds this many rows
+    DRIFT_MIN_ROWS: int = 1000
+
+    CSV_CHUNK_SIZE: int = 50000
+    STREAM_TOP_K: int = 500
+    # Recent uploads served from memory when the same bytes are scored by the same model
+    UPLOAD_CACHE_SIZE: int = 32
+    # Scores of recently seen feature vectors, reused for overlapping uploads (0 disables)
+    ROW_CACHE_SIZE: int = 100000
+    # Per-scan score-ordered indexes (row ids sorted by fraud_score)
+    SCORE_INDEX_DIR: str = "score_index"
+
+    # Per-customer velocity features (vel_*), used when the model was trained with them.
+    # Windows in seconds of the Time column; each is tracked in VELOCITY_BUCKETS sub-buckets
+    VELOCITY_WINDOWS: str = "60,3600,86400"
+    VELOCITY_BUCKETS: int = 6
+    # First of these columns present identifies the customer
+    VELOCITY_KEY_COLUMNS: str = "Name,ID"
+    # Customers idle for longer than this (seconds of event time) are evicted
+    VELOCITY_TTL: float = 604800.0
+    VELOCITY_SNAPSHOT_PATH: str = "velocity_state.npz"
+    # Seconds between snapshots while scoring (0: only at shutdown)
+    VELOCITY_SNAPSHOT_INTERVAL: float = 300.0
+
+    # Background scan jobs (POST /api/fraud/jobs)
+    JOB_WORKERS: int = 2
+    JOB_MAX_QUEUED: int = 32
+    JOB_SPOOL_DIR: str = "job_spool"
+
+    SCORE_MAX_BATCH_SIZE: int = 64
+    SCORE_MAX_WAIT_MS: float = 2.0
+
+    AUDIT_FLUSH_INTERVAL: float = 1.0
+    AUDIT_BATCH_SIZE: int = 500
+    # Failed flushes keep their records queued; after this many in a row they are dropped
+    AUDIT_MAX_RETRIES: int = 5
+
+    # Allow ?profile=1 / "X-Profile: 1" to sample-profile a single request
+    ENABLE_PROFILING: bool = False
+    PROFILE_DIR: str = "profiles"
+    PROFILE_INTERVAL_MS: float = 5.0
 
     class Config:
         env_file = ".env"
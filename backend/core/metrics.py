@@ -0,0 +1,203 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets (seconds) shared by request and stage timings
+LATENCY_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in (labels or {}).items()))
+
+class Histogram:
+    """Cumulative histogram with fixed upper bounds; safe to observe from any thread."""
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float], labels: Labels = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets: List[float] = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict:
+        """Return cumulative bucket counts keyed by upper bound, plus count and sum."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets + [float("inf")], counts):
+            running += count
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+        return {"description": self.description, "buckets": cumulative, "count": running, "sum": total}
+
+class Counter:
+    """Monotonically increasing total."""
+
+    def __init__(self, name: str, description: str, labels: Labels = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+class Gauge:
+    """Current value, either set explicitly or read from a callback at export time."""
+
+    def __init__(self, name: str, description: str, labels: Labels = (), fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.fn = fn
+        self._value = 0.0
+
+    def set(self, value: float):
+        self._value = value
+
+    @property
+    def value(self) -> float:
+        if self.fn is not None:
+            try:
+                return float(self.fn())
+            except Exception:
+                return float("nan")
+        return self._value
+
+_histograms: Dict[str, Histogram] = {}
+_counters: Dict[Tuple[str, Labels], Counter] = {}
+_gauges: Dict[Tuple[str, Labels], Gauge] = {}
+_registry_lock = threading.Lock()
+
+def histogram(name: str, description: str, buckets: Sequence[float], labels: Optional[Dict[str, str]] = None) -> Histogram:
+    """Get or create the process-wide histogram with this name (and labels)."""
+    label_set = _labels(labels)
+    key = name if not label_set else f"{name}{{{','.join(f'{k}={v}' for k, v in label_set)}}}"
+    with _registry_lock:
+        if key not in _histograms:
+            _histograms[key] = Histogram(name, description, buckets, label_set)
+        return _histograms[key]
+
+def histograms() -> Dict[str, Histogram]:
+    with _registry_lock:
+        return dict(_histograms)
+
+def counter(name: str, description: str, labels: Optional[Dict[str, str]] = None) -> Counter:
+    key = (name, _labels(labels))
+    with _registry_lock:
+        if key not in _counters:
+            _counters[key] = Counter(name, description, key[1])
+        return _counters[key]
+
+def gauge(
+    name: str,
+    description: str,
+    labels: Optional[Dict[str, str]] = None,
+    fn: Optional[Callable[[], float]] = None,
+) -> Gauge:
+    """Get or create a gauge; fn, if given, is called for the value on every export."""
+    key = (name, _labels(labels))
+    with _registry_lock:
+        if key not in _gauges:
+            _gauges[key] = Gauge(name, description, key[1], fn)
+        elif fn is not None:
+            _gauges[key].fn = fn
+        return _gauges[key]
+
+# Stage spans
+
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+
+def start_request_spans() -> List[Tuple[str, float]]:
+    """Collect the spans of the current request (and of threads it hands work to)."""
+    spans: List[Tuple[str, float]] = []
+    _request_spans.set(spans)
+    return spans
+
+def record_stage(stage: str, elapsed: float, rows: Optional[int] = None):
+    """
+    Record one run of a pipeline stage into stage_duration_seconds{stage=...}.
+    With rows, also count stage_rows_total and keep the stage's last rows/sec.
+    """
+    labels = {"stage": stage}
+    histogram("stage_duration_seconds", "Time spent in each pipeline stage", LATENCY_BUCKETS, labels).observe(elapsed)
+    if rows is not None:
+        counter("stage_rows_total", "Rows processed by each pipeline stage", labels).inc(rows)
+        if elapsed > 0:
+            gauge("stage_rows_per_second", "Throughput of the most recent run of each stage", labels).set(rows / elapsed)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, elapsed))
+
+@contextmanager
+def span(stage: str, rows: Optional[int] = None) -> Iterator[None]:
+    """Time the enclosed block as one run of a pipeline stage (see record_stage)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start, rows)
+
+# Prometheus text exposition
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def render_prometheus() -> str:
+    """All registered metrics in the Prometheus text exposition format (version 0.0.4)."""
+    with _registry_lock:
+        hists = list(_histograms.values())
+        counters = list(_counters.values())
+        gauges = list(_gauges.values())
+
+    families: Dict[str, Tuple[str, str, List]] = {}
+    for metric, kind in [(m, "histogram") for m in hists] + [(m, "counter") for m in counters] + [(m, "gauge") for m in gauges]:
+        families.setdefault(metric.name, (kind, metric.description, []))[2].append(metric)
+
+    lines = []
+    for name in sorted(families):
+        kind, description, metrics = families[name]
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for metric in metrics:
+            if kind == "histogram":
+                snapshot = metric.snapshot()
+                for bound, count in snapshot["buckets"].items():
+                    lines.append(f"{name}_bucket{_format_labels(metric.labels, (('le', bound),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(metric.labels)} {_format_value(snapshot['sum'])}")
+                lines.append(f"{name}_count{_format_labels(metric.labels)} {snapshot['count']}")
+            else:
+                lines.append(f"{name}{_format_labels(metric.labels)} {_format_value(metric.value)}")
+    return "\n".join(lines) + "\n"
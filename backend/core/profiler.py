@@ -0,0 +1,71 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of every other thread at a fixed interval.
+
+    Meant for profiling one request: the handler may run on the event loop or
+    on a threadpool worker, so all threads are sampled and stacks that are just
+    waiting (idle pool workers, the event loop selector) are dropped. Samples
+    from concurrent requests are included too; profile on a quiet instance.
+    Results are written as collapsed stacks ("a;b;c count" lines), which
+    flamegraph.pl and speedscope read directly.
+    """
+
+    # Leaf frames of threads that are blocked rather than doing work
+    IDLE_FUNCTIONS = {"wait", "select", "_worker", "get", "accept", "poll", "sleep"}
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self.duration = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or frame.f_code.co_name in self.IDLE_FUNCTIONS:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def top_functions(self, n: int = 10) -> List[Tuple[str, int]]:
+        """Functions by the number of samples they were on the stack for (inclusive)."""
+        inclusive: Counter = Counter()
+        for stack, count in self.samples.items():
+            for function in set(stack.split(";")):
+                inclusive[function] += count
+        return inclusive.most_common(n)
+
+    def save(self, directory: str, label: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() else "_" for c in label).strip("_")
+        path = os.path.join(directory, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{safe_label}.folded")
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import jwt
 from passlib.context import CryptContext
@@ -5,12 +7,24 @@ from backend.core.config import settings
 
 _pwd_ctx = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
+# pbkdf2 releases the GIL, so a few threads are enough; the cap keeps a burst of
+# logins from taking every core away from scoring
+_hash_pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
 def hash_password(password: str) -> str:
     return _pwd_ctx.hash(password)
 
 def verify_password(password: str, hashed: str) -> bool:
     return _pwd_ctx.verify(password, hashed)
 
+async def hash_password_async(password: str) -> str:
+    """hash_password on the bounded hashing pool, without blocking the event loop."""
+    return await asyncio.wrap_future(_hash_pool.submit(hash_password, password))
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    """verify_password on the bounded hashing pool, without blocking the event loop."""
+    return await asyncio.wrap_future(_hash_pool.submit(verify_password, password, hashed))
+
 def create_access_token(sub: int | str, expires_minutes: int | None = None) -> str:
     if expires_minutes is None:
         expires_minutes = settings.ACCESS_TOKEN_EXPIRE_MINUTES
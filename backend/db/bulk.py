@@ -0,0 +1,31 @@
+from itertools import islice
+from typing import Iterable, Optional, Sequence
+from sqlalchemy import Table
+from sqlalchemy.orm import Session
+from backend.core.config import settings
+
+def bulk_insert(
+    db: Session,
+    table: Table,
+    columns: Sequence[str],
+    rows: Iterable[Sequence],
+    batch_size: Optional[int] = None,
+) -> int:
+    """
+    Insert rows (tuples of DBAPI-ready values in `columns` order) through one
+    prepared INSERT, batch_size rows per executemany call, inside the
+    session's transaction. Skips the ORM's per-row bookkeeping and type
+    processing, so values must already be plain ints, floats, str or bytes
+    (JSON columns as serialized text). Returns the number of rows written.
+    """
+    batch_size = batch_size or settings.DB_BULK_BATCH_SIZE
+    sql = f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    connection = db.connection()
+    written = 0
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return written
+        connection.exec_driver_sql(sql, batch)
+        written += len(batch)
@@ -1,11 +1,24 @@
-from sqlalchemy import create_engine
+from sqlalchemy import text
 from backend.db.base import Base
+from backend.db.session import engine
 from backend.core.config import settings
 
+# Import models so their tables are registered on Base.metadata
+from backend.models import user, scan, audit, stats, job  # noqa: F401
+
+# Indexes earlier versions created that nothing reads any more (each still cost every insert)
+OBSOLETE_INDEXES = [
+    "ix_scan_results_scan_flagged_score",
+    "ix_scan_results_fraud_score",
+    "ix_scan_results_flagged",
+]
+
 def create_tables():
     """Create all database tables."""
-    engine = create_engine(f"sqlite:///{settings.DB_FILE}", connect_args={"check_same_thread": False})
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for name in OBSOLETE_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
     print(f"Database tables created successfully in {settings.DB_FILE}")
 
 if __name__ == "__main__":
@@ -1,13 +1,70 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from backend.core.config import settings
 
-engine = create_engine(f"sqlite:///{settings.DB_FILE}", connect_args={"check_same_thread": False})
+def _apply_pragmas(dbapi_connection, connection_record):
+    """
+    Per-connection SQLite tuning. WAL lets readers run alongside the single
+    writer, and synchronous=NORMAL only fsyncs at checkpoints (still safe
+    against corruption in WAL mode; a power loss can drop the last commits).
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.DB_BUSY_TIMEOUT * 1000)}")
+    cursor.execute(f"PRAGMA cache_size=-{settings.DB_CACHE_SIZE_KB}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+def _connect_args() -> dict:
+    return {
+        "check_same_thread": False,
+        "timeout": settings.DB_BUSY_TIMEOUT,
+        # sqlite3's per-connection cache of prepared statements
+        "cached_statements": settings.DB_STATEMENT_CACHE_SIZE,
+    }
+
+def create_tuned_engine(db_file: str) -> Engine:
+    """A pooled SQLite engine with the pragmas above applied to every connection."""
+    tuned = create_engine(
+        f"sqlite:///{db_file}",
+        connect_args=_connect_args(),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        # SQLAlchemy's cache of compiled statements, shared by all connections
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+    )
+    event.listen(tuned, "connect", _apply_pragmas)
+    return tuned
+
+def create_tuned_async_engine(db_file: str) -> AsyncEngine:
+    """The aiosqlite counterpart of create_tuned_engine."""
+    tuned = create_async_engine(
+        f"sqlite+aiosqlite:///{db_file}",
+        connect_args=_connect_args(),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+    )
+    event.listen(tuned.sync_engine, "connect", _apply_pragmas)
+    return tuned
+
+# One engine per process for each access style; everything else imports these
+engine = create_tuned_engine(settings.DB_FILE)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_tuned_async_engine(settings.DB_FILE)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,15 +1,100 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from dotenv import load_dotenv
 from backend.routes.api_router import api_router
 from backend.core.config import settings
+from backend.core.metrics import LATENCY_BUCKETS, histogram, render_prometheus, start_request_spans
+from backend.core.profiler import SamplingProfiler
 from backend.db.init_db import create_tables
+from backend.services.audit_service import audit_logger
+from backend.services.batcher import score_batcher
+from backend.services.parallel_scoring import parallel_scorer
+from backend.services.model_registry import model_registry
+from backend.services.notifier import notification_dispatcher
+from backend.services.scan_jobs import scan_job_runner
+from backend.services.velocity import velocity_engine
 
 load_dotenv()
 
 create_tables()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    audit_logger.start()
+    notification_dispatcher.start()
+    # Load the model up front so the first request doesn't pay for it
+    try:
+        model_registry.active()
+    except Exception as e:
+        print(f"Model not loaded at startup: {e}")
+    model_registry.start_watcher()
+    # Per-customer velocity history from the last run
+    velocity_engine.load()
+    # Resume scan jobs interrupted by the last shutdown
+    scan_job_runner.start()
+    yield
+    # Running jobs stop after their current chunk and resume on the next start
+    scan_job_runner.stop()
+    model_registry.stop()
+    await score_batcher.stop()
+    parallel_scorer.shutdown()
+    if len(velocity_engine):
+        velocity_engine.save()
+    # Send queued alerts before the audit log is flushed
+    notification_dispatcher.stop()
+    # Flush buffered audit records before the process exits
+    audit_logger.stop()
+
 app = FastAPI(
-    title=settings.APP_NAME, description="Advanced Fraud Detection System with ML-powered anomaly detection")
+    title=settings.APP_NAME, description="Advanced Fraud Detection System with ML-powered anomaly detection",
+    lifespan=lifespan)
+
+def _route_template(request: Request) -> str:
+    """Full path template of the matched route, e.g. /api/fraud/notifications/{delivery_id}."""
+    route = request.scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    # Routes of included routers only know their own path; recover the prefix from the URL
+    concrete = template
+    for name, value in request.path_params.items():
+        concrete = concrete.replace("{" + name + "}", str(value)).replace("{" + name + ":path}", str(value))
+    path = request.url.path
+    return path[:-len(concrete)] + template if concrete and path.endswith(concrete) else template
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Time every request, report its stage spans in Server-Timing and optionally profile it."""
+    spans = start_request_spans()
+    profiler = None
+    if settings.ENABLE_PROFILING and "1" in (request.query_params.get("profile"), request.headers.get("x-profile")):
+        profiler = SamplingProfiler(settings.PROFILE_INTERVAL_MS / 1000)
+        profiler.start()
+
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        # Label by route template so path parameters don't explode the series count
+        labels = {"method": request.method, "path": _route_template(request), "status": str(status_code)}
+        histogram("http_request_duration_seconds", "HTTP request latency", LATENCY_BUCKETS, labels).observe(elapsed)
+        if profiler is not None:
+            profiler.stop()
+
+    timings = [f"{stage};dur={duration * 1000:.1f}" for stage, duration in spans]
+    response.headers["Server-Timing"] = ", ".join(timings + [f"total;dur={elapsed * 1000:.1f}"])
+    if profiler is not None:
+        path = profiler.save(settings.PROFILE_DIR, f"{request.method}{request.url.path}")
+        response.headers["X-Profile-File"] = path
+        print(f"Profiled {request.method} {request.url.path} ({sum(profiler.samples.values())} samples) -> {path}")
+        for function, count in profiler.top_functions():
+            print(f"  {count:6d}  {function}")
+    return response
 
 # Include API routes
 app.include_router(api_router)
@@ -20,6 +105,11 @@ def root():
         "message": f"{settings.APP_NAME} is running"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "service": settings.APP_NAME}
@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, DateTime, ForeignKey
+from backend.db.base import Base
+
+class ScanJob(Base):
+    """A background scan of a spooled upload; progress is committed with each chunk."""
+    __tablename__ = "scan_jobs"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    user_email: Mapped[str] = mapped_column(String, index=True, nullable=False)
+    status: Mapped[str] = mapped_column(String, default="queued", index=True, nullable=False)
+    filename: Mapped[str] = mapped_column(String, default="", nullable=False)
+    format: Mapped[str] = mapped_column(String, default="csv", nullable=False)
+    spool_path: Mapped[str] = mapped_column(String, nullable=False)
+    chunk_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    scan_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("scans.id"), nullable=True)
+    # Rows of the upload fully scored and stored; a resumed job continues from here
+    rows_processed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    flagged_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    chunks_completed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, DateTime, Float, Boolean, LargeBinary, JSON, ForeignKey
+from backend.db.base import Base
+
+class Scan(Base):
+    __tablename__ = "scans"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    user_email: Mapped[str] = mapped_column(String, index=True, nullable=False)
+    status: Mapped[str] = mapped_column(String, default="running", nullable=False)
+    model_version: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    feature_names: Mapped[list] = mapped_column(JSON, default=list, nullable=False)
+    total_transactions: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    flagged_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+class ScanResult(Base):
+    __tablename__ = "scan_results"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # Pages and threshold queries go through the scan's ScoreIndex, so rows are only ever looked up by scan
+    scan_id: Mapped[int] = mapped_column(Integer, ForeignKey("scans.id", ondelete="CASCADE"), index=True, nullable=False)
+    row_index: Mapped[int] = mapped_column(Integer, nullable=False)
+    fraud_score: Mapped[float] = mapped_column(Float, nullable=False)
+    flagged: Mapped[bool] = mapped_column(Boolean, nullable=False)
+    meta: Mapped[dict] = mapped_column(JSON, default=dict, nullable=False)
+    # Feature values as packed float64, in the order of Scan.feature_names
+    features: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
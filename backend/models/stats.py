@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, DateTime
+from backend.db.base import Base
+
+# Aggregate scopes: "global" (key ""), "user" (key = email) and "scan" (key = scan id)
+
+class ScoreAggregate(Base):
+    """Running totals of scored transactions for one scope/key."""
+    __tablename__ = "score_aggregates"
+
+    scope: Mapped[str] = mapped_column(String, primary_key=True)
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    total_transactions: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    flagged_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    scan_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_scan_time: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+class ScoreHistogramBucket(Base):
+    """Count of scored transactions whose fraud_score falls in one fixed bucket."""
+    __tablename__ = "score_histogram_buckets"
+
+    scope: Mapped[str] = mapped_column(String, primary_key=True)
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    bucket: Mapped[int] = mapped_column(Integer, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
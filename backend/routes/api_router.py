@@ -1,6 +1,8 @@
 from fastapi import APIRouter
-from backend.routes import transactions, auth
+from backend.routes import transactions, auth, models, jobs
 
 api_router = APIRouter(prefix="/api")
 api_router.include_router(transactions.router, prefix="/fraud", tags=["Fraud Detection"])
+api_router.include_router(models.router, prefix="/fraud", tags=["Model Registry"])
+api_router.include_router(jobs.router, prefix="/fraud", tags=["Scan Jobs"])
 api_router.include_router(auth.router, tags=["auth"])
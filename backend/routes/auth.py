@@ -1,30 +1,40 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from backend.db.session import get_db
+from backend.db.session import get_async_db
 from backend.models.user import User
 from backend.schemas.user import SignupRequest, SigninRequest, TokenResponse, UserRead
-from backend.core.security import hash_password, verify_password, create_access_token
+from backend.core.security import hash_password_async, verify_password_async, create_access_token
 from backend.routes.deps import get_current_user
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+async def _find_user(db: AsyncSession, email: str) -> User | None:
+    return (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
+
+async def _add_user(db: AsyncSession, user: User) -> User:
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+# signup/signin are async end to end: password hashing waits on the bounded
+# hashing pool and the DB calls go through the aiosqlite session, so neither
+# holds one of the threads that serve sync routes
 @router.post("/signup", response_model=TokenResponse)
-def signup(req: SignupRequest, db: Session = Depends(get_db)):
-    exists = db.execute(select(User).where(User.email == req.email)).scalar_one_or_none()
+async def signup(req: SignupRequest, db: AsyncSession = Depends(get_async_db)):
+    exists = await _find_user(db, req.email)
     if exists:
         raise HTTPException(status_code=400, detail="Email already registered")
-    user = User(email=req.email, password_hash=hash_password(req.password))
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    user = User(email=req.email, password_hash=await hash_password_async(req.password))
+    user = await _add_user(db, user)
     token = create_access_token(user.id)
     return TokenResponse(access_token=token)
 
 @router.post("/signin", response_model=TokenResponse)
-def signin(req: SigninRequest, db: Session = Depends(get_db)):
-    user = db.execute(select(User).where(User.email == req.email)).scalar_one_or_none()
-    if not user or not verify_password(req.password, user.password_hash):
+async def signin(req: SigninRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await _find_user(db, req.email)
+    if not user or not await verify_password_async(req.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     token = create_access_token(user.id)
     return TokenResponse(access_token=token)
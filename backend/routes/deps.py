@@ -1,15 +1,28 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from backend.db.session import get_db
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.core.cache import TTLCache
+from backend.db.session import get_async_db
+from backend.core.config import settings
 from backend.core.security import decode_token
 from backend.models.user import User
 
 _auth_scheme = HTTPBearer(auto_error=True)
 
-def get_current_user(
+# Detached User rows by id, so authenticated requests skip the users lookup
+principal_cache = TTLCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_principal(mapper, connection, target: User):
+    # Password changes and deletions must not outlive the cache; bulk query
+    # updates bypass ORM events and are only covered by the TTL
+    principal_cache.pop(target.id)
+
+async def get_current_user(
     creds: HTTPAuthorizationCredentials = Depends(_auth_scheme),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> User:
     token = creds.credentials
     try:
@@ -22,11 +35,31 @@ def get_current_user(
             detail="Invalid or expired token",
         )
 
-    user = db.get(User, user_id)
+    user = principal_cache.get(user_id)
     if user is None:
+        user = await db.get(User, user_id)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+            )
+        # Detach so the cached row can be shared across requests and sessions
+        db.expunge(user)
+        principal_cache.set(user_id, user)
+    return user
+
+def is_admin(user: User) -> bool:
+    """ADMIN_EMAIL and the comma-separated ADMIN_USERS are admins."""
+    admins = {email.strip() for email in settings.ADMIN_USERS.split(",") if email.strip()}
+    if settings.ADMIN_EMAIL:
+        admins.add(settings.ADMIN_EMAIL)
+    return user.email in admins
+
+def get_admin_user(user: User = Depends(get_current_user)) -> User:
+    """Allow only admins (see is_admin)."""
+    if not is_admin(user):
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
         )
     return user
-
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from backend.core.config import settings
+from backend.models.job import ScanJob
+from backend.schemas.job import ScanJobResponse
+from backend.services.ingest import detect_format
+from backend.services.scan_jobs import JobQueueFull, scan_job_runner
+from backend.routes.deps import get_current_user
+from backend.models.user import User
+
+router = APIRouter(prefix="/jobs")
+
+def _response(job: ScanJob, flagged=None) -> ScanJobResponse:
+    return ScanJobResponse(
+        job_id=job.id,
+        status=job.status,
+        filename=job.filename,
+        format=job.format,
+        scan_id=job.scan_id,
+        rows_processed=job.rows_processed,
+        flagged_count=job.flagged_count,
+        chunks_completed=job.chunks_completed,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        flagged=flagged,
+    )
+
+@router.post("", response_model=ScanJobResponse, status_code=202)
+def create_job(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+    """
+    Spool an upload (CSV, Parquet, Arrow IPC or .npy) to disk and scan it in the
+    background. Returns at once with a job id; poll GET /jobs/{job_id} for progress.
+    Requires authentication.
+    """
+    try:
+        fmt = detect_format(file.file, file.filename, file.content_type)
+        job = scan_job_runner.submit(file.file, file.filename, fmt, current_user.email)
+        return _response(job)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error queuing scan job: {str(e)}")
+
+@router.get("/{job_id}", response_model=ScanJobResponse)
+def get_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Progress of a scan job (rows processed and flagged so far) and, once it has
+    completed, its most suspicious flagged rows.
+    Requires authentication; only the submitting user can see a job.
+    """
+    job = scan_job_runner.get(job_id)
+    if job is None or job.user_email != current_user.email:
+        raise HTTPException(status_code=404, detail=f"Unknown job id {job_id}")
+    try:
+        return _response(job, scan_job_runner.flagged(job, settings.STREAM_TOP_K))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading job results: {str(e)}")
@@ -0,0 +1,93 @@
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from backend.services.drift import drift_monitor
+from backend.services.model_registry import ModelVersion, model_registry
+from backend.schemas.model import DriftResponse, ModelVersionInfo, ModelRegistryResponse, ModelLoadRequest
+from backend.routes.deps import get_current_user, get_admin_user
+from backend.models.user import User
+
+router = APIRouter(prefix="/model")
+
+def _info(version: ModelVersion) -> ModelVersionInfo:
+    return ModelVersionInfo(
+        **version.info(),
+        active=version is model_registry.active(),
+        shadow=version is model_registry.shadow,
+    )
+
+@router.get("", response_model=ModelRegistryResponse)
+def list_models(current_user: User = Depends(get_current_user)):
+    """
+    List loaded model versions, the active one and the shadow candidate.
+    Requires authentication.
+    """
+    try:
+        active = model_registry.active()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading model: {str(e)}")
+    shadow = model_registry.shadow
+    return ModelRegistryResponse(
+        active=active.version,
+        shadow=shadow.version if shadow is not None else None,
+        versions=[_info(version) for version in model_registry.versions()],
+        shadow_stats=model_registry.shadow_stats(),
+    )
+
+@router.get("/drift", response_model=DriftResponse)
+def get_drift(current_user: User = Depends(get_current_user)):
+    """
+    Per-feature and fraud_score drift of recently scored rows against the
+    active model's training data (moments, PSI, KS, quantiles).
+    Requires authentication.
+    """
+    try:
+        return drift_monitor.report()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error computing drift: {str(e)}")
+
+@router.post("/reload", response_model=ModelVersionInfo)
+def reload_model(req: Optional[ModelLoadRequest] = None, current_user: User = Depends(get_admin_user)):
+    """
+    Load the model files and atomically switch traffic to them. In-flight requests
+    finish on the version they started with.
+    Requires admin.
+    """
+    req = req or ModelLoadRequest()
+    try:
+        return _info(model_registry.reload(req.model_path, req.scaler_path))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error loading model: {str(e)}")
+
+@router.post("/activate/{version}", response_model=ModelVersionInfo)
+def activate_model(version: str, current_user: User = Depends(get_admin_user)):
+    """
+    Switch traffic to an already loaded version (e.g. to roll back).
+    Requires admin.
+    """
+    try:
+        return _info(model_registry.activate(version))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/shadow", response_model=ModelVersionInfo)
+def set_shadow_model(req: ModelLoadRequest, current_user: User = Depends(get_admin_user)):
+    """
+    Load a candidate model and score every batch with it in the background,
+    logging how its scores differ from the active model.
+    Requires admin.
+    """
+    try:
+        version = model_registry.load(req.model_path, req.scaler_path)
+        model_registry.set_shadow(version.version)
+        return _info(version)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error loading shadow model: {str(e)}")
+
+@router.delete("/shadow")
+def clear_shadow_model(current_user: User = Depends(get_admin_user)):
+    """
+    Stop shadow scoring.
+    Requires admin.
+    """
+    model_registry.set_shadow(None)
+    return {"status": "shadow scoring disabled"}
@@ -0,0 +1,98 @@
+import json
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from backend.core.metrics import span
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder gives the same output, slower
+    orjson = None
+
+# Upload response modes; "full" is the validated TransactionUploadResponse
+RESPONSE_MODES = ("full", "summary", "ndjson", "columnar")
+
+_ACCEPT_MODES = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/vnd.fraud.columnar+json": "columnar",
+    "application/vnd.fraud.summary+json": "summary",
+}
+
+NDJSON_CHUNK_ROWS = 1000
+
+def response_mode(request: Request, mode: Optional[str] = None) -> str:
+    """The ?format= value if given, else the first recognised Accept media type, else full."""
+    if mode:
+        if mode not in RESPONSE_MODES:
+            raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(RESPONSE_MODES)}")
+        return mode
+    for part in request.headers.get("accept", "").split(","):
+        media_type = part.split(";")[0].strip().lower()
+        if media_type in _ACCEPT_MODES:
+            return _ACCEPT_MODES[media_type]
+    return "full"
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, default=_json_default).encode()
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _column(series: pd.Series):
+    """One field as a JSON-ready array: numpy for clean numeric columns, a list otherwise (NaN -> null)."""
+    has_nulls = series.isna().any()
+    if orjson is not None and pd.api.types.is_numeric_dtype(series) and series.dtype != object:
+        # orjson writes NaN as null itself, but only reads contiguous arrays
+        return np.ascontiguousarray(series.to_numpy())
+    if pd.api.types.is_numeric_dtype(series) and not has_nulls:
+        return series.tolist()
+    return series.astype(object).where(series.notna(), None).tolist()
+
+def _summary(result: Dict, message: str) -> Dict:
+    return {
+        "scan_id": result["scan_id"],
+        "total_transactions": result["total_transactions"],
+        "flagged_count": result["flagged_count"],
+        "message": message,
+    }
+
+def summary_response(result: Dict, message: str) -> Response:
+    return Response(dumps(_summary(result, message)), media_type="application/json")
+
+def columnar_response(result: Dict, message: str) -> Response:
+    """Summary plus the flagged rows as {"columns": {field: [values...]}}, one array per field."""
+    frame = result["flagged_frame"]
+    with span("encode_columnar", len(frame)):
+        payload = _summary(result, message)
+        payload["columns"] = {str(name): _column(frame[name]) for name in frame.columns}
+        body = dumps(payload)
+    return Response(body, media_type="application/json")
+
+def ndjson_response(result: Dict, message: str, chunk_rows: int = NDJSON_CHUNK_ROWS) -> StreamingResponse:
+    """
+    Flagged rows as newline-delimited JSON, encoded chunk_rows at a time by
+    pandas' C encoder. The summary goes in X-Scan-Id / X-Total-Transactions /
+    X-Flagged-Count headers.
+    """
+    frame = result["flagged_frame"]
+
+    def lines():
+        for start in range(0, len(frame), chunk_rows):
+            text = frame.iloc[start:start + chunk_rows].to_json(orient="records", lines=True, double_precision=15)
+            yield text if text.endswith("\n") else text + "\n"
+
+    headers = {
+        "X-Scan-Id": str(result["scan_id"]),
+        "X-Total-Transactions": str(result["total_transactions"]),
+        "X-Flagged-Count": str(result["flagged_count"]),
+    }
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
@@ -1,62 +1,274 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Request, Response
+from datetime import datetime
+from typing import List, Optional
+import numpy as np
 import pandas as pd
+import hashlib
 import io
-from backend.services.auditor_service import AuditorDashboardService
-from backend.schemas.fraud import TransactionUploadResponse, FlaggedTransactionResponse, NotificationResponse
-from backend.routes.deps import get_current_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db.session import get_async_db
+from backend.services.auditor_service import AuditorDashboardService, ScanNotFound, ScanNotReady
+from backend.services.audit_service import audit_logger
+from backend.services.batcher import score_batcher
+from backend.services.ingest import detect_format
+from backend.services.notifier import notification_dispatcher
+from backend.services.velocity import base_features, uses_velocity
+from backend.services.model_service import get_model_version, with_velocity_features
+from backend.core.config import settings
+from backend.core.metrics import histograms, span
+from backend.schemas.fraud import (
+    TransactionUploadResponse, FlaggedTransactionResponse, NotificationResponse, NotificationStatusResponse, AuditLog,
+    TransactionScoreRequest, TransactionScoreResponse, DashboardStats,
+)
+from backend.routes.deps import get_current_user, get_admin_user, is_admin
+from backend.routes.responses import columnar_response, ndjson_response, response_mode, summary_response
 from backend.models.user import User
 
 router = APIRouter()
 auditor_service = AuditorDashboardService()
 
 @router.post("/upload-csv", response_model=TransactionUploadResponse)
-def upload_csv(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+@router.post("/upload", response_model=TransactionUploadResponse)
+def upload_csv(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    stream: bool = Query(False, description="Score the file in chunks and return only the most suspicious flagged rows"),
+    response_format: Optional[str] = Query(
+        None, alias="format",
+        description="full (default), summary, ndjson or columnar; also negotiable via the Accept header",
+    ),
+    current_user: User = Depends(get_current_user),
+):
     """
     Upload CSV file, run fraud detection, and return comprehensive results.
+    Parquet, Arrow IPC (Feather v2) and 2-D float .npy files are also accepted and
+    detected from their content, content type or extension; their feature columns
+    are decoded directly into the scoring matrix. A .npy file carries only the
+    feature matrix, in the model's feature order.
+    With stream=true the file is parsed and scored chunk by chunk, keeping memory bounded.
+
+    Response formats: full returns TransactionUploadResponse; summary drops the
+    rows; ndjson (Accept: application/x-ndjson) streams one flagged row per line;
+    columnar (Accept: application/vnd.fraud.columnar+json) returns one array per field.
+
+    Re-uploading a file the active model already scored returns the earlier
+    result from cache (X-Result-Cache: hit) instead of creating a new scan.
     Requires authentication.
     """
+    mode = response_mode(request, response_format)
+    as_records = mode == "full"
     try:
-        # Read CSV file
-        df = pd.read_csv(file.file)
-        
-        # Process transactions using auditor service
-        result = auditor_service.process_transactions(df, current_user.email)
-        
-        return TransactionUploadResponse(
-            total_transactions=result["total_transactions"],
-            flagged_count=result["flagged_count"],
-            flagged=result["flagged"],
-            message=f"Processed {result['total_transactions']} transactions, {result['flagged_count']} flagged as suspicious"
-        )
+        fmt = detect_format(file.file, file.filename, file.content_type)
+        result = auditor_service.process_upload(file.file, fmt, current_user.email, stream=stream, as_records=as_records)
+
+        message = f"Processed {result['total_transactions']} transactions, {result['flagged_count']} flagged as suspicious"
+        cache_status = "hit" if result["cached"] else "miss"
+        if mode != "full":
+            encoders = {"summary": summary_response, "columnar": columnar_response, "ndjson": ndjson_response}
+            encoded = encoders[mode](result, message)
+            encoded.headers["X-Result-Cache"] = cache_status
+            return encoded
+
+        response.headers["X-Result-Cache"] = cache_status
+        with span("response_model", len(result["flagged"])):
+            return TransactionUploadResponse(
+                scan_id=result["scan_id"],
+                total_transactions=result["total_transactions"],
+                flagged_count=result["flagged_count"],
+                flagged=result["flagged"],
+                message=message
+            )
+
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error processing upload: {str(e)}")
+
+@router.post("/score", response_model=TransactionScoreResponse)
+async def score_transaction(txn: TransactionScoreRequest, current_user: User = Depends(get_current_user)):
+    """
+    Score a single transaction inline. Concurrent calls are coalesced into small
+    batches before reaching the model.
+    Requires authentication.
+    """
+    values = txn.model_dump()
+    try:
+        # Pinned for the whole request: the batch scores with the model the features were built for
+        version = get_model_version()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading model: {str(e)}")
+    feature_names = version.feature_names
+    input_names = base_features(feature_names)
+    missing = [name for name in input_names if values.get(name) is None]
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Missing feature fields: {', '.join(missing)}")
+    try:
+        features = np.array([float(values[name]) for name in input_names], dtype=np.float32)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Feature fields must be numeric: {str(e)}")
+    if uses_velocity(feature_names):
+        # The customer's rolling aggregates, including this transaction
+        meta = pd.DataFrame({"Name": [txn.Name], "ID": [txn.ID]})
+        features = with_velocity_features(features[None, :], meta, feature_names)[0]
 
+    try:
+        score, label = await score_batcher.submit(features, version)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error processing CSV: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error scoring transaction: {str(e)}")
+
+    return TransactionScoreResponse(ID=txn.ID, Name=txn.Name, fraud_score=score, flagged=(label == -1))
+
+@router.get("/score/metrics")
+def score_metrics(current_user: User = Depends(get_current_user)):
+    """
+    Batch-size and queue-wait histograms of the /score micro-batcher.
+    Requires authentication.
+    """
+    return {name: hist.snapshot() for name, hist in histograms().items() if name.startswith("score_")}
+
+def _flagged_etag(
+    scan, limit: Optional[int], after_score: Optional[float], after_id: Optional[int], max_score: Optional[float],
+) -> str:
+    # Completed scans are immutable, so the scan and page parameters identify the representation;
+    # risk_tier and top_features depend on settings, so those are part of it too
+    scan_key = f"{scan.id}:{scan.completed_at.isoformat()}" if scan is not None else "none"
+    tiers = f"{settings.RISK_HIGH_THRESHOLD}:{settings.RISK_MEDIUM_THRESHOLD}:{settings.EXPLAIN_TOP_K}"
+    digest = hashlib.sha1(f"{scan_key}:{limit}:{after_score}:{after_id}:{max_score}:{tiers}".encode()).hexdigest()
+    return f'"{digest}"'
 
 @router.get("/flagged", response_model=FlaggedTransactionResponse)
-def get_flagged(current_user: User = Depends(get_current_user)):
+async def get_flagged(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=10000, description="Maximum number of rows to return"),
+    after_score: Optional[float] = Query(None, description="Return rows after this fraud_score (keyset cursor)"),
+    after_id: Optional[int] = Query(None, description="Tie-breaker for after_score (keyset cursor)"),
+    max_score: Optional[float] = Query(None, description="Only rows with fraud_score below this, e.g. RISK_HIGH_THRESHOLD"),
+    scan_id: Optional[int] = Query(None, description="Scan to read; defaults to the caller's latest completed scan"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
     """
-    View flagged suspicious transactions from the last upload.
+    View flagged suspicious transactions of one of your scans (your latest upload
+    by default), most suspicious first. Admins may read any scan by scan_id.
+    Supports keyset pagination and conditional GETs via ETag / If-None-Match.
+    Pages are served from the scan's score-ordered index by binary search.
     Requires authentication.
     """
     try:
-        result = auditor_service.get_flagged_transactions()
-        return FlaggedTransactionResponse(flagged_transactions=result["flagged_transactions"])
+        scan = await auditor_service.resolve_scan_async(db, current_user.email, scan_id, is_admin(current_user))
+        etag = _flagged_etag(scan, limit, after_score, after_id, max_score)
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        result = await auditor_service.get_flagged_transactions_async(
+            db, scan, limit, after_score, after_id, max_score, user_email=current_user.email,
+        )
+        response.headers["ETag"] = etag
+        return FlaggedTransactionResponse(**result)
+    except ScanNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ScanNotReady as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving flagged transactions: {str(e)}")
 
+@router.get("/dashboard", response_model=DashboardStats)
+async def get_dashboard(
+    scope: str = Query("global", pattern="^(global|user)$", description="global, or user for the caller's own scans"),
+    scan_id: Optional[int] = Query(None, description="Stats of a single scan instead"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Totals, fraud rate and risk-tier counts over all completed scans.
+    Served from aggregates kept up to date as scans complete, so the cost does
+    not grow with the number of stored transactions.
+    Requires authentication.
+    """
+    try:
+        if scan_id is not None:
+            # Per-scan stats are only shown to the scan's owner (or an admin), also while it runs
+            await auditor_service.resolve_scan_async(db, current_user.email, scan_id, is_admin(current_user), completed=False)
+        user_email = current_user.email if scope == "user" else None
+        return DashboardStats(**await auditor_service.get_dashboard_stats_async(db, user_email, scan_id))
+    except ScanNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error loading dashboard: {str(e)}")
+
+@router.post("/dashboard/rebuild")
+def rebuild_dashboard(current_user: User = Depends(get_admin_user)):
+    """
+    Recompute the dashboard aggregates from the stored scan results.
+    Requires admin privileges.
+    """
+    try:
+        scans = auditor_service.rebuild_dashboard_stats()
+        return {"status": "rebuilt", "scans": scans}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rebuilding dashboard: {str(e)}")
+
 @router.post("/notify-admin", response_model=NotificationResponse)
-def notify_admin(current_user: User = Depends(get_current_user)):
+def notify_admin(
+    scan_id: Optional[int] = Query(None, description="Scan to report; defaults to the caller's latest completed scan"),
+    current_user: User = Depends(get_current_user),
+):
     """
-    Send an email to admin with list of flagged suspicious transactions.
+    Queue an email to admin with list of flagged suspicious transactions of one
+    of your scans (your latest upload by default).
+    Returns immediately with a delivery id; poll /notifications/{delivery_id} for the outcome.
     Requires authentication.
     """
     try:
-        result = auditor_service.send_notification()
-        return NotificationResponse(
-            status=result["status"],
-            count=result["count"],
-            message=result["message"]
-        )
+        scan = auditor_service.resolve_scan(current_user.email, scan_id, is_admin(current_user))
+        if scan is None:
+            return NotificationResponse(status="no_flagged_transactions", count=0, message="No completed scans yet")
+        result = auditor_service.send_notification(scan, current_user.email)
+        return NotificationResponse(**result)
+    except ScanNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ScanNotReady as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error sending notification: {str(e)}")
 
+@router.get("/notifications/{delivery_id}", response_model=NotificationStatusResponse)
+def get_notification_status(delivery_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Delivery status of a queued admin notification: queued, sending, retrying, sent or failed.
+    Requires authentication.
+    """
+    delivery = notification_dispatcher.status(delivery_id)
+    if delivery is None:
+        raise HTTPException(status_code=404, detail=f"Unknown delivery id {delivery_id}")
+    return NotificationStatusResponse(
+        delivery_id=delivery.id,
+        status=delivery.status,
+        count=delivery.count,
+        attempts=delivery.attempts,
+        created_at=delivery.created_at,
+        sent_at=delivery.sent_at,
+        error=delivery.error,
+    )
+
+@router.get("/audit-log", response_model=List[AuditLog])
+def get_audit_log(
+    action: Optional[str] = Query(None, description="Only return this action, e.g. transaction_scan"),
+    user: Optional[str] = Query(None, description="Only return actions by this user"),
+    start: Optional[datetime] = Query(None, description="Inclusive lower bound on timestamp"),
+    end: Optional[datetime] = Query(None, description="Exclusive upper bound on timestamp"),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Query the audit trail, newest first.
+    Requires authentication; admins see every user's records, other users only their own.
+    """
+    if not is_admin(current_user):
+        if user is not None and user != current_user.email:
+            raise HTTPException(status_code=403, detail="Admin privileges required to read other users' records")
+        user = current_user.email
+    try:
+        return audit_logger.query(action=action, user=user, start=start, end=end, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving audit log: {str(e)}")
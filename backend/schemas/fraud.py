@@ -1,20 +1,49 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import datetime
 
 class TransactionUploadResponse(BaseModel):
+    scan_id: Optional[int] = None
     total_transactions: int
     flagged_count: int
     flagged: List[dict]
     message: Optional[str] = None
 
+class TransactionScoreRequest(BaseModel):
+    """A single transaction; feature fields (Time, V1..V28, Amount) are passed as extra keys."""
+    ID: Optional[Union[int, str]] = None
+    Name: Optional[str] = None
+
+    class Config:
+        extra = "allow"
+
+class TransactionScoreResponse(BaseModel):
+    ID: Optional[Union[int, str]] = None
+    Name: Optional[str] = None
+    fraud_score: float
+    flagged: bool
+
 class FlaggedTransactionResponse(BaseModel):
+    scan_id: Optional[int] = None
     flagged_transactions: List[dict]
+    next_after_score: Optional[float] = None
+    next_after_id: Optional[int] = None
 
 class NotificationResponse(BaseModel):
     status: str
     count: int
+    scan_id: Optional[int] = None
     message: Optional[str] = None
+    delivery_id: Optional[str] = None
+
+class NotificationStatusResponse(BaseModel):
+    delivery_id: str
+    status: str
+    count: int
+    attempts: int
+    created_at: datetime
+    sent_at: Optional[datetime] = None
+    error: Optional[str] = None
 
 class DashboardStats(BaseModel):
     total_transactions: int
@@ -32,3 +61,6 @@ class AuditLog(BaseModel):
     user: str
     details: str
     status: str
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+class ScanJobResponse(BaseModel):
+    job_id: str
+    status: str
+    filename: str
+    format: str
+    scan_id: Optional[int] = None
+    rows_processed: int
+    flagged_count: int
+    chunks_completed: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Most suspicious flagged rows, once the job has completed
+    flagged: Optional[List[dict]] = None
@@ -0,0 +1,42 @@
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional, Union
+from datetime import datetime
+
+class ModelVersionInfo(BaseModel):
+    version: str
+    model_path: str
+    scaler_path: str
+    feature_names: List[str]
+    contamination: Optional[Union[float, str]] = None
+    n_estimators: Optional[int] = None
+    max_samples: Optional[int] = None
+    trained_at: Optional[datetime] = None
+    loaded_at: datetime
+    active: bool = False
+    shadow: bool = False
+
+class ModelRegistryResponse(BaseModel):
+    active: Optional[str] = None
+    shadow: Optional[str] = None
+    versions: List[ModelVersionInfo]
+    shadow_stats: Dict[str, float] = {}
+
+class ModelLoadRequest(BaseModel):
+    """Paths default to MODEL_PATH / SCALER_PATH."""
+    model_path: Optional[str] = None
+    scaler_path: Optional[str] = None
+
+class DriftResponse(BaseModel):
+    """Drift of one window of scored rows against the active model's training data."""
+    version: Optional[str] = None
+    # training, first_window (no recorded distributions) or pending (first window still filling)
+    reference: str
+    evaluated_at: datetime
+    window_rows: int
+    sampled_rows: int
+    rows_observed: int
+    psi_threshold: float
+    ks_threshold: float
+    drifted: List[str]
+    score: Dict[str, Any]
+    features: Dict[str, Dict[str, Any]]
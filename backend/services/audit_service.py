@@ -0,0 +1,139 @@
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import insert, select
+from backend.core.config import settings
+from backend.core.metrics import counter, gauge
+from backend.db.session import SessionLocal
+from backend.models.audit import AuditLogEntry
+
+class AuditLogger:
+    """
+    Append-only audit trail. Records are queued in memory and batch-inserted by a
+    background thread at most AUDIT_FLUSH_INTERVAL seconds later, or sooner once
+    AUDIT_BATCH_SIZE records are waiting. Pending records are flushed on shutdown.
+
+    A batch that fails to insert (e.g. the database is locked) goes back on the
+    queue and is retried on the next flush; only after AUDIT_MAX_RETRIES
+    consecutive failures are the queued records dropped, with a log line and
+    audit_records_dropped_total.
+    """
+
+    def __init__(self, flush_interval: Optional[float] = None, batch_size: Optional[int] = None):
+        self.flush_interval = flush_interval or settings.AUDIT_FLUSH_INTERVAL
+        self.batch_size = batch_size or settings.AUDIT_BATCH_SIZE
+        self._queue: queue.Queue = queue.Queue()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._flush_lock = threading.Lock()
+        self._failures = 0
+        atexit.register(self.stop)
+
+    def start(self):
+        """Start the background flusher (idempotent)."""
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and write out everything still queued."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # Bounded: a batch is dropped after AUDIT_MAX_RETRIES failures, emptying the queue
+        while self.queue_depth:
+            if not self.flush() and self.queue_depth:
+                time.sleep(min(self.flush_interval, 1.0))
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def log(self, action: str, details: str, user: str = "system", status: str = "success"):
+        """Queue an audit record; O(1) regardless of how much history exists."""
+        if self._thread is None:
+            self.start()
+        self._queue.put({
+            "timestamp": datetime.now(),
+            "action": action,
+            "details": details,
+            "status": status,
+            "user": user,
+        })
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Insert all queued records in one transaction and return how many were written."""
+        with self._flush_lock:
+            batch = []
+            try:
+                while True:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            if not batch:
+                return 0
+            try:
+                with SessionLocal() as db:
+                    db.execute(insert(AuditLogEntry), batch)
+                    db.commit()
+            except Exception as e:
+                self._failures += 1
+                if self._failures > settings.AUDIT_MAX_RETRIES:
+                    print(f"Dropping {len(batch)} audit records after {self._failures} failed flushes: {e}")
+                    counter("audit_records_dropped_total", "Audit records dropped after repeated flush failures").inc(len(batch))
+                    self._failures = 0
+                else:
+                    print(f"Failed to flush {len(batch)} audit records (attempt {self._failures}), will retry: {e}")
+                    for record in batch:
+                        self._queue.put(record)
+                return 0
+            self._failures = 0
+            return len(batch)
+
+    def query(
+        self,
+        action: Optional[str] = None,
+        user: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 100,
+    ) -> List[AuditLogEntry]:
+        """Return matching audit records, newest first."""
+        # Make sure records logged by this process are visible to the caller
+        self.flush()
+
+        query = select(AuditLogEntry)
+        if action is not None:
+            query = query.where(AuditLogEntry.action == action)
+        if user is not None:
+            query = query.where(AuditLogEntry.user == user)
+        if start is not None:
+            query = query.where(AuditLogEntry.timestamp >= start)
+        if end is not None:
+            query = query.where(AuditLogEntry.timestamp < end)
+        query = query.order_by(AuditLogEntry.timestamp.desc(), AuditLogEntry.id.desc()).limit(limit)
+
+        with SessionLocal() as db:
+            return list(db.execute(query).scalars().all())
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+audit_logger = AuditLogger()
+gauge("audit_queue_depth", "Audit records waiting to be written", fn=lambda: audit_logger.queue_depth)
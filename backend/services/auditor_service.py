@@ -1,87 +1,356 @@
 import pandas as pd
-import os
-from datetime import datetime
-from typing import Dict
-from backend.services.model_service import predict
-from backend.services.notifier import send_fraud_alert
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.core.config import settings
+from backend.core.metrics import span
+from backend.models.scan import Scan
+from backend.services.audit_service import audit_logger
+from backend.services.ingest import read_feature_chunks
+from backend.services.model_registry import ModelVersion
+from backend.services.model_service import (
+    explain, get_model_version, predict, predict_chunks, rank_positions, read_csv_chunks, score_feature_chunks, timed_chunks,
+)
+from backend.services.result_cache import file_digest, upload_cache
+from backend.services.result_store import ResultStore
+from backend.services.velocity import base_features
+from backend.services.score_stats import GLOBAL_KEY, score_stats
+from backend.services.notifier import notification_dispatcher
+
+class ScanNotFound(Exception):
+    """Raised when a scan does not exist or belongs to another user."""
+
+class ScanNotReady(Exception):
+    """Raised when a scan's results are requested before it completed."""
 
 class AuditorDashboardService:
     """Service for auditor operations."""
     
     def __init__(self):
-        self.flagged_file = "flagged_transactions.csv"
-        self.audit_log_file = "audit_log.csv"
+        self.result_store = ResultStore()
     
-    def process_transactions(self, df: pd.DataFrame, user_email: str = "system") -> Dict:
-        """Process transactions and return comprehensive results."""
+    def process_upload(
+        self,
+        source: BinaryIO,
+        fmt: str = "csv",
+        user_email: str = "system",
+        stream: bool = False,
+        as_records: bool = True,
+    ) -> Dict:
+        """
+        Score an uploaded file in the given format (see ingest.detect_format).
+        A file whose exact bytes were already scored by the active model for
+        the same user is answered from the upload cache, without creating a
+        new scan; the result then carries cached=True and the scan_id of the
+        original scan.
+        """
+        top_k = settings.STREAM_TOP_K if stream else None
+        digest = None
+        if upload_cache.enabled:
+            with span("upload_digest"):
+                digest = file_digest(source)
+            cached = upload_cache.get(digest, get_model_version().version, top_k, user_email)
+            if cached is not None:
+                self._log_audit_action(
+                    "transaction_scan",
+                    f"Served cached result of scan {cached['scan_id']}: {cached['total_transactions']} transactions, "
+                    f"{cached['flagged_count']} flagged",
+                    user_email,
+                )
+                return self._with_records(dict(cached, cached=True), as_records)
+
+        if fmt != "csv":
+            result = self.process_binary_upload(source, fmt, user_email, top_k=top_k, as_records=as_records)
+        elif stream:
+            result = self.process_transactions_stream(source, user_email, top_k=top_k, as_records=as_records)
+        else:
+            with span("csv_parse"):
+                df = pd.read_csv(source)
+            result = self.process_transactions(df, user_email, as_records=as_records)
+
+        if digest is not None:
+            upload_cache.set(digest, result["model_version"], top_k, user_email, result)
+        result["cached"] = False
+        return result
+
+    def process_transactions(self, df: pd.DataFrame, user_email: str = "system", as_records: bool = True) -> Dict:
+        """
+        Process transactions and return comprehensive results. The flagged rows
+        are returned as "flagged_frame" and, with as_records, also as a list of dicts.
+        """
+        scan_id = None
         try:
             # Run fraud detection
-            result_df = predict(df)
+            version = get_model_version()
+            result_df = predict(df, version)
             
             # Save results
-            result_df.to_csv(self.flagged_file, index=False)
+            with span("persist", len(result_df)):
+                scan_id = self.result_store.create_scan(user_email, version.version)
+                self.result_store.add_results(scan_id, result_df, version=version)
             
-            # Get flagged transactions
-            flagged_df = result_df[result_df["flagged"] == True]
+                # Get flagged transactions
+                flagged_df = result_df[result_df["flagged"] == True]
+                self.result_store.finish_scan(scan_id, len(result_df), len(flagged_df))
             
             # Log the audit action
             self._log_audit_action("transaction_scan", f"Processed {len(result_df)} transactions, {len(flagged_df)} flagged", user_email)
             
-            return {
-                "total_transactions": len(result_df),
-                "flagged_count": len(flagged_df),
-                "flagged": flagged_df.to_dict(orient="records"),
-                "status": "success"
-            }
+            return self._result(scan_id, len(result_df), flagged_df, version, as_records)
             
         except Exception as e:
+            if scan_id is not None:
+                self.result_store.finish_scan(scan_id, 0, 0, status="failed")
             self._log_audit_action("transaction_scan", f"Error: {str(e)}", user_email)
             raise e
     
-    def get_flagged_transactions(self) -> Dict:
-        """Get all flagged transactions."""
+    def process_transactions_stream(
+        self,
+        source: Union[str, BinaryIO],
+        user_email: str = "system",
+        chunk_size: Optional[int] = None,
+        top_k: Optional[int] = None,
+        as_records: bool = True,
+    ) -> Dict:
+        """
+        Process a CSV chunk by chunk so memory depends on the chunk size, not the file size.
+        Results are stored as each chunk is scored and only the top_k most
+        suspicious flagged rows are kept for the response.
+        """
+        version = get_model_version()
+        scored = predict_chunks(read_csv_chunks(source, chunk_size, version), version)
+        return self._process_scored_chunks(scored, user_email, version, top_k or settings.STREAM_TOP_K, as_records)
+
+    def process_binary_upload(
+        self,
+        source: BinaryIO,
+        fmt: str,
+        user_email: str = "system",
+        chunk_size: Optional[int] = None,
+        top_k: Optional[int] = None,
+        as_records: bool = True,
+    ) -> Dict:
+        """
+        Process a Parquet, Arrow IPC or .npy upload. Feature columns are decoded
+        straight into float32 matrices and scored chunk by chunk; metadata is
+        attached afterwards. With top_k only the most suspicious flagged rows
+        are returned, otherwise all of them (most suspicious first).
+        """
+        version = get_model_version()
+        chunks = read_feature_chunks(source, fmt, base_features(version.feature_names), chunk_size or settings.CSV_CHUNK_SIZE)
+        scored = score_feature_chunks(timed_chunks(chunks, f"{fmt}_decode"), version)
+        return self._process_scored_chunks(scored, user_email, version, top_k, as_records)
+
+    def _process_scored_chunks(
+        self,
+        scored: Iterable[pd.DataFrame],
+        user_email: str,
+        version: ModelVersion,
+        top_k: Optional[int] = None,
+        as_records: bool = True,
+    ) -> Dict:
+        """Persist scored chunks into a new scan and keep the top_k (or all) flagged rows."""
+        total_count = 0
+        flagged_count = 0
+        top_flagged = None
+        all_flagged = []
+        scan_id = None
         try:
-            if not os.path.exists(self.flagged_file):
-                return {"flagged_transactions": []}
-            
-            df = pd.read_csv(self.flagged_file)
-            flagged_df = df[df["flagged"] == True]
-            
-            return {"flagged_transactions": flagged_df.to_dict(orient="records")}
+            scan_id = self.result_store.create_scan(user_email, version.version)
+            for result_df in scored:
+                with span("persist", len(result_df)):
+                    self.result_store.add_results(scan_id, result_df, version=version)
+
+                flagged_df = result_df[result_df["flagged"] == True]
+                total_count += len(result_df)
+                flagged_count += len(flagged_df)
+
+                if not top_k:
+                    all_flagged.append(flagged_df)
+                    continue
+                if top_flagged is not None:
+                    flagged_df = pd.concat([top_flagged, flagged_df])
+                top_flagged = flagged_df.take(rank_positions(flagged_df["fraud_score"].to_numpy(), top_k))
+
+            self.result_store.finish_scan(scan_id, total_count, flagged_count)
+            self._log_audit_action("transaction_scan", f"Processed {total_count} transactions, {flagged_count} flagged", user_email)
+
+            if all_flagged:
+                top_flagged = pd.concat(all_flagged)
+                top_flagged = top_flagged.take(rank_positions(top_flagged["fraud_score"].to_numpy()))
+            result = self._result(scan_id, total_count, top_flagged, version, as_records)
+            result["flagged_count"] = flagged_count
+            return result
+
+        except Exception as e:
+            if scan_id is not None:
+                self.result_store.finish_scan(scan_id, total_count, flagged_count, status="failed")
+            self._log_audit_action("transaction_scan", f"Error: {str(e)}", user_email)
+            raise e
+
+    def _result(
+        self, scan_id: int, total: int, flagged_df: Optional[pd.DataFrame], version: ModelVersion, as_records: bool,
+    ) -> Dict:
+        if flagged_df is None:
+            flagged_df = pd.DataFrame(columns=["fraud_score", "flagged", "risk_tier"])
+        elif settings.EXPLAIN_TOP_K and version.feature_names and set(version.feature_names) <= set(flagged_df.columns):
+            # Only the returned flagged rows are explained, in one pass over the forest
+            flagged_df = flagged_df.assign(top_features=explain(flagged_df[version.feature_names].to_numpy(), version))
+        result = {
+            "scan_id": scan_id,
+            "total_transactions": total,
+            "flagged_count": len(flagged_df),
+            "flagged_frame": flagged_df,
+            "model_version": version.version,
+            "status": "success"
+        }
+        return self._with_records(result, as_records)
+
+    def _with_records(self, result: Dict, as_records: bool) -> Dict:
+        if as_records:
+            flagged_df = result["flagged_frame"]
+            with span("to_records", len(flagged_df)):
+                result["flagged"] = flagged_df.to_dict(orient="records")
+        return result
+
+    def latest_scan(self, user_email: Optional[str] = None) -> Optional[Scan]:
+        """Get the most recently completed scan, of one user if user_email is given."""
+        return self.result_store.latest_scan(user_email)
+
+    def resolve_scan(self, user_email: str, scan_id: Optional[int] = None, admin: bool = False) -> Optional[Scan]:
+        """
+        The scan a request refers to: scan_id if given (it must be the caller's
+        own unless admin), else the caller's latest completed scan.
+        """
+        if scan_id is None:
+            return self.result_store.latest_scan(user_email)
+        return self._check_scan(self.result_store.get_scan(scan_id), scan_id, user_email, admin)
+
+    async def resolve_scan_async(
+        self, db: AsyncSession, user_email: str, scan_id: Optional[int] = None, admin: bool = False,
+        completed: bool = True,
+    ) -> Optional[Scan]:
+        """resolve_scan on an async session; completed=False also accepts running and failed scans."""
+        if scan_id is None:
+            return await self.result_store.latest_scan_async(db, user_email)
+        scan = await self.result_store.get_scan_async(db, scan_id)
+        return self._check_scan(scan, scan_id, user_email, admin, completed)
+
+    @staticmethod
+    def _check_scan(scan: Optional[Scan], scan_id: int, user_email: str, admin: bool, completed: bool = True) -> Scan:
+        # Other users' scans are reported as missing rather than forbidden
+        if scan is None or (scan.user_email != user_email and not admin):
+            raise ScanNotFound(f"Scan {scan_id} not found")
+        if completed and scan.status != "completed":
+            raise ScanNotReady(f"Scan {scan_id} is {scan.status}")
+        return scan
+
+    def get_flagged_transactions(
+        self,
+        scan: Optional[Scan] = None,
+        limit: Optional[int] = None,
+        after_score: Optional[float] = None,
+        after_id: Optional[int] = None,
+        max_score: Optional[float] = None,
+        user_email: Optional[str] = None,
+    ) -> Dict:
+        """
+        Get flagged transactions of a scan (by default the latest, of user_email
+        if given), one keyset page at a time, optionally only those scoring below max_score.
+        """
+        try:
+            if scan is None:
+                scan = self.result_store.latest_scan(user_email)
+            if scan is None:
+                return self._flagged_page(None, [], None, limit)
+
+            records, cursor = self.result_store.get_flagged(scan, limit, after_score, after_id, max_score)
+            return self._flagged_page(scan, records, cursor, limit)
             
         except Exception as e:
             raise e
+
+    async def get_flagged_transactions_async(
+        self,
+        db: AsyncSession,
+        scan: Optional[Scan] = None,
+        limit: Optional[int] = None,
+        after_score: Optional[float] = None,
+        after_id: Optional[int] = None,
+        max_score: Optional[float] = None,
+        user_email: Optional[str] = None,
+    ) -> Dict:
+        """get_flagged_transactions on an async session."""
+        if scan is None:
+            scan = await self.result_store.latest_scan_async(db, user_email)
+        if scan is None:
+            return self._flagged_page(None, [], None, limit)
+        records, cursor = await self.result_store.get_flagged_async(db, scan, limit, after_score, after_id, max_score)
+        return self._flagged_page(scan, records, cursor, limit)
+
+    @staticmethod
+    def _flagged_page(scan: Optional[Scan], records: List[Dict], cursor, limit: Optional[int]) -> Dict:
+        next_after_score, next_after_id = cursor if limit is not None and cursor and len(records) == limit else (None, None)
+        return {
+            "scan_id": scan.id if scan is not None else None,
+            "flagged_transactions": records,
+            "next_after_score": next_after_score,
+            "next_after_id": next_after_id,
+        }
     
-    def send_notification(self) -> Dict:
-        """Send notification to admin about flagged transactions."""
+    def get_dashboard_stats(self, user_email: Optional[str] = None, scan_id: Optional[int] = None) -> Dict:
+        """Dashboard totals for one scan, one user's completed scans, or everything (the default)."""
+        return score_stats.dashboard(*self._dashboard_scope(user_email, scan_id))
+
+    async def get_dashboard_stats_async(
+        self, db: AsyncSession, user_email: Optional[str] = None, scan_id: Optional[int] = None,
+    ) -> Dict:
+        return await score_stats.dashboard_async(db, *self._dashboard_scope(user_email, scan_id))
+
+    @staticmethod
+    def _dashboard_scope(user_email: Optional[str], scan_id: Optional[int]) -> Tuple[str, str]:
+        if scan_id is not None:
+            return "scan", str(scan_id)
+        if user_email is not None:
+            return "user", user_email
+        return "global", GLOBAL_KEY
+
+    def rebuild_dashboard_stats(self) -> int:
+        """Recompute the dashboard aggregates from stored scan results."""
+        scans = score_stats.rebuild()
+        self._log_audit_action("dashboard_rebuild", f"Rebuilt dashboard aggregates from {scans} scans", "system")
+        return scans
+
+    def send_notification(self, scan: Optional[Scan] = None, user_email: str = "system") -> Dict:
+        """
+        Queue a notification to admin about the flagged transactions of a scan
+        (by default user_email's latest) scoring below ALERT_THRESHOLD.
+        """
         try:
-            flagged_data = self.get_flagged_transactions()
+            flagged_data = self.get_flagged_transactions(scan, max_score=settings.ALERT_THRESHOLD, user_email=user_email)
             flagged_transactions = flagged_data["flagged_transactions"]
             
             if not flagged_transactions:
                 return {
                     "status": "no_flagged_transactions",
                     "count": 0,
+                    "scan_id": flagged_data["scan_id"],
                     "message": "No suspicious transactions found"
                 }
             
-            # Send email notification
-            success = send_fraud_alert(flagged_transactions)
-            
-            if success:
-                self._log_audit_action("notification_sent", f"Sent alert for {len(flagged_transactions)} transactions", "system")
-                return {
-                    "status": "Email sent successfully",
-                    "count": len(flagged_transactions),
-                    "message": f"Alert sent for {len(flagged_transactions)} suspicious transactions"
-                }
-            else:
-                self._log_audit_action("notification_failed", "Failed to send email alert", "error")
-                return {
-                    "status": "Email send failed",
-                    "count": len(flagged_transactions),
-                    "message": "Failed to send email notification"
-                }
+            # Queue the email; delivery (with retries) happens in the background
+            delivery_id = notification_dispatcher.enqueue(flagged_transactions)
+            self._log_audit_action(
+                "notification_queued",
+                f"Queued alert {delivery_id} for {len(flagged_transactions)} transactions of scan {flagged_data['scan_id']}",
+                user_email,
+            )
+            return {
+                "status": "queued",
+                "count": len(flagged_transactions),
+                "scan_id": flagged_data["scan_id"],
+                "message": f"Alert queued for {len(flagged_transactions)} suspicious transactions",
+                "delivery_id": delivery_id,
+            }
                 
         except Exception as e:
             self._log_audit_action("notification_error", f"Error: {str(e)}", "error")
@@ -90,21 +359,7 @@ class AuditorDashboardService:
     def _log_audit_action(self, action: str, details: str, user: str = "system"):
         """Log audit actions."""
         try:
-            log_entry = {
-                "timestamp": datetime.now().isoformat(),
-                "action": action,
-                "details": details,
-                "status": "success",
-                "user": user
-            }
-            
-            if os.path.exists(self.audit_log_file):
-                df = pd.read_csv(self.audit_log_file)
-                df = pd.concat([df, pd.DataFrame([log_entry])], ignore_index=True)
-            else:
-                df = pd.DataFrame([log_entry])
-            
-            df.to_csv(self.audit_log_file, index=False)
-            
+            with span("audit_log"):
+                audit_logger.log(action, details, user)
         except Exception as e:
             print(f"Failed to log audit action: {e}")
@@ -0,0 +1,270 @@
+"""
+Offline batch scoring of large CSV (optionally gzip-compressed), Parquet,
+Arrow IPC or .npy files with the same model and feature alignment as the API.
+
+The input is streamed in fixed-size chunks: the next chunk is parsed on a
+background thread while the current one is scored across --workers processes
+(parallel_scoring), and results are appended to a CSV (gzip-compressed when
+the output path ends in .gz) as each chunk finishes. After every chunk a
+checkpoint records the rows done and the output's length, so rerunning the
+same command after an interruption truncates any partly written chunk and
+continues from there. The checkpoint is removed once the run completes.
+
+Usage (from the project root):
+    python -m backend.services.batch_score transactions.csv.gz scored.csv
+    python -m backend.services.batch_score transactions.parquet flagged.csv --flagged-only --workers 8
+"""
+import argparse
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Tuple
+from backend.core.config import settings
+
+DEFAULT_CHUNK_ROWS = 200000
+PROGRESS_INTERVAL = 5.0
+PREFETCH_CHUNKS = 2
+
+class CheckpointMismatch(Exception):
+    """Raised when a checkpoint belongs to another input, model or set of options."""
+
+def _configure_offline():
+    """
+    An offline run is not the API: rows are scored once, so the row cache only
+    costs hashing; its batches are not traffic for the drift monitor; and
+    velocity state is checkpointed with the run rather than snapshotted over
+    the server's. Every chunk, however small, goes to the process pool.
+    """
+    settings.ROW_CACHE_SIZE = 0
+    settings.DRIFT_WINDOW_ROWS = 0
+    settings.VELOCITY_SNAPSHOT_INTERVAL = 0
+    settings.PARALLEL_MIN_ROWS = 0
+
+def _prefetch(chunks: Iterable, depth: int = PREFETCH_CHUNKS) -> Iterator:
+    """Produce chunks on a background thread, up to depth ahead of the consumer."""
+    buffer: "queue.Queue" = queue.Queue(maxsize=depth)
+    done = object()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                if stop.is_set():
+                    return
+                buffer.put(chunk)
+            buffer.put(done)
+        except BaseException as e:
+            buffer.put(e)
+
+    thread = threading.Thread(target=produce, name="batch-score-reader", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def _input_format(path: str, source: BinaryIO, fmt: str) -> str:
+    from backend.services.ingest import detect_format
+
+    if fmt != "auto":
+        return fmt
+    if path.endswith(".gz"):
+        return "csv"
+    return detect_format(source, filename=path)
+
+def _total_rows(path: str, fmt: str) -> Optional[int]:
+    """Row count of formats that record it up front; for the rest progress is measured in bytes read."""
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    if fmt == "npy":
+        import numpy as np
+        return np.load(path, mmap_mode="r").shape[0]
+    return None
+
+def _scored_chunks(source: BinaryIO, path: str, fmt: str, version, chunk_rows: int, skip_rows: int) -> Iterator:
+    """Score the input from row skip_rows on, yielding _score-shaped frames in input order."""
+    from backend.services.ingest import read_feature_chunks
+    from backend.services.model_service import predict_chunks, read_csv_chunks, score_feature_chunks, timed_chunks
+    from backend.services.velocity import base_features
+
+    if fmt == "csv":
+        text = gzip.GzipFile(fileobj=source, mode="rb") if path.endswith(".gz") else source
+        return predict_chunks(_prefetch(read_csv_chunks(text, chunk_rows, version, skip_rows=skip_rows)), version)
+    chunks = read_feature_chunks(source, fmt, base_features(version.feature_names), chunk_rows)
+    # Binary formats are cut at the same offsets every time, so finished chunks are skipped whole
+    remaining = (chunk for chunk in timed_chunks(chunks, f"{fmt}_decode") if chunk.start >= skip_rows)
+    return score_feature_chunks(_prefetch(remaining), version)
+
+def _output_frame(result_df, with_features: bool, flagged_only: bool):
+    if flagged_only:
+        result_df = result_df[result_df["flagged"].to_numpy()]
+    if not with_features:
+        end = list(result_df.columns).index("risk_tier") + 1
+        result_df = result_df.iloc[:, :end]
+    return result_df
+
+def _encode(frame, header: bool, compress: bool) -> bytes:
+    data = frame.to_csv(header=header, index_label="row").encode()
+    # Each chunk is its own gzip member, so the file can be cut back to any chunk boundary
+    return gzip.compress(data, compresslevel=6) if compress else data
+
+def _load_checkpoint(path: str) -> Optional[Dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _save_checkpoint(path: str, state: Dict):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _check_resumable(checkpoint: Dict, expected: Dict):
+    for key, value in expected.items():
+        if checkpoint.get(key) != value:
+            raise CheckpointMismatch(
+                f"Checkpoint was written with {key}={checkpoint.get(key)!r}, this run has {value!r}; "
+                f"rerun with --restart to start over"
+            )
+
+def _remove(path: Optional[str]):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def _format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+def run(args) -> Tuple[int, int]:
+    """Score args.input into args.output, resuming from args.checkpoint; returns (rows, flagged)."""
+    _configure_offline()
+    from backend.services.model_registry import model_registry
+    from backend.services.parallel_scoring import parallel_scorer
+    from backend.services.velocity import uses_velocity, velocity_engine
+
+    version = model_registry.load(args.model, args.scaler)
+    parallel_scorer.workers = args.workers
+    checkpoint_path = args.checkpoint or f"{args.output}.ckpt"
+    input_size = os.path.getsize(args.input)
+    expected = {
+        "input": os.path.abspath(args.input),
+        "input_size": input_size,
+        "model_version": version.version,
+        "flagged_only": args.flagged_only,
+        "with_features": args.with_features,
+    }
+
+    checkpoint = None if args.restart else _load_checkpoint(checkpoint_path)
+    if checkpoint is not None:
+        _check_resumable(checkpoint, expected)
+        chunk_rows = checkpoint["chunk_rows"]
+        rows, flagged, output_bytes = checkpoint["rows"], checkpoint["flagged"], checkpoint["output_bytes"]
+        if not os.path.exists(args.output) or os.path.getsize(args.output) < output_bytes:
+            raise CheckpointMismatch(f"{args.output} is shorter than its checkpoint; rerun with --restart to start over")
+        velocity_path = checkpoint.get("velocity_state")
+        if velocity_path and not velocity_engine.load(velocity_path):
+            raise CheckpointMismatch(f"Velocity state {velocity_path} is missing; rerun with --restart to start over")
+        print(f"Resuming {args.input} after {rows} rows ({flagged} flagged)")
+    else:
+        chunk_rows = args.chunk_size
+        rows, flagged, output_bytes = 0, 0, 0
+        velocity_path = None
+
+    compress = args.output.endswith(".gz")
+    velocity = uses_velocity(version.feature_names)
+    print(f"Scoring {args.input} ({input_size / 1e6:.1f} MB) with model {version.version} "
+          f"on {args.workers} workers, {chunk_rows} rows per chunk")
+
+    started = time.perf_counter()
+    session_rows, last_report = 0, started
+    with open(args.input, "rb") as source, open(args.output, "ab") as out:
+        # Drop whatever was written after the last checkpoint
+        out.truncate(output_bytes)
+        fmt = _input_format(args.input, source, args.format)
+        total_rows = _total_rows(args.input, fmt)
+        for result_df in _scored_chunks(source, args.input, fmt, version, chunk_rows, rows):
+            frame = _output_frame(result_df, args.with_features, args.flagged_only)
+            out.write(_encode(frame, header=output_bytes == 0, compress=compress))
+            out.flush()
+            os.fsync(out.fileno())
+            output_bytes = out.tell()
+
+            rows += len(result_df)
+            flagged += int(result_df["flagged"].sum())
+            session_rows += len(result_df)
+            previous_velocity_path = velocity_path
+            if velocity:
+                # Named by row count so the state the checkpoint points at is never overwritten before it moves on
+                velocity_path = f"{checkpoint_path}.{rows}.npz"
+                velocity_engine.save(velocity_path)
+            _save_checkpoint(checkpoint_path, {
+                **expected, "chunk_rows": chunk_rows, "rows": rows, "flagged": flagged,
+                "output_bytes": output_bytes, "velocity_state": velocity_path,
+            })
+            _remove(previous_velocity_path)
+
+            now = time.perf_counter()
+            if now - last_report >= args.progress_interval:
+                last_report = now
+                elapsed = now - started
+                if total_rows:
+                    fraction = rows / total_rows
+                else:
+                    # Compressed bytes read for gzip; the reader runs a chunk or two ahead
+                    fraction = min(source.tell() / input_size, 1.0) if input_size else 1.0
+                eta = elapsed * (1 - fraction) / fraction if fraction > 0 else float("nan")
+                print(f"{rows} rows, {flagged} flagged, {session_rows / elapsed:,.0f} rows/s, "
+                      f"{fraction:.1%} of input, ETA {_format_eta(eta) if eta == eta else '?'}")
+
+    elapsed = time.perf_counter() - started
+    print(f"Scored {rows} rows ({flagged} flagged) into {args.output} in {elapsed:.1f}s "
+          f"({session_rows / elapsed if elapsed else 0:,.0f} rows/s)")
+    _remove(checkpoint_path)
+    _remove(velocity_path)
+    return rows, flagged
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV, .csv.gz, Parquet, Arrow IPC or .npy file to score")
+    parser.add_argument("output", help="CSV to append results to (.gz to compress)")
+    parser.add_argument("--format", default="auto", choices=["auto", "csv", "parquet", "arrow", "npy"])
+    parser.add_argument("--flagged-only", action="store_true", help="Write only the rows the model flags")
+    parser.add_argument("--with-features", action="store_true", help="Also write the model's feature columns")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows per chunk (fixed by the first run)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Scoring processes (default: all cores)")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: <output>.ckpt)")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over")
+    parser.add_argument("--model", default=settings.MODEL_PATH, help="Model .joblib or .forest artifact")
+    parser.add_argument("--scaler", default=settings.SCALER_PATH)
+    parser.add_argument("--progress-interval", type=float, default=PROGRESS_INTERVAL, help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    from backend.services.parallel_scoring import parallel_scorer
+
+    try:
+        run(args)
+    except KeyboardInterrupt:
+        print(f"Interrupted; rerun the same command to resume from {args.checkpoint or args.output + '.ckpt'}")
+        raise SystemExit(130)
+    except CheckpointMismatch as e:
+        print(f"Cannot resume: {e}")
+        raise SystemExit(2)
+    finally:
+        parallel_scorer.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import asyncio
+import time
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+from backend.core.config import settings
+from backend.core.metrics import gauge, histogram
+from backend.services.model_registry import ModelVersion
+from backend.services.model_service import score_matrix
+
+batch_size_histogram = histogram(
+    "score_batch_size", "Transactions per scoring batch",
+    [1, 2, 4, 8, 16, 32, 64, 128, 256],
+)
+queue_wait_histogram = histogram(
+    "score_queue_wait_seconds", "Time a transaction waited before its batch was scored",
+    [0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1],
+)
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-transaction requests into small scoring batches.
+
+    Whatever is queued when the scorer becomes free is taken as one batch. The
+    batcher only waits (up to max_wait_ms) for more requests when the previous
+    batch held more than one, so a lone request is scored immediately while a
+    busy stream fills batches up to max_batch_size. One batch is scored at a time
+    in a worker thread, keeping the event loop free. Each request is scored by
+    the model version it was submitted with, so a batch spanning a model reload
+    is scored as one sub-batch per version.
+    """
+
+    def __init__(
+        self,
+        score_fn: Callable[[np.ndarray, Optional[ModelVersion]], Tuple[np.ndarray, np.ndarray]],
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None,
+    ):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size or settings.SCORE_MAX_BATCH_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.SCORE_MAX_WAIT_MS) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_batch_size = 0
+
+    async def submit(self, features: np.ndarray, version: Optional[ModelVersion] = None) -> Tuple[float, int]:
+        """
+        Score one feature vector with version (the model its features were built
+        for; default: whichever is active when its batch runs) and return
+        (fraud_score, predicted_label).
+        """
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((features, version, future, time.perf_counter()))
+        return await future
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def stop(self):
+        """Cancel the batching loop; requests still queued fail with CancelledError."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue is not None and not self._queue.empty():
+            _, _, future, _ = self._queue.get_nowait()
+            future.cancel()
+
+    async def _collect(self) -> List:
+        batch = [await self._queue.get()]
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+        if self._last_batch_size > 1 and self.max_wait > 0:
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            self._last_batch_size = len(batch)
+
+            dispatched = time.perf_counter()
+            for _, _, _, enqueued in batch:
+                queue_wait_histogram.observe(dispatched - enqueued)
+
+            # Feature vectors built for different model versions cannot be stacked or scored together
+            groups: Dict[int, List] = {}
+            for item in batch:
+                groups.setdefault(id(item[1]), []).append(item)
+            try:
+                for group in groups.values():
+                    await self._score(group)
+            except asyncio.CancelledError:
+                for _, _, future, _ in batch:
+                    future.cancel()
+                raise
+
+    async def _score(self, group: List):
+        batch_size_histogram.observe(len(group))
+        try:
+            X = np.stack([features for features, _, _, _ in group])
+            scores, labels = await asyncio.get_running_loop().run_in_executor(None, self.score_fn, X, group[0][1])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            for _, _, future, _ in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, _, future, _), score, label in zip(group, scores, labels):
+            if not future.done():
+                future.set_result((float(score), int(label)))
+
+score_batcher = MicroBatcher(score_matrix)
+gauge("score_queue_depth", "Transactions waiting for the /score micro-batcher", fn=lambda: score_batcher.queue_depth)
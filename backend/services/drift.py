@@ -0,0 +1,323 @@
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from backend.core.config import settings
+from backend.core.metrics import counter, gauge
+from backend.services.audit_service import audit_logger
+from backend.services.model_registry import ModelVersion, model_registry
+
+SCORE_FEATURE = "fraud_score"
+QUANTILES = (0.01, 0.5, 0.99)
+# Floor for empty bins in PSI, so a bin seen on one side only doesn't make it infinite
+_PSI_FLOOR = 1e-4
+
+def quantile_cuts(values: np.ndarray, bins: int) -> np.ndarray:
+    """
+    Bin boundaries splitting values into `bins` bins of equal mass; the
+    QUANTILES are boundaries too, so they can be read back exactly.
+    Repeated boundaries (discrete features) are merged.
+    """
+    levels = np.union1d(np.linspace(0, 1, bins + 1)[1:-1], QUANTILES)
+    return np.unique(np.quantile(values, levels))
+
+def bin_counts(values: np.ndarray, cuts: np.ndarray) -> np.ndarray:
+    """Counts of values in the len(cuts) + 1 bins the cuts define (NaN lands in the last)."""
+    return np.bincount(np.searchsorted(cuts, values, side="right"), minlength=len(cuts) + 1)
+
+def reference_histograms(X_scaled: np.ndarray, scores: np.ndarray, feature_names: Sequence[str]) -> Dict:
+    """
+    Training-time distributions for the drift monitor, stored in the model's
+    metadata: DRIFT_BINS equal-mass bins of each scaled feature and of fraud_score.
+    """
+    X_scaled = np.asarray(X_scaled, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+    features = []
+    for j in range(X_scaled.shape[1]):
+        cuts = quantile_cuts(X_scaled[:, j], settings.DRIFT_BINS)
+        features.append({"cuts": cuts.tolist(), "counts": bin_counts(X_scaled[:, j], cuts).tolist()})
+    score_cuts = quantile_cuts(scores, settings.DRIFT_BINS)
+    return {
+        "features": [str(name) for name in feature_names],
+        "feature_bins": features,
+        "score_bins": {"cuts": score_cuts.tolist(), "counts": bin_counts(scores, score_cuts).tolist()},
+    }
+
+def psi(observed: np.ndarray, expected: np.ndarray) -> float:
+    """Population stability index of binned counts against the reference counts."""
+    p = np.maximum(observed / max(observed.sum(), 1), _PSI_FLOOR)
+    q = np.maximum(expected / max(expected.sum(), 1), _PSI_FLOOR)
+    return float(((p - q) * np.log(p / q)).sum())
+
+def ks(observed: np.ndarray, expected: np.ndarray) -> float:
+    """Kolmogorov-Smirnov distance between binned distributions, measured at the bin boundaries."""
+    p = np.cumsum(observed) / max(observed.sum(), 1)
+    q = np.cumsum(expected) / max(expected.sum(), 1)
+    return float(np.abs(p - q).max())
+
+def _quantiles(counts: np.ndarray, cuts: np.ndarray) -> List[Optional[float]]:
+    """QUANTILES read off a histogram, interpolating between bin boundaries (clamped to the outer ones)."""
+    total = counts.sum()
+    if total == 0 or len(cuts) == 0:
+        return [None] * len(QUANTILES)
+    cdf = np.cumsum(counts[:-1]) / total
+    return np.interp(QUANTILES, cdf, cuts).tolist()
+
+class _Sketch:
+    """Running moments and histograms of one window of batches; its size doesn't grow with the rows seen."""
+
+    def __init__(self, reference: "_Reference"):
+        n_features = reference.n_features
+        self.rows = 0
+        self.sampled = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.feature_counts = [np.zeros(len(cuts) + 1, dtype=np.int64) for cuts in reference.feature_cuts]
+        self.score_counts = np.zeros(len(reference.score_cuts) + 1, dtype=np.int64)
+        self.score_sum = 0.0
+        self.score_sq_sum = 0.0
+        self.flagged = 0
+
+    def merge(self, other: "_Sketch"):
+        # Chan et al.'s pairwise update of mean and sum of squared deviations
+        n = self.sampled + other.sampled
+        if other.sampled:
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta ** 2 * (self.sampled * other.sampled / n)
+            self.mean += delta * (other.sampled / n)
+        self.sampled = n
+        self.rows += other.rows
+        for counts, more in zip(self.feature_counts, other.feature_counts):
+            counts += more
+        self.score_counts += other.score_counts
+        self.score_sum += other.score_sum
+        self.score_sq_sum += other.score_sq_sum
+        self.flagged += other.flagged
+
+class _Reference:
+    """
+    What a model was trained on: the scaler's mean_/var_ and, when train_model.py
+    recorded them, binned distributions of every feature and of fraud_score.
+    Bin boundaries are kept in raw feature units, so batches are binned unscaled.
+    """
+
+    def __init__(self, version: ModelVersion):
+        scaler = version.scaler
+        n_features = len(version.feature_names) or int(getattr(scaler, "n_features_in_", 0))
+        self.feature_names = list(version.feature_names) or [str(i) for i in range(n_features)]
+        mean, scale = getattr(scaler, "mean_", None), getattr(scaler, "scale_", None)
+        self.mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+        self.var = self.scale ** 2
+
+        stored = version.metadata.get("drift_reference")
+        if stored and stored.get("features") == self.feature_names:
+            self.source = "training"
+            self.feature_cuts = [
+                self.mean[j] + self.scale[j] * np.asarray(bins["cuts"], dtype=np.float64)
+                for j, bins in enumerate(stored["feature_bins"])
+            ]
+            self.feature_counts = [np.asarray(bins["counts"], dtype=np.int64) for bins in stored["feature_bins"]]
+            self.score_cuts = np.asarray(stored["score_bins"]["cuts"], dtype=np.float64)
+            self.score_counts = np.asarray(stored["score_bins"]["counts"], dtype=np.int64)
+        else:
+            # No recorded distributions: fixed-width bins, and the first full window becomes the baseline
+            self.source = "pending"
+            z_cuts = np.linspace(-settings.DRIFT_Z_RANGE, settings.DRIFT_Z_RANGE, settings.DRIFT_BINS + 1)
+            self.feature_cuts = [self.mean[j] + self.scale[j] * z_cuts for j in range(n_features)]
+            self.feature_counts = None
+            self.score_cuts = np.linspace(-settings.DRIFT_SCORE_RANGE, settings.DRIFT_SCORE_RANGE, settings.DRIFT_BINS + 1)
+            self.score_counts = None
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_names)
+
+class DriftMonitor:
+    """
+    Compares what the active model scores against what it was trained on.
+
+    Every scored batch updates a sketch of constant size: running mean and
+    variance per feature, and histograms of each feature and of fraud_score
+    over the training data's equal-mass bins (quantile boundaries). At most
+    DRIFT_SAMPLE_ROWS rows of a batch, an even stride through it, go into the
+    histograms and feature moments; score mean and flagged rate count every row.
+
+    Each DRIFT_WINDOW_ROWS rows the window is compared with the training
+    reference: mean shift and variance ratio against the scaler's mean_/var_,
+    PSI and KS against the histograms train_model.py records in the model
+    metadata (for models without them, against the first window). Features
+    whose PSI or KS crosses DRIFT_PSI_THRESHOLD / DRIFT_KS_THRESHOLD are
+    logged and audited when they start drifting. Activating another model
+    starts over.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reference: Optional[_Reference] = None
+        self._window: Optional[_Sketch] = None
+        self.version: Optional[str] = None
+        self.rows_observed = 0
+        self._last_report: Optional[Dict] = None
+        self._drifting: set = set()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.DRIFT_WINDOW_ROWS > 0
+
+    @property
+    def drifting(self) -> int:
+        return len(self._drifting)
+
+    def reset(self, version: ModelVersion):
+        reference = _Reference(version)
+        with self._lock:
+            self._reference = reference
+            self._window = _Sketch(reference)
+            self.version = version.version
+            self.rows_observed = 0
+            self._last_report = None
+            self._drifting = set()
+
+    def observe(self, X, scores: np.ndarray, version: ModelVersion):
+        """Add a scored batch (raw feature rows in the model's feature order) to the current window."""
+        if not self.enabled or len(scores) == 0:
+            return
+        if version.version != self.version:
+            # Batches pinned to a model that is no longer active are not monitored
+            if version is not model_registry.active():
+                return
+            self.reset(version)
+        reference = self._reference
+        if X.shape[1] != reference.n_features:
+            return
+
+        batch = self._sketch(X, scores, reference)
+        with self._lock:
+            if reference is not self._reference:
+                return
+            self._window.merge(batch)
+            self.rows_observed += batch.rows
+            if self._window.rows < settings.DRIFT_WINDOW_ROWS:
+                return
+            window, self._window = self._window, _Sketch(reference)
+            if reference.source == "pending":
+                reference.source = "first_window"
+                reference.feature_counts = window.feature_counts
+                reference.score_counts = window.score_counts
+            report = self._evaluate(window, reference)
+            self._last_report = report
+            started = [name for name in report["drifted"] if name not in self._drifting]
+            self._drifting = set(report["drifted"])
+
+        for name in started:
+            self._alert(name, report)
+
+    def report(self) -> Dict:
+        """
+        Drift of the current window once it holds DRIFT_MIN_ROWS rows, else of
+        the last completed window (or the current one if none has completed).
+        """
+        if self.version is None:
+            self.reset(model_registry.active())
+        with self._lock:
+            if self._last_report is not None and self._window.rows < settings.DRIFT_MIN_ROWS:
+                return self._last_report
+            return self._evaluate(self._window, self._reference)
+
+    def max_psi(self) -> float:
+        report = self._last_report
+        values = [stats["psi"] for stats in (report or {}).get("features", {}).values() if stats["psi"] is not None]
+        return max(values, default=0.0)
+
+    @staticmethod
+    def _sketch(X, scores: np.ndarray, reference: _Reference) -> _Sketch:
+        stride = max(1, -(-len(X) // settings.DRIFT_SAMPLE_ROWS))
+        sample = X.iloc[::stride] if isinstance(X, pd.DataFrame) else X[::stride]
+        sample = np.asarray(sample, dtype=np.float64)
+        scores = np.asarray(scores, dtype=np.float64)
+
+        batch = _Sketch(reference)
+        batch.rows = len(scores)
+        batch.sampled = len(sample)
+        batch.mean = sample.mean(axis=0)
+        batch.m2 = ((sample - batch.mean) ** 2).sum(axis=0)
+        # One contiguous row per feature; searchsorted on strided columns is several times slower
+        columns = np.ascontiguousarray(sample.T)
+        batch.feature_counts = [bin_counts(column, cuts) for column, cuts in zip(columns, reference.feature_cuts)]
+        batch.score_counts = bin_counts(scores[::stride], reference.score_cuts)
+        batch.score_sum = float(scores.sum())
+        batch.score_sq_sum = float(np.dot(scores, scores))
+        batch.flagged = int(np.count_nonzero(scores < 0))
+        return batch
+
+    def _evaluate(self, window: _Sketch, reference: _Reference) -> Dict:
+        compared = reference.feature_counts is not None and window.sampled > 0
+        variance = window.m2 / max(window.sampled, 1)
+
+        features = {}
+        for j, name in enumerate(reference.feature_names):
+            counts = window.feature_counts[j]
+            features[name] = {
+                "mean": float(window.mean[j]) if window.sampled else None,
+                "std": float(np.sqrt(variance[j])) if window.sampled else None,
+                # In training standard deviations
+                "mean_shift": float((window.mean[j] - reference.mean[j]) / reference.scale[j]) if window.sampled else None,
+                "variance_ratio": float(variance[j] / reference.var[j]) if window.sampled and reference.var[j] else None,
+                "psi": psi(counts, reference.feature_counts[j]) if compared else None,
+                "ks": ks(counts, reference.feature_counts[j]) if compared else None,
+                "quantiles": self._named_quantiles(counts, reference.feature_cuts[j]),
+            }
+
+        score_mean = window.score_sum / window.rows if window.rows else None
+        scored = compared and window.rows > 0
+        score = {
+            "mean": score_mean,
+            "std": float(np.sqrt(max(window.score_sq_sum / window.rows - score_mean ** 2, 0.0))) if window.rows else None,
+            "flagged_rate": window.flagged / window.rows if window.rows else None,
+            "psi": psi(window.score_counts, reference.score_counts) if scored else None,
+            "ks": ks(window.score_counts, reference.score_counts) if scored else None,
+            "quantiles": self._named_quantiles(window.score_counts, reference.score_cuts),
+        }
+
+        drifted = [
+            name for name, stats in list(features.items()) + [(SCORE_FEATURE, score)]
+            if stats["psi"] is not None
+            and (stats["psi"] > settings.DRIFT_PSI_THRESHOLD or stats["ks"] > settings.DRIFT_KS_THRESHOLD)
+        ]
+        return {
+            "version": self.version,
+            "reference": reference.source,
+            "evaluated_at": datetime.utcnow(),
+            "window_rows": window.rows,
+            "sampled_rows": window.sampled,
+            "rows_observed": self.rows_observed,
+            "psi_threshold": settings.DRIFT_PSI_THRESHOLD,
+            "ks_threshold": settings.DRIFT_KS_THRESHOLD,
+            "drifted": drifted,
+            "score": score,
+            "features": features,
+        }
+
+    @staticmethod
+    def _named_quantiles(counts: np.ndarray, cuts: np.ndarray) -> Dict[str, Optional[float]]:
+        return {f"p{round(q * 100)}": value for q, value in zip(QUANTILES, _quantiles(counts, cuts))}
+
+    @staticmethod
+    def _alert(name: str, report: Dict):
+        stats = report["score"] if name == SCORE_FEATURE else report["features"][name]
+        message = (
+            f"Drift in {name} over the last {report['window_rows']} rows (model {report['version']}): "
+            f"PSI={stats['psi']:.3f} KS={stats['ks']:.3f}"
+        )
+        print(f"Drift alert: {message}")
+        counter("drift_alerts_total", "Features that started drifting from the training data", {"feature": name}).inc()
+        audit_logger.log("drift_alert", message, status="warning")
+
+drift_monitor = DriftMonitor()
+
+model_registry.on_activate(drift_monitor.reset)
+
+gauge("drift_max_feature_psi", "Largest feature PSI of the last completed drift window", fn=drift_monitor.max_psi)
+gauge("drift_features_drifting", "Features (and fraud_score) over a drift threshold", fn=lambda: drift_monitor.drifting)
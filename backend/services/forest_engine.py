@@ -0,0 +1,384 @@
+import hashlib
+import json
+import os
+import struct
+import numpy as np
+from typing import Callable, Dict, Optional, Tuple
+from sklearn.ensemble import IsolationForest
+from sklearn.ensemble._iforest import _average_path_length
+from sklearn.preprocessing import StandardScaler
+
+def _floor_float32(values: np.ndarray) -> np.ndarray:
+    """Round float64 values down to float32, so x <= t and x <= result agree for any float32 x."""
+    rounded = values.astype(np.float32)
+    too_high = rounded.astype(np.float64) > values
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+ARTIFACT_SUFFIX = ".forest"
+ARTIFACT_MAGIC = b"CFOREST\0"
+# 2: thresholds are in scaled units and the scaler's mean/scale are stored as arrays
+ARTIFACT_FORMAT = 2
+# magic, format version, header length
+_PREAMBLE = struct.Struct("<8sII")
+# Arrays start on cache-line boundaries
+_ALIGN = 64
+_ARRAYS = ("feature", "threshold", "children", "path_length", "roots", "node_samples", "mean", "scale")
+
+def is_artifact(path: str) -> bool:
+    return path.endswith(ARTIFACT_SUFFIX)
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+def _index_dtype(limit: int) -> np.dtype:
+    """The narrowest of int16/int32/int64 holding values below limit."""
+    for dtype in (np.int16, np.int32):
+        if limit <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+class CompiledForest:
+    """
+    A fitted IsolationForest flattened into contiguous node arrays.
+
+    All trees share one set of arrays with global node ids: split feature, float32
+    threshold, children packed as [left, right] pairs, the path length credited
+    at each leaf (depth plus the expected depth of the unsplit samples) and the
+    training samples that reached each node (used for explanations). Feature and
+    child indices use the narrowest integer type that fits (int16 / int32). Leaves are
+    self-loops, so every (tree, row) pair is advanced in lockstep for max_depth
+    steps without branching. When a StandardScaler is given, raw rows are scaled
+    one small block at a time exactly as StandardScaler.transform would (in the
+    input's float dtype, then cast to float32 like sklearn's trees), so every
+    split goes the same way as in sklearn. Folding the scaler into the
+    thresholds instead would save that step but round differently near split
+    boundaries.
+
+    save() writes the arrays to a flat binary artifact behind a versioned JSON
+    header; load() memory-maps it, so processes loading the same file share one
+    copy of the forest through the page cache.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        children: np.ndarray,
+        path_length: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        n_features: int,
+        average_path_length: float,
+        offset: float,
+        node_samples: Optional[np.ndarray] = None,
+        mean: Optional[np.ndarray] = None,
+        scale: Optional[np.ndarray] = None,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.path_length = path_length
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features = n_features
+        self.average_path_length = average_path_length
+        self.offset = offset
+        self.node_samples = node_samples
+        # StandardScaler parameters, None where the scaler does not apply them
+        self.mean = mean
+        self.scale = scale
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model: IsolationForest, scaler: Optional[StandardScaler] = None) -> "CompiledForest":
+        """Flatten a fitted IsolationForest, optionally with the StandardScaler its inputs go through."""
+        n_features = model.n_features_in_
+        mean = scale = None
+        if scaler is not None:
+            if scaler.with_mean and getattr(scaler, "mean_", None) is not None:
+                mean = np.asarray(scaler.mean_, dtype=np.float64)
+            if scaler.with_std and getattr(scaler, "scale_", None) is not None:
+                scale = np.asarray(scaler.scale_, dtype=np.float64)
+
+        features, thresholds, lefts, rights, path_lengths, roots, samples = [], [], [], [], [], [], []
+        max_depth = 0
+        base = 0
+        for estimator, tree_features in zip(model.estimators_, model.estimators_features_):
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            children_left = tree.children_left
+            children_right = tree.children_right
+            is_leaf = children_left == -1
+
+            # Node depths (root = 0); children always have larger ids than their parent
+            depth = np.zeros(n_nodes, dtype=np.int64)
+            for node in range(n_nodes):
+                if not is_leaf[node]:
+                    depth[children_left[node]] = depth[node] + 1
+                    depth[children_right[node]] = depth[node] + 1
+            max_depth = max(max_depth, int(depth.max()))
+
+            node_ids = np.arange(n_nodes)
+            feature = np.where(is_leaf, 0, np.asarray(tree_features)[np.maximum(tree.feature, 0)])
+            threshold = np.where(is_leaf, np.inf, tree.threshold)
+
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(np.where(is_leaf, node_ids, children_left) + base)
+            rights.append(np.where(is_leaf, node_ids, children_right) + base)
+            path_lengths.append(np.where(is_leaf, depth + _average_path_length(tree.n_node_samples), 0.0))
+            samples.append(tree.n_node_samples)
+            roots.append(base)
+            base += n_nodes
+
+        # node * 2 + 1 indexes children, so node ids must stay below half the type's range
+        children = np.empty(2 * base, dtype=_index_dtype(2 * base))
+        children[0::2] = np.concatenate(lefts)
+        children[1::2] = np.concatenate(rights)
+        return cls(
+            feature=np.concatenate(features).astype(_index_dtype(n_features)),
+            threshold=_floor_float32(np.concatenate(thresholds)),
+            children=children,
+            path_length=np.concatenate(path_lengths).astype(np.float64),
+            roots=np.asarray(roots, dtype=children.dtype),
+            max_depth=max_depth,
+            n_features=n_features,
+            average_path_length=float(_average_path_length([model._max_samples])[0]),
+            offset=float(model.offset_),
+            node_samples=np.concatenate(samples).astype(np.int32),
+            mean=mean,
+            scale=scale,
+        )
+
+    def _block(self, X: np.ndarray, start: int, block_size: int) -> np.ndarray:
+        """Rows start:start + block_size as the float32 values sklearn's trees would compare."""
+        rows = X[start:start + block_size]
+        if self.mean is None and self.scale is None:
+            return np.ascontiguousarray(rows, dtype=np.float32)
+        # Same steps as StandardScaler.transform: float32 input stays float32, the rest is float64
+        block = np.array(rows, dtype=np.float32 if rows.dtype == np.float32 else np.float64)
+        if self.mean is not None:
+            block -= self.mean.astype(block.dtype)
+        if self.scale is not None:
+            block /= self.scale.astype(block.dtype)
+        return block.astype(np.float32, copy=False)
+
+    def _leaves(self, block: np.ndarray, trace: Optional[Callable[[int, np.ndarray, np.ndarray], None]] = None) -> np.ndarray:
+        """
+        Return the leaf reached by every row of a float32 block in every tree, shape (n_trees, n_rows).
+        trace, if given, is called after every step with (step, nodes before, nodes after).
+        """
+        n_rows = block.shape[0]
+        flat = block.reshape(-1)
+        # Flat offset of each (tree, row) pair's row within the block
+        row_base = np.tile(np.arange(n_rows, dtype=np.intp) * self.n_features, self.n_trees)
+        node = np.repeat(self.roots, n_rows).astype(self.children.dtype, copy=False)
+
+        # Buffers are reused across levels instead of allocating per step
+        feature = np.empty(len(node), dtype=self.feature.dtype)
+        index = np.empty(len(node), dtype=np.intp)
+        values = np.empty(len(node), dtype=np.float32)
+        thresholds = np.empty(len(node), dtype=np.float32)
+        go_right = np.empty(len(node), dtype=bool)
+        for step in range(self.max_depth):
+            if trace is not None:
+                parent = node.copy()
+            np.take(self.feature, node, out=feature)
+            np.add(feature, row_base, out=index)
+            np.take(flat, index, out=values)
+            np.take(self.threshold, node, out=thresholds)
+            np.greater(values, thresholds, out=go_right)
+            node *= 2
+            node += go_right
+            np.take(self.children, node, out=node)
+            if trace is not None:
+                trace(step, parent, node)
+        return node.reshape(self.n_trees, n_rows)
+
+    def score_samples(self, X: np.ndarray, block_size: int = 512) -> np.ndarray:
+        """Equivalent of IsolationForest.score_samples on scaler.transform of raw features."""
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[-1]}")
+
+        depths = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], block_size):
+            # Only one small, cache-resident block is scaled at a time
+            block = self._block(X, start, block_size)
+            depths[start:start + block_size] = self.path_length[self._leaves(block)].sum(axis=0)
+
+        if self.average_path_length == 0:
+            # One-sample trees: sklearn takes the normalised depth as 1, i.e. 2 ** -1
+            return -0.5 * np.ones_like(depths)
+        return -np.exp2(-depths / (self.n_trees * self.average_path_length))
+
+    def path_attributions(self, X: np.ndarray, block_size: int = 512) -> np.ndarray:
+        """
+        Per-row share of its isolation credited to each feature, shape (n_rows, n_features).
+
+        A split that sends a row from a node with n training samples to a child
+        with m is credited log2(n / m) for its feature, so along one path the
+        credits add up to how far the row was narrowed down, and a split that
+        cuts the row off from most of the data weighs most. Credits are summed
+        over trees and each row's shares sum to 1. Costs one traversal of the
+        forest, like scoring.
+        """
+        if self.node_samples is None:
+            raise ValueError("This forest was compiled without node sample counts")
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[-1]}")
+
+        log_samples = np.log2(np.maximum(self.node_samples, 1)).astype(np.float32)
+        shares = np.zeros((X.shape[0], self.n_features), dtype=np.float64)
+        for start in range(0, X.shape[0], block_size):
+            block = self._block(X, start, block_size)
+            n_rows = block.shape[0]
+            slots = np.empty((self.max_depth, self.n_trees * n_rows), dtype=self.feature.dtype)
+            credits = np.empty((self.max_depth, self.n_trees * n_rows), dtype=np.float32)
+
+            def record(step, parent, child):
+                # Leaves loop onto themselves, so steps past the leaf credit nothing
+                np.take(self.feature, parent, out=slots[step])
+                np.subtract(log_samples[parent], log_samples[child], out=credits[step])
+
+            self._leaves(block, record)
+            # (row, feature) slot of every credit
+            slots = slots.astype(np.intp) + np.tile(np.arange(n_rows, dtype=np.intp) * self.n_features, self.n_trees)
+            totals = np.bincount(slots.reshape(-1), weights=credits.reshape(-1), minlength=n_rows * self.n_features)
+            shares[start:start + n_rows] = totals.reshape(n_rows, self.n_features)
+
+        row_totals = shares.sum(axis=1, keepdims=True)
+        np.divide(shares, row_totals, out=shares, where=row_totals > 0)
+        return shares
+
+    def score(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (decision_function, predict) from a single traversal of the forest."""
+        scores = self.score_samples(X) - self.offset
+        labels = np.where(scores < 0, -1, 1)
+        return scores, labels
+
+    def save(self, path: str, metadata: Optional[Dict] = None) -> str:
+        """
+        Write the forest to a flat binary artifact; returns its content digest.
+
+        Layout: magic, format version and header length (little-endian), a JSON
+        header (scalar fields, the dtype/offset/shape of each array, a sha256 of
+        the array bytes and the caller's metadata), then the arrays in native
+        little-endian order, each aligned to 64 bytes. Written to a temporary
+        file and renamed, so readers never map a half-written artifact.
+        """
+        arrays = {name: getattr(self, name) for name in _ARRAYS if getattr(self, name) is not None}
+        digest = hashlib.sha256()
+        layout, offset = {}, 0
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+            arrays[name] = array
+            digest.update(array.tobytes())
+            layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset = _aligned(offset + array.nbytes)
+
+        header = json.dumps({
+            "max_depth": self.max_depth,
+            "n_features": self.n_features,
+            "average_path_length": self.average_path_length,
+            "offset": self.offset,
+            "arrays": layout,
+            "digest": digest.hexdigest(),
+            "metadata": metadata or {},
+        }).encode()
+        data_start = _aligned(_PREAMBLE.size + len(header))
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_PREAMBLE.pack(ARTIFACT_MAGIC, ARTIFACT_FORMAT, len(header)))
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(array.tobytes())
+            f.truncate(data_start + offset)
+        os.replace(tmp_path, path)
+        return digest.hexdigest()
+
+    @classmethod
+    def load(cls, path: str) -> Tuple["CompiledForest", Dict]:
+        """
+        Memory-map an artifact written by save(); returns the forest and the
+        header (whose "metadata" is what save() was given). Nothing is copied:
+        the arrays are read-only views of the file's pages.
+        """
+        header = read_artifact_header(path)
+        raw = np.memmap(path, dtype=np.uint8, mode="r")
+        data_start = _aligned(_PREAMBLE.size + header["length"])
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            start = data_start + spec["offset"]
+            count = int(np.prod(spec["shape"]))
+            arrays[name] = raw[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+        forest = cls(
+            max_depth=header["max_depth"],
+            n_features=header["n_features"],
+            average_path_length=header["average_path_length"],
+            offset=header["offset"],
+            node_samples=arrays.pop("node_samples", None),
+            mean=arrays.pop("mean", None),
+            scale=arrays.pop("scale", None),
+            **arrays,
+        )
+        return forest, header
+
+def read_artifact_header(path: str) -> Dict:
+    """The JSON header of an artifact (plus its byte length), without mapping the arrays."""
+    with open(path, "rb") as f:
+        magic, version, length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != ARTIFACT_MAGIC:
+            raise ValueError(f"{path} is not a compiled forest artifact")
+        if version != ARTIFACT_FORMAT:
+            raise ValueError(f"{path} has artifact format {version}; this version reads format {ARTIFACT_FORMAT}")
+        header = json.loads(f.read(length))
+    header["length"] = length
+    return header
+
+def export_artifact(model: IsolationForest, scaler: Optional[StandardScaler], path: str) -> str:
+    """
+    Compile a fitted model/scaler pair and save it as an artifact; the scaler's
+    parameters travel in the header, so the artifact is all the API needs.
+    Returns the content digest.
+    """
+    forest = CompiledForest.from_sklearn(model, scaler)
+    metadata = {"n_estimators": forest.n_trees, "contamination": getattr(model, "contamination", None)}
+    if scaler is not None:
+        metadata["feature_names"] = [str(name) for name in getattr(scaler, "feature_names_in_", [])]
+        metadata["scaler"] = {
+            name: np.asarray(getattr(scaler, f"{name}_"), dtype=np.float64).tolist()
+            for name in ("mean", "scale", "var") if getattr(scaler, f"{name}_", None) is not None
+        }
+        metadata["scaler"]["n_samples_seen"] = int(np.max(getattr(scaler, "n_samples_seen_", 0)))
+        metadata["scaler"]["with_mean"] = bool(scaler.with_mean)
+        metadata["scaler"]["with_std"] = bool(scaler.with_std)
+    return forest.save(path, metadata)
+
+def load_artifact(path: str) -> Tuple[CompiledForest, Optional[StandardScaler], Dict]:
+    """Memory-map an artifact from export_artifact(); returns (forest, rebuilt scaler, header)."""
+    forest, header = CompiledForest.load(path)
+    params = header["metadata"].get("scaler")
+    scaler = None
+    if params is not None:
+        # A fitted StandardScaler is just these attributes; transform() works as usual
+        scaler = StandardScaler(with_mean=params.get("with_mean", "mean" in params), with_std=params.get("with_std", "scale" in params))
+        for name in ("mean", "scale", "var"):
+            setattr(scaler, f"{name}_", np.asarray(params[name], dtype=np.float64) if name in params else None)
+        scaler.n_samples_seen_ = params.get("n_samples_seen", 0)
+        scaler.n_features_in_ = forest.n_features
+        if header["metadata"].get("feature_names"):
+            scaler.feature_names_in_ = np.asarray(header["metadata"]["feature_names"], dtype=object)
+    return forest, scaler, header
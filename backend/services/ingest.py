@@ -0,0 +1,181 @@
+import importlib
+import os
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+from backend.services.model_service import META_COLUMNS
+
+FORMATS = ("csv", "parquet", "arrow", "npy")
+
+_MAGIC = [
+    (b"PAR1", "parquet"),
+    (b"ARROW1", "arrow"),
+    (b"\xff\xff\xff\xff", "arrow"),  # Arrow IPC stream (continuation marker)
+    (b"\x93NUMPY", "npy"),
+]
+_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+    "application/vnd.apache.arrow.file": "arrow",
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/x-npy": "npy",
+}
+_EXTENSIONS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".arrows": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+    ".npy": "npy",
+}
+
+@dataclass
+class FeatureChunk:
+    """
+    A slice of an upload decoded straight into the model's feature matrix.
+
+    X is float32 with columns in the model's feature order; start is the offset
+    of its first row in the upload. Metadata columns are only converted to
+    pandas when meta() is called, after scoring.
+    """
+    X: np.ndarray
+    start: int
+    meta: Callable[[], Optional[pd.DataFrame]]
+
+    def __len__(self) -> int:
+        return self.X.shape[0]
+
+def _no_meta() -> None:
+    return None
+
+def detect_format(source: BinaryIO, filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
+    """Identify an upload by its magic bytes, then its content type, then its extension (default csv)."""
+    head = source.read(8)
+    source.seek(0)
+    for magic, fmt in _MAGIC:
+        if head.startswith(magic):
+            return fmt
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in _CONTENT_TYPES:
+        return _CONTENT_TYPES[content_type]
+    extension = os.path.splitext(filename or "")[1].lower()
+    return _EXTENSIONS.get(extension, "csv")
+
+def _import_pyarrow(module: str = "pyarrow"):
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise ValueError("Parquet and Arrow uploads require pyarrow (pip install pyarrow)")
+
+def _batch_matrix(batch, feature_names: List[str]) -> np.ndarray:
+    """Copy the feature columns of a record batch into one float32 matrix (one copy per column)."""
+    pa = _import_pyarrow()
+    # Column-major, so each Arrow column lands in one contiguous run; the scoring
+    # engine converts 512-row blocks to row-major as it goes
+    X = np.empty((batch.num_rows, len(feature_names)), dtype=np.float32, order="F")
+    for j, name in enumerate(feature_names):
+        column = batch.column(name)
+        if column.type != pa.float32():
+            column = column.cast(pa.float32())
+        X[:, j] = column.to_numpy(zero_copy_only=False)
+    return X
+
+def _lazy_meta(batch, meta_cols: List[str]) -> Callable[[], Optional[pd.DataFrame]]:
+    if not meta_cols:
+        return _no_meta
+    pa = _import_pyarrow()
+    return lambda: pa.Table.from_batches([batch]).select(meta_cols).to_pandas()
+
+def _arrow_chunks(batches, names: List[str], feature_names: List[str], chunk_rows: int) -> Iterator[FeatureChunk]:
+    missing = [name for name in feature_names if name not in names]
+    if missing:
+        raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+    meta_cols = [col for col in META_COLUMNS if col in names and col not in feature_names]
+
+    start = 0
+    for batch in batches:
+        # Slicing a record batch is zero-copy
+        for offset in range(0, batch.num_rows, chunk_rows):
+            piece = batch.slice(offset, chunk_rows)
+            yield FeatureChunk(_batch_matrix(piece, feature_names), start, _lazy_meta(piece, meta_cols))
+            start += piece.num_rows
+
+def read_parquet_chunks(source: BinaryIO, feature_names: List[str], chunk_rows: int) -> Iterator[FeatureChunk]:
+    """Read only the feature and metadata columns of a Parquet file, chunk_rows at a time."""
+    pq = _import_pyarrow("pyarrow.parquet")
+    parquet_file = pq.ParquetFile(source)
+    names = parquet_file.schema_arrow.names
+    columns = [col for col in feature_names + META_COLUMNS if col in names]
+    batches = parquet_file.iter_batches(batch_size=chunk_rows, columns=list(dict.fromkeys(columns)))
+    return _arrow_chunks(batches, names, feature_names, chunk_rows)
+
+def read_arrow_chunks(source: BinaryIO, feature_names: List[str], chunk_rows: int) -> Iterator[FeatureChunk]:
+    """Read an Arrow IPC file (Feather v2) or stream, chunk_rows at a time."""
+    pa = _import_pyarrow()
+    is_file = source.read(6) == b"ARROW1"
+    source.seek(0)
+    if is_file:
+        reader = pa.ipc.open_file(source)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    else:
+        reader = pa.ipc.open_stream(source)
+        batches = iter(reader)
+    return _arrow_chunks(batches, reader.schema.names, feature_names, chunk_rows)
+
+def read_npy_chunks(source: BinaryIO, feature_names: List[str], chunk_rows: int) -> Iterator[FeatureChunk]:
+    """
+    Read a 2-D float .npy matrix whose columns follow the model's feature order.
+    The header is parsed once and row blocks are viewed with np.frombuffer, so
+    float32 input is never converted or copied.
+    """
+    version = np.lib.format.read_magic(source)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(source)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(source)
+
+    if len(shape) != 2:
+        raise ValueError(f"Expected a 2-D feature matrix, got shape {shape}")
+    if dtype.kind != "f":
+        raise ValueError(f"Expected a float matrix, got dtype {dtype}")
+    if feature_names and shape[1] != len(feature_names):
+        raise ValueError(f"Expected {len(feature_names)} feature columns, got {shape[1]}")
+
+    n_rows, n_cols = shape
+    if fortran_order:
+        # Column-major files can't be read by row block; take the whole matrix
+        matrix = np.frombuffer(source.read(n_rows * n_cols * dtype.itemsize), dtype=dtype).reshape(shape, order="F")
+        blocks = ((start, matrix[start:start + chunk_rows]) for start in range(0, n_rows, chunk_rows))
+    else:
+        row_bytes = n_cols * dtype.itemsize
+        def read_blocks():
+            for start in range(0, n_rows, chunk_rows):
+                rows = min(chunk_rows, n_rows - start)
+                buffer = source.read(rows * row_bytes)
+                if len(buffer) != rows * row_bytes:
+                    raise ValueError("Truncated .npy file")
+                yield start, np.frombuffer(buffer, dtype=dtype).reshape(rows, n_cols)
+        blocks = read_blocks()
+
+    for start, X in blocks:
+        if X.dtype != np.float32:
+            X = X.astype(np.float32)
+        yield FeatureChunk(X, start, _no_meta)
+
+_READERS = {
+    "parquet": read_parquet_chunks,
+    "arrow": read_arrow_chunks,
+    "npy": read_npy_chunks,
+}
+
+def read_feature_chunks(source: BinaryIO, fmt: str, feature_names: List[str], chunk_rows: int) -> Iterator[FeatureChunk]:
+    """Decode a binary upload into FeatureChunks; CSV goes through model_service.read_csv_chunks instead."""
+    if fmt not in _READERS:
+        raise ValueError(f"Unsupported upload format: {fmt}")
+    if fmt != "npy" and not feature_names:
+        raise ValueError("The active model has no feature names; Parquet/Arrow columns can't be matched")
+    return _READERS[fmt](source, feature_names, chunk_rows)
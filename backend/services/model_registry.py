@@ -0,0 +1,408 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+from backend.core.config import settings
+from backend.core.metrics import counter, gauge, histogram
+from backend.services.forest_engine import CompiledForest, is_artifact, load_artifact, read_artifact_header
+
+def compile_engine(model, scaler) -> Optional[CompiledForest]:
+    """Build the fused scoring engine, or None if the model/scaler pair isn't supported."""
+    if not settings.USE_COMPILED_FOREST:
+        return None
+    if not isinstance(model, IsolationForest) or not isinstance(scaler, StandardScaler):
+        return None
+    return CompiledForest.from_sklearn(model, scaler)
+
+def _file_digest(*paths: str) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+def version_id(model_path: str, scaler_path: Optional[str] = None) -> str:
+    """The version id of a model/scaler pair (or an artifact): a digest of its content."""
+    if is_artifact(model_path):
+        # The header carries a digest of the arrays; no need to hash the whole file
+        return read_artifact_header(model_path)["digest"][:12]
+    return _file_digest(model_path, scaler_path)
+
+def metadata_path(model_path: str) -> str:
+    """Where ml_model/train_model.py writes the training metadata of a model."""
+    return os.path.splitext(model_path)[0] + ".meta.json"
+
+def _metadata_version_key(model_path: str) -> str:
+    # train_model records the version of each file set it wrote next to the metadata
+    return "artifact_version" if is_artifact(model_path) else "version"
+
+model_load_histogram = histogram(
+    "model_load_seconds", "Time to load and compile a model version",
+    [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60],
+)
+
+@dataclass
+class ModelVersion:
+    """An immutable, loaded model/scaler pair. Requests hold on to the version they started with."""
+    version: str
+    model: Any
+    scaler: Any
+    engine: Optional[CompiledForest]
+    model_path: str
+    scaler_path: str
+    feature_names: List[str]
+    contamination: Any
+    trained_at: Optional[datetime]
+    loaded_at: datetime = field(default_factory=datetime.utcnow)
+    # Training metadata from the .meta.json next to the model (empty if there is none)
+    metadata: Dict = field(default_factory=dict, repr=False, compare=False)
+    _explainer: Optional[CompiledForest] = field(default=None, repr=False, compare=False)
+
+    def score(self, X) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (fraud_score, predicted_label) for raw feature rows, in-process."""
+        if self.engine is not None:
+            # The engine applies the scaler itself; one traversal yields both score and label
+            return self.engine.score(X)
+
+        if isinstance(X, np.ndarray) and self.feature_names:
+            X = pd.DataFrame(X, columns=self.feature_names)
+
+        # Scale the data
+        X_scaled = self.scaler.transform(X)
+
+        # Get predictions and scores
+        return self.model.decision_function(X_scaled), self.model.predict(X_scaled)
+
+    def explainer(self) -> Optional[CompiledForest]:
+        """The compiled forest for path explanations; built on first use when scoring goes through sklearn."""
+        if self.engine is not None:
+            return self.engine
+        if self._explainer is None and isinstance(self.model, IsolationForest) and isinstance(self.scaler, StandardScaler):
+            self._explainer = CompiledForest.from_sklearn(self.model, self.scaler)
+        return self._explainer
+
+    def info(self) -> Dict:
+        return {
+            "version": self.version,
+            "model_path": self.model_path,
+            "scaler_path": self.scaler_path,
+            "feature_names": self.feature_names,
+            "contamination": self.contamination,
+            "n_estimators": getattr(self.model, "n_estimators", None) or (self.engine.n_trees if self.engine else None),
+            "max_samples": getattr(self.model, "max_samples_", None),
+            "trained_at": self.trained_at,
+            "loaded_at": self.loaded_at,
+        }
+
+class ModelRegistry:
+    """
+    Holds loaded model versions and the one currently serving.
+
+    Activating a version is a single reference swap under a lock: requests that
+    already fetched the previous version finish with it, new requests get the
+    new one. Reloads happen via reload() (admin endpoint) or the file watcher,
+    which polls MODEL_PATH/SCALER_PATH and the model's .meta.json every
+    MODEL_WATCH_INTERVAL seconds and reloads once they have all stopped
+    changing and the metadata names the version of the files on disk (it is
+    written last by training). An optional shadow version re-scores batches in the background
+    and the score differences are logged; at most SHADOW_QUEUE_SIZE batches
+    wait for it, and batches arriving while it is that far behind are skipped.
+    """
+
+    def __init__(self, max_versions: Optional[int] = None):
+        self.max_versions = max_versions or settings.MODEL_REGISTRY_SIZE
+        self._versions: Dict[str, ModelVersion] = {}
+        self._active: Optional[ModelVersion] = None
+        self._shadow: Optional[ModelVersion] = None
+        self._shadow_stats: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[ModelVersion], None]] = []
+        self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-scoring")
+        # Each queued batch holds a reference to its rows, so the backlog is bounded
+        self._shadow_slots = threading.BoundedSemaphore(settings.SHADOW_QUEUE_SIZE)
+        self._shadow_pending = 0
+        self._watch_stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._watched: Optional[Tuple] = None
+        self._incomplete: Optional[str] = None
+
+    def load(self, model_path: Optional[str] = None, scaler_path: Optional[str] = None) -> ModelVersion:
+        """
+        Load a model/scaler pair (or return it if this exact content is already loaded).
+        A model_path ending in .forest is a compiled artifact: it holds the scaler too
+        and is memory-mapped rather than unpickled.
+        """
+        model_path = os.path.abspath(model_path or settings.MODEL_PATH)
+        scaler_path = model_path if is_artifact(model_path) else os.path.abspath(scaler_path or settings.SCALER_PATH)
+        loaded_id = version_id(model_path, scaler_path)
+        with self._lock:
+            if loaded_id in self._versions:
+                return self._versions[loaded_id]
+
+        started = time.perf_counter()
+        if is_artifact(model_path):
+            engine, scaler, _ = load_artifact(model_path)
+            model = None
+        else:
+            model = joblib.load(model_path)
+            scaler = joblib.load(scaler_path)
+            engine = compile_engine(model, scaler)
+        metadata = self._read_metadata(model_path, loaded_id)
+        trained_at = metadata.get("trained_at")
+        version = ModelVersion(
+            version=loaded_id,
+            model=model,
+            scaler=scaler,
+            engine=engine,
+            model_path=model_path,
+            scaler_path=scaler_path,
+            feature_names=list(getattr(scaler, "feature_names_in_", metadata.get("features", []))),
+            contamination=metadata.get("contamination", getattr(model, "contamination", None)),
+            trained_at=datetime.fromisoformat(trained_at) if trained_at else datetime.utcfromtimestamp(os.path.getmtime(model_path)),
+            metadata=metadata,
+        )
+
+        model_load_histogram.observe(time.perf_counter() - started)
+
+        with self._lock:
+            self._versions[loaded_id] = version
+            self._evict()
+        return version
+
+    def reload(self, model_path: Optional[str] = None, scaler_path: Optional[str] = None) -> ModelVersion:
+        """Load a version from disk and make it the active one."""
+        version = self.load(model_path, scaler_path)
+        self.activate(version.version)
+        return version
+
+    def activate(self, version_id: str) -> ModelVersion:
+        with self._lock:
+            if version_id not in self._versions:
+                raise KeyError(f"Unknown model version {version_id}")
+            version = self._versions[version_id]
+            previous = self._active
+            self._active = version
+            if self._shadow is version:
+                self._shadow = None
+            listeners = list(self._listeners)
+
+        if previous is not version:
+            print(f"Model version {version.version} is now active")
+            for listener in listeners:
+                listener(version)
+        return version
+
+    def active(self) -> ModelVersion:
+        """The version serving requests, loading it from the configured paths on first use."""
+        version = self._active
+        if version is None:
+            with self._lock:
+                if self._active is None:
+                    self.reload()
+                version = self._active
+        return version
+
+    def get(self, version_id: str) -> Optional[ModelVersion]:
+        """A loaded version by id, or None if it was never loaded or has been evicted."""
+        with self._lock:
+            return self._versions.get(version_id)
+
+    def versions(self) -> List[ModelVersion]:
+        with self._lock:
+            return list(self._versions.values())
+
+    def on_activate(self, listener: Callable[[ModelVersion], None]):
+        """Register a callback run whenever a different version becomes active."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    # Shadow scoring
+
+    @property
+    def shadow(self) -> Optional[ModelVersion]:
+        return self._shadow
+
+    def set_shadow(self, version_id: Optional[str]):
+        with self._lock:
+            if version_id is None:
+                self._shadow = None
+            elif version_id not in self._versions:
+                raise KeyError(f"Unknown model version {version_id}")
+            else:
+                self._shadow = self._versions[version_id]
+            self._shadow_stats = {}
+
+    def shadow_stats(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._shadow_stats)
+
+    @property
+    def shadow_queue_depth(self) -> int:
+        return self._shadow_pending
+
+    def submit_shadow(self, X, scores: np.ndarray, labels: np.ndarray):
+        """Score X with the shadow version in the background and log how it differs."""
+        shadow = self._shadow
+        if shadow is None or shadow is self._active or len(scores) == 0:
+            return
+        if not self._shadow_slots.acquire(blocking=False):
+            counter("shadow_batches_dropped_total", "Batches not shadow-scored because the shadow queue was full").inc()
+            return
+        with self._lock:
+            self._shadow_pending += 1
+        self._shadow_executor.submit(self._run_shadow, shadow, X, scores, labels)
+
+    def _run_shadow(self, shadow: ModelVersion, X, scores: np.ndarray, labels: np.ndarray):
+        try:
+            self._compare(shadow, X, scores, labels)
+        finally:
+            with self._lock:
+                self._shadow_pending -= 1
+            self._shadow_slots.release()
+
+    def _compare(self, shadow: ModelVersion, X, scores: np.ndarray, labels: np.ndarray):
+        try:
+            shadow_scores, shadow_labels = shadow.score(X)
+        except Exception as e:
+            print(f"Shadow scoring with {shadow.version} failed: {e}")
+            return
+
+        diff = np.abs(shadow_scores - scores)
+        disagreements = int((shadow_labels != labels).sum())
+        print(
+            f"Shadow {shadow.version}: rows={len(scores)} mean|dscore|={diff.mean():.5f} "
+            f"max|dscore|={diff.max():.5f} label disagreements={disagreements}"
+        )
+        with self._lock:
+            if self._shadow is not shadow:
+                return
+            stats = self._shadow_stats
+            stats["rows"] = stats.get("rows", 0) + len(scores)
+            stats["label_disagreements"] = stats.get("label_disagreements", 0) + disagreements
+            stats["abs_score_diff_sum"] = stats.get("abs_score_diff_sum", 0.0) + float(diff.sum())
+            stats["max_abs_score_diff"] = max(stats.get("max_abs_score_diff", 0.0), float(diff.max()))
+
+    # File watcher
+
+    def start_watcher(self, interval: Optional[float] = None):
+        """Poll the configured model files and hot-reload when they change."""
+        interval = interval if interval is not None else settings.MODEL_WATCH_INTERVAL
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._watch_stop.clear()
+        self._watched = self._file_state()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._watch_stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, interval: float):
+        pending = None
+        while not self._watch_stop.wait(interval):
+            state = self._file_state()
+            if state is None or state == self._watched:
+                pending = None
+                continue
+            if state != pending:
+                # Training writes the model, scaler and metadata one after another;
+                # wait until a whole interval passes without any of them changing
+                pending = state
+                continue
+            try:
+                if not self._files_complete():
+                    continue
+                version = self.load()
+                if self._file_state() != state:
+                    # Changed again while loading; start waiting over
+                    pending = None
+                    continue
+                self.activate(version.version)
+                self._watched = state
+            except Exception as e:
+                # Files may be mid-write; try again on the next tick
+                print(f"Model hot reload failed: {e}")
+            pending = None
+
+    def _files_complete(self) -> bool:
+        """
+        Whether the model files on disk are the set their .meta.json was written for.
+        train_model writes the metadata last, recording the version of the files it
+        wrote, so until it does the files are a half-replaced set. Without a
+        recorded version (or metadata) only the settling delay applies.
+        """
+        try:
+            with open(metadata_path(settings.MODEL_PATH)) as f:
+                expected = json.load(f).get(_metadata_version_key(settings.MODEL_PATH))
+        except (OSError, ValueError):
+            return True
+        if expected is None:
+            return True
+        actual = version_id(settings.MODEL_PATH, settings.SCALER_PATH)
+        if actual != expected:
+            if self._incomplete != actual:
+                print(f"Model files changed (version {actual}); waiting for their metadata, it still names {expected}")
+                self._incomplete = actual
+            return False
+        self._incomplete = None
+        return True
+
+    @staticmethod
+    def _file_state() -> Optional[Tuple]:
+        """(mtime, size) of the model files and their .meta.json (None while a model file is missing)."""
+        paths = (settings.MODEL_PATH,) if is_artifact(settings.MODEL_PATH) else (settings.MODEL_PATH, settings.SCALER_PATH)
+        try:
+            stats = [os.stat(path) for path in paths]
+        except OSError:
+            return None
+        state = tuple((stat.st_mtime_ns, stat.st_size) for stat in stats)
+        try:
+            meta = os.stat(metadata_path(settings.MODEL_PATH))
+            return state + ((meta.st_mtime_ns, meta.st_size),)
+        except OSError:
+            return state + (None,)
+
+    def _evict(self):
+        keep = {id(self._active), id(self._shadow)}
+        while len(self._versions) > self.max_versions:
+            oldest = min(
+                (v for v in self._versions.values() if id(v) not in keep),
+                key=lambda v: v.loaded_at,
+                default=None,
+            )
+            if oldest is None:
+                break
+            del self._versions[oldest.version]
+
+    @staticmethod
+    def _read_metadata(model_path: str, loaded_id: str) -> Dict:
+        """Training metadata written next to the model by ml_model/train_model.py, if present and its own."""
+        path = metadata_path(model_path)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            metadata = json.load(f)
+        recorded = metadata.get(_metadata_version_key(model_path))
+        if recorded is not None and recorded != loaded_id:
+            print(f"Ignoring {path}: it was written for model version {recorded}, not {loaded_id}")
+            return {}
+        return metadata
+
+model_registry = ModelRegistry()
+gauge("model_versions_loaded", "Model versions held in memory", fn=lambda: len(model_registry.versions()))
+gauge("shadow_queue_depth", "Batches waiting to be re-scored by the shadow model",
+      fn=lambda: model_registry.shadow_queue_depth)
@@ -1,59 +1,244 @@
-import joblib
+import time
+import numpy as np
 import pandas as pd
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from backend.core.config import settings
+from backend.core.metrics import record_stage, span
+from backend.services.drift import drift_monitor
+from backend.services.model_registry import ModelVersion, model_registry
+from backend.services.parallel_scoring import parallel_scorer
+from backend.services.result_cache import row_cache, row_keys
+from backend.services.velocity import VELOCITY_PREFIX, base_features, uses_velocity, velocity_engine
 
-model = None
-scaler = None
+META_COLUMNS = ["Name", "ID", "Time"]
+RISK_TIERS = ["high", "medium", "low"]
 
-def load_model():
-    """Load the trained model and scaler from files."""
-    global model, scaler
+def load_model() -> ModelVersion:
+    """Load the trained model and scaler from files and make them the active version."""
     try:
-        model = joblib.load(settings.MODEL_PATH)
-        scaler = joblib.load(settings.SCALER_PATH)
-        print("Model and scaler loaded successfully")
+        version = model_registry.reload()
+        print(f"Model and scaler loaded successfully (version {version.version})")
+        return version
     except Exception as e:
         print(f"Error loading model: {e}")
         raise ValueError("Model or scaler not found. Please train the model first.")
 
-def predict(df: pd.DataFrame) -> pd.DataFrame:
-    """Run fraud detection on uploaded DataFrame with optional metadata columns."""
-    global model, scaler
-    
-    if model is None or scaler is None:
-        load_model()
-    
-    if model is None or scaler is None:
+def get_model_version() -> ModelVersion:
+    """Return the active model version, loading it on first use."""
+    try:
+        return model_registry.active()
+    except Exception as e:
+        print(f"Error loading model: {e}")
         raise ValueError("Model or scaler not loaded. Please train first.")
 
-    # Preserve metadata columns
-    meta_cols = [col for col in ["Name", "ID", "Time"] if col in df.columns]
+def get_feature_names(version: Optional[ModelVersion] = None) -> list[str]:
+    """Return the feature columns the scaler was fitted on (empty if unnamed)."""
+    return list((version or get_model_version()).feature_names)
+
+def score_matrix(
+    X: Union[np.ndarray, pd.DataFrame],
+    version: Optional[ModelVersion] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return (fraud_score, predicted_label) for raw feature rows whose columns
+    follow get_feature_names(). Rows already in the row score cache for this
+    model version are not scored again.
+    """
+    version = version or get_model_version()
+
+    if row_cache.enabled and len(X):
+        keys = row_keys(X)
+        scores = row_cache.lookup(version.version, keys)
+        missing = np.flatnonzero(np.isnan(scores))
+        if len(missing):
+            subset = X if len(missing) == len(X) else (X.iloc[missing] if isinstance(X, pd.DataFrame) else X[missing])
+            scores[missing] = _score_rows(subset, version)[0]
+            row_cache.store(version.version, [keys[i] for i in missing], scores[missing])
+        # Both engines label a row an outlier exactly when its decision score is negative
+        labels = np.where(scores < 0, -1, 1)
+    else:
+        scores, labels = _score_rows(X, version)
+
+    model_registry.submit_shadow(X, scores, labels)
+    drift_monitor.observe(X, scores, version)
+    return scores, labels
+
+def _score_rows(X: Union[np.ndarray, pd.DataFrame], version: ModelVersion) -> Tuple[np.ndarray, np.ndarray]:
+    if parallel_scorer.enabled and len(X) >= settings.PARALLEL_MIN_ROWS:
+        with span("score_parallel", len(X)):
+            return parallel_scorer.score(X, version.model_path, version.scaler_path, version.version)
+    with span("score", len(X)):
+        return version.score(X)
+
+def risk_tiers(scores: np.ndarray) -> pd.Categorical:
+    """Map fraud scores to high/medium/low using the configured thresholds, in one vectorized pass."""
+    cutoffs = np.array([settings.RISK_HIGH_THRESHOLD, settings.RISK_MEDIUM_THRESHOLD])
+    codes = np.searchsorted(cutoffs, scores, side="right")
+    return pd.Categorical.from_codes(codes, categories=RISK_TIERS)
+
+def explain(X: np.ndarray, version: Optional[ModelVersion] = None, top_k: Optional[int] = None) -> List[List[Dict]]:
+    """
+    The top_k features that isolated each row, from the splits along its paths
+    through the forest (see CompiledForest.path_attributions), as
+    [{"feature": name, "contribution": share}, ...] per row, largest first.
+    Meant for flagged rows; an empty list per row if the model can't be explained.
+    """
+    version = version or get_model_version()
+    top_k = settings.EXPLAIN_TOP_K if top_k is None else top_k
+    explainer = version.explainer()
+    if explainer is None or top_k <= 0 or len(X) == 0:
+        return [[] for _ in range(len(X))]
+    with span("explain", len(X)):
+        shares = explainer.path_attributions(X)
+        names = version.feature_names or [str(i) for i in range(shares.shape[1])]
+        top = np.argsort(-shares, axis=1, kind="stable")[:, :top_k]
+        return [
+            [{"feature": names[j], "contribution": round(float(row[j]), 4)} for j in columns if row[j] > 0]
+            for row, columns in zip(shares, top)
+        ]
+
+def rank_positions(scores: np.ndarray, n: Optional[int] = None) -> np.ndarray:
+    """
+    Positions of the n lowest scores (all of them if n is None), most suspicious
+    first, ties in position order. argpartition selects the n in linear time,
+    so only those n are sorted.
+    """
+    if n is not None and n < len(scores):
+        if n <= 0:
+            return np.empty(0, dtype=np.intp)
+        selected = np.sort(np.argpartition(scores, n - 1)[:n])
+        return selected[np.argsort(scores[selected], kind="stable")]
+    return np.argsort(scores, kind="stable")
+
+def _score(df: pd.DataFrame, version: Optional[ModelVersion] = None) -> pd.DataFrame:
+    """Score a DataFrame in its original row order."""
+    version = version or get_model_version()
+
+    if uses_velocity(version.feature_names):
+        with span("velocity", len(df)):
+            velocity_engine.append_features(df, version.feature_names)
 
     # Get numeric columns only
     df_numeric = df.select_dtypes(include=["number"])
 
     # Ensure we have the expected columns for the scaler
-    if hasattr(scaler, "feature_names_in_"):
-        expected_cols = list(scaler.feature_names_in_)
-        common_cols = [col for col in expected_cols if col in df_numeric.columns]
+    if version.feature_names:
+        common_cols = [col for col in version.feature_names if col in df_numeric.columns]
         df_numeric = df_numeric[common_cols]
-    else:
-        df_numeric = df_numeric
 
-    # Scale the data
-    X_scaled = scaler.transform(df_numeric)
+    # Preserve metadata columns that are not already model features
+    meta_cols = [col for col in META_COLUMNS if col in df.columns and col not in df_numeric.columns]
 
-    # Get predictions and scores
-    scores = model.decision_function(X_scaled)
-    preds = model.predict(X_scaled)
+    scores, preds = score_matrix(df_numeric, version)
 
     # Add results to dataframe
     df["fraud_score"] = scores
     df["predicted_label"] = preds
     df["flagged"] = (preds == -1)
-
-    # Sort by fraud score (most suspicious first)
-    df = df.sort_values("fraud_score")
+    df["risk_tier"] = risk_tiers(scores)
 
     # Return relevant columns
-    return df[meta_cols + ["fraud_score", "flagged"] + list(df_numeric.columns)]
+    return df[meta_cols + ["fraud_score", "flagged", "risk_tier"] + list(df_numeric.columns)]
+
+def predict(df: pd.DataFrame, version: Optional[ModelVersion] = None) -> pd.DataFrame:
+    """
+    Run fraud detection on uploaded DataFrame with optional metadata columns.
+    Flagged rows come first, most suspicious first; the rest keep their input
+    order, so only the (small) flagged subset is ever sorted.
+    """
+    result_df = _score(df, version)
+    with span("sort", len(result_df)):
+        flagged = result_df["flagged"].to_numpy()
+        flagged_positions = np.flatnonzero(flagged)
+        ranked = flagged_positions[rank_positions(result_df["fraud_score"].to_numpy()[flagged_positions])]
+        return result_df.take(np.concatenate([ranked, np.flatnonzero(~flagged)]))
+
+def read_csv_chunks(
+    source: Union[str, BinaryIO],
+    chunk_size: Optional[int] = None,
+    version: Optional[ModelVersion] = None,
+    skip_rows: int = 0,
+) -> Iterator[pd.DataFrame]:
+    """
+    Parse a CSV in fixed-size chunks, reading only model features and metadata.
+    Feature columns are parsed straight to float32 so peak memory tracks the chunk size.
+    With skip_rows, parsing starts after that many data rows; the chunk index
+    still counts rows from the start of the file.
+    """
+    feature_names = base_features(get_feature_names(version))
+    usecols = None
+    if feature_names:
+        wanted = set(feature_names) | set(META_COLUMNS) | set(settings.VELOCITY_KEY_COLUMNS.split(","))
+        usecols = lambda col: col in wanted
+
+    reader = pd.read_csv(
+        source,
+        chunksize=chunk_size or settings.CSV_CHUNK_SIZE,
+        usecols=usecols,
+        dtype={col: np.float32 for col in feature_names},
+        skiprows=range(1, skip_rows + 1) if skip_rows else None,
+    )
+    chunks = timed_chunks(reader, "csv_parse")
+    if skip_rows:
+        return (chunk.set_axis(chunk.index + skip_rows) for chunk in chunks)
+    return chunks
+
+def timed_chunks(chunks: Iterable, stage: str) -> Iterator:
+    """Record the time spent producing each chunk (parsing is lazy, so it happens on next())."""
+    iterator = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        record_stage(stage, time.perf_counter() - start, len(chunk))
+        yield chunk
+
+def predict_chunks(chunks: Iterable[pd.DataFrame], version: Optional[ModelVersion] = None) -> Iterator[pd.DataFrame]:
+    """Score each chunk independently, yielding results in input order.
+
+    The model version is pinned when iteration starts, so a hot reload never
+    splits one upload across two models.
+    """
+    version = version or get_model_version()
+    for chunk in chunks:
+        yield _score(chunk, version)
+
+def score_feature_chunks(chunks: Iterable, version: Optional[ModelVersion] = None) -> Iterator[pd.DataFrame]:
+    """Score ingest.FeatureChunks, yielding frames shaped like _score's output.
+
+    Scoring runs on the chunk's float32 matrix as-is; metadata columns are only
+    materialised afterwards and joined by position.
+    """
+    version = version or get_model_version()
+    for chunk in chunks:
+        meta = chunk.meta()
+        X = chunk.X
+        if uses_velocity(version.feature_names):
+            with span("velocity", len(chunk)):
+                X = with_velocity_features(X, meta, version.feature_names)
+        scores, preds = score_matrix(X, version)
+        index = pd.RangeIndex(chunk.start, chunk.start + len(chunk))
+        feature_names = version.feature_names or [str(i) for i in range(X.shape[1])]
+
+        result = meta.set_axis(index) if meta is not None else pd.DataFrame(index=index)
+        result["fraud_score"] = scores
+        result["flagged"] = (preds == -1)
+        result["risk_tier"] = risk_tiers(scores)
+        features = pd.DataFrame(X, index=index, columns=feature_names, copy=False)
+        yield pd.concat([result, features], axis=1, copy=False)
+
+def with_velocity_features(X: np.ndarray, meta: Optional[pd.DataFrame], feature_names: List[str]) -> np.ndarray:
+    """Widen a matrix of the input features to the model's full feature order, filling in the vel_* columns."""
+    base = base_features(feature_names)
+    column = lambda name: X[:, base.index(name)] if name in base else None
+    key_column = next((col for col in settings.VELOCITY_KEY_COLUMNS.split(",") if meta is not None and col in meta.columns), None)
+    velocity = velocity_engine.features_for(
+        feature_names, meta[key_column].to_numpy() if key_column else None, column("Time"), column("Amount"), len(X),
+    )
+    full = np.empty((len(X), len(feature_names)), dtype=X.dtype)
+    is_velocity = np.array([name.startswith(VELOCITY_PREFIX) for name in feature_names])
+    full[:, ~is_velocity] = X
+    full[:, is_velocity] = velocity
+    return full
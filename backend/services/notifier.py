@@ -1,46 +1,254 @@
+import queue
 import smtplib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from typing import List, Optional
 from backend.core.config import settings
+from backend.core.metrics import gauge
+from backend.services.audit_service import audit_logger
+
+def _format_score(value) -> str:
+    return f"{value:.4f}" if isinstance(value, (int, float)) else str(value)
+
+def build_alert_message(flagged_transactions: list[dict], alerts: int = 1) -> MIMEMultipart:
+    """Build the fraud alert email; alerts > 1 marks a digest of several coalesced alerts."""
+    subject = "Fraud Alert - Suspicious Transactions Detected"
+    if alerts > 1:
+        subject += f" ({alerts} alerts)"
+
+    lines = [
+        "FRAUD ALERT",
+        "",
+        f"Suspicious transactions detected: {len(flagged_transactions)} transactions flagged",
+        "",
+        "Transaction Details:",
+        "-" * 50,
+    ]
+    for i, transaction in enumerate(flagged_transactions, 1):
+        lines += [
+            f"{i}. Transaction ID: {transaction.get('ID', 'N/A')}",
+            f"   Customer: {transaction.get('Name', 'N/A')}",
+            f"   Time: {transaction.get('Time', 'N/A')}",
+            f"   Fraud Score: {_format_score(transaction.get('fraud_score', 'N/A'))}",
+            f"   Amount: ${transaction.get('Amount', 'N/A')}",
+            "",
+        ]
+    lines += [
+        "",
+        "Please review these transactions immediately.",
+        "This is an automated alert from the Fraud Detection System.",
+    ]
+
+    msg = MIMEMultipart()
+    msg["From"] = settings.SMTP_USER or settings.ADMIN_EMAIL
+    msg["To"] = settings.ADMIN_EMAIL
+    msg["Subject"] = subject
+    msg.attach(MIMEText("\n".join(lines), "plain"))
+    return msg
+
+def _connect() -> smtplib.SMTP:
+    server = smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT)
+    if settings.SMTP_USE_TLS:
+        server.starttls()
+    if settings.SMTP_USER:
+        server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+    return server
 
 def send_fraud_alert(flagged_transactions: list[dict]) -> bool:
-    """Send formatted fraud alert email."""
+    """Send formatted fraud alert email synchronously over a one-off connection."""
     if not flagged_transactions:
         return False
-    
-    subject = "Fraud Alert - Suspicious Transactions Detected"
-    
-    body = "FRAUD ALERT\n\n"
-    body += f"Suspicious transactions detected: {len(flagged_transactions)} transactions flagged\n\n"
-    body += "Transaction Details:\n"
-    body += "-" * 50 + "\n"
-    
-    for i, transaction in enumerate(flagged_transactions, 1):
-        body += f"{i}. Transaction ID: {transaction.get('ID', 'N/A')}\n"
-        body += f"   Customer: {transaction.get('Name', 'N/A')}\n"
-        body += f"   Time: {transaction.get('Time', 'N/A')}\n"
-        body += f"   Fraud Score: {transaction.get('fraud_score', 'N/A'):.4f}\n"
-        body += f"   Amount: ${transaction.get('Amount', 'N/A')}\n"
-        body += "\n"
-    
-    body += "\nPlease review these transactions immediately.\n"
-    body += "This is an automated alert from the Fraud Detection System."
-    
+
     try:
-        msg = MIMEMultipart()
-        msg["From"] = settings.SMTP_USER
-        msg["To"] = settings.ADMIN_EMAIL
-        msg["Subject"] = subject
-        msg.attach(MIMEText(body, "plain"))
-
-        with smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT) as server:
-            server.starttls()
-            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-            server.send_message(msg)
-        
+        with _connect() as server:
+            server.send_message(build_alert_message(flagged_transactions))
+
         print(f"Email sent successfully to {settings.ADMIN_EMAIL}")
         return True
-        
+
     except Exception as e:
         print(f"Email send failed: {e}")
         return False
+
+class SMTPConnectionPool:
+    """Keeps authenticated SMTP connections open between sends."""
+
+    def __init__(self, size: Optional[int] = None):
+        self.size = size or settings.SMTP_POOL_SIZE
+        self._idle: List[smtplib.SMTP] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> smtplib.SMTP:
+        """Return a live connection, reusing an idle one when the server still answers NOOP."""
+        while True:
+            with self._lock:
+                server = self._idle.pop() if self._idle else None
+            if server is None:
+                return _connect()
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._close(server)
+
+    def release(self, server: smtplib.SMTP, healthy: bool = True):
+        with self._lock:
+            if healthy and len(self._idle) < self.size:
+                self._idle.append(server)
+                return
+        self._close(server)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server in idle:
+            self._close(server)
+
+    @staticmethod
+    def _close(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+@dataclass
+class Delivery:
+    id: str
+    count: int
+    status: str = "queued"
+    attempts: int = 0
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    sent_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+class NotificationDispatcher:
+    """
+    Delivers fraud alerts in the background so requests return immediately.
+
+    Alerts go onto a queue and are sent by SMTP_POOL_SIZE worker threads over
+    pooled, persistent connections. Alerts that arrive within
+    NOTIFY_DIGEST_WINDOW seconds of each other are coalesced into one digest
+    email. Failed sends are retried NOTIFY_MAX_RETRIES times with exponential
+    backoff starting at NOTIFY_RETRY_BACKOFF seconds.
+    """
+
+    def __init__(self, pool: Optional[SMTPConnectionPool] = None, max_tracked: int = 1000):
+        self.pool = pool or SMTPConnectionPool()
+        self.max_tracked = max_tracked
+        self._queue: queue.Queue = queue.Queue()
+        self._deliveries: "OrderedDict[str, Delivery]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._workers: List[threading.Thread] = []
+
+    def start(self):
+        with self._lock:
+            if any(worker.is_alive() for worker in self._workers):
+                return
+            self._stopping.clear()
+            self._workers = [
+                threading.Thread(target=self._run, name=f"notifier-{i}", daemon=True)
+                for i in range(self.pool.size)
+            ]
+        for worker in self._workers:
+            worker.start()
+
+    def stop(self, timeout: float = 30.0):
+        """Send whatever is queued without waiting for digests, then stop the workers."""
+        self._stopping.set()
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(max(deadline - time.monotonic(), 0))
+        self._workers = []
+        self.pool.close_all()
+
+    def enqueue(self, flagged_transactions: list[dict]) -> str:
+        """Queue an alert and return its delivery id."""
+        if not self._workers:
+            self.start()
+        delivery = Delivery(id=uuid.uuid4().hex, count=len(flagged_transactions))
+        with self._lock:
+            self._deliveries[delivery.id] = delivery
+            while len(self._deliveries) > self.max_tracked:
+                self._deliveries.popitem(last=False)
+        self._queue.put((delivery, flagged_transactions))
+        return delivery.id
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def status(self, delivery_id: str) -> Optional[Delivery]:
+        with self._lock:
+            return self._deliveries.get(delivery_id)
+
+    def _next_digest(self) -> List:
+        """Block for one alert, then gather others arriving within the digest window."""
+        batch = []
+        while not batch:
+            try:
+                batch.append(self._queue.get(timeout=0.5))
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return []
+
+        deadline = time.monotonic() + settings.NOTIFY_DIGEST_WINDOW
+        while True:
+            timeout = 0 if self._stopping.is_set() else deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_digest()
+            if not batch:
+                return
+            self._deliver(batch)
+
+    def _deliver(self, batch: List):
+        deliveries = [delivery for delivery, _ in batch]
+        transactions = [transaction for _, flagged in batch for transaction in flagged]
+        msg = build_alert_message(transactions, alerts=len(batch))
+
+        for attempt in range(settings.NOTIFY_MAX_RETRIES + 1):
+            self._update(deliveries, status="sending", attempts=attempt + 1)
+            server = None
+            try:
+                server = self.pool.acquire()
+                server.send_message(msg)
+                self.pool.release(server)
+                self._update(deliveries, status="sent", sent_at=datetime.utcnow(), error=None)
+                audit_logger.log("notification_sent", f"Sent alert for {len(transactions)} transactions in {len(batch)} alert(s)")
+                return
+            except Exception as e:
+                if server is not None:
+                    self.pool.release(server, healthy=False)
+                self._update(deliveries, status="retrying", error=str(e))
+                print(f"Email send failed (attempt {attempt + 1}): {e}")
+                if attempt == settings.NOTIFY_MAX_RETRIES:
+                    break
+                if self._stopping.wait(settings.NOTIFY_RETRY_BACKOFF * (2 ** attempt)):
+                    break
+
+        self._update(deliveries, status="failed")
+        audit_logger.log("notification_failed", f"Failed to send alert for {len(transactions)} transactions", status="error")
+
+    def _update(self, deliveries: List[Delivery], **changes):
+        with self._lock:
+            for delivery in deliveries:
+                for key, value in changes.items():
+                    setattr(delivery, key, value)
+
+notification_dispatcher = NotificationDispatcher()
+gauge("notification_queue_depth", "Alerts waiting to be emailed", fn=lambda: notification_dispatcher.queue_depth)
@@ -0,0 +1,156 @@
+import multiprocessing as mp
+import os
+import threading
+import joblib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Optional, Tuple
+from backend.core.config import settings
+from backend.services.forest_engine import is_artifact, load_artifact
+from backend.services.model_registry import compile_engine
+
+# Per-worker cache of the loaded scorer, keyed by (model_path, scaler_path, version)
+_worker_scorers: Dict[Tuple[str, str, str], Callable[[np.ndarray], np.ndarray]] = {}
+
+def _load_scorer(model_path: str, scaler_path: str) -> Callable[[np.ndarray], np.ndarray]:
+    """Load a model/scaler pair in a worker and return a raw-features -> decision_function callable."""
+    if is_artifact(model_path):
+        # Mapped, not copied: every worker shares the parent's pages of the artifact
+        engine = load_artifact(model_path)[0]
+        return lambda X: engine.score(X)[0]
+
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+    engine = compile_engine(model, scaler)
+    if engine is not None:
+        return lambda X: engine.score(X)[0]
+
+    columns = getattr(scaler, "feature_names_in_", None)
+    def score(X: np.ndarray) -> np.ndarray:
+        frame = pd.DataFrame(X, columns=columns) if columns is not None else X
+        return model.decision_function(scaler.transform(frame))
+    return score
+
+def _get_scorer(model_path: str, scaler_path: str, version: str) -> Callable[[np.ndarray], np.ndarray]:
+    key = (model_path, scaler_path, version)
+    if key not in _worker_scorers:
+        # A new version replaces the old one; workers only ever hold one model
+        _worker_scorers.clear()
+        _worker_scorers[key] = _load_scorer(model_path, scaler_path)
+    return _worker_scorers[key]
+
+def _init_worker(model_path: str, scaler_path: str, version: str):
+    # Pay the model load once per worker, before the first task arrives
+    _get_scorer(model_path, scaler_path, version)
+
+def _score_shard(
+    model_path: str,
+    scaler_path: str,
+    version: str,
+    input_name: str,
+    output_name: str,
+    shape: Tuple[int, int],
+    dtype: str,
+    start: int,
+    stop: int,
+):
+    """Score rows [start, stop) of the shared input matrix into the shared output vector."""
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    try:
+        X = np.ndarray(shape, dtype=dtype, buffer=input_shm.buf)
+        out = np.ndarray((shape[0],), dtype=np.float64, buffer=output_shm.buf)
+        out[start:stop] = _get_scorer(model_path, scaler_path, version)(X[start:stop])
+        del X, out
+    finally:
+        input_shm.close()
+        output_shm.close()
+
+class ParallelScorer:
+    """
+    Scores large matrices across a persistent pool of worker processes.
+
+    The input is copied once into shared memory (float32 rows stay float32,
+    anything else becomes float64, so scores match in-process scoring of the
+    same rows exactly) and workers write
+    their decision_function values straight into a shared output vector, so
+    neither rows nor results are pickled. Each shard writes to its own slice,
+    which keeps the output in input order without a merge step.
+    """
+
+    def __init__(self, workers: Optional[int] = None, min_shard_rows: int = 4096):
+        self.workers = workers if workers is not None else settings.SCORING_WORKERS
+        self.min_shard_rows = min_shard_rows
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 1
+
+    def _get_pool(self, model_path: str, scaler_path: str, version: str) -> ProcessPoolExecutor:
+        # Requests score on threadpool threads; only one of them may start the pool
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: forking a process that runs threads (uvicorn, audit flusher) is unsafe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=mp.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(model_path, scaler_path, version),
+                )
+            return self._pool
+
+    def score(self, X: np.ndarray, model_path: str, scaler_path: str, version: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (decision_function, predict) for raw feature rows, computed by the pool
+        with the given model version (workers reload when the version changes).
+        """
+        model_path = os.path.abspath(model_path)
+        scaler_path = os.path.abspath(scaler_path)
+        X = np.asarray(X)
+        n_rows = X.shape[0]
+        # The compiled forest scales float32 rows in float32 and everything else in float64,
+        # like StandardScaler; narrowing float64 rows here would move them across thresholds
+        dtype = np.dtype(np.float32 if X.dtype == np.float32 else np.float64)
+
+        input_shm = shared_memory.SharedMemory(create=True, size=max(X.size * dtype.itemsize, 1))
+        output_shm = shared_memory.SharedMemory(create=True, size=max(n_rows * 8, 1))
+        try:
+            shared_X = np.ndarray(X.shape, dtype=dtype, buffer=input_shm.buf)
+            shared_X[:] = X
+
+            shard_rows = max(self.min_shard_rows, -(-n_rows // (self.workers * 4)))
+            pool = self._get_pool(model_path, scaler_path, version)
+            futures = [
+                pool.submit(
+                    _score_shard, model_path, scaler_path, version, input_shm.name, output_shm.name,
+                    X.shape, dtype.str, start, min(start + shard_rows, n_rows),
+                )
+                for start in range(0, n_rows, shard_rows)
+            ]
+            done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in not_done:
+                future.cancel()
+            for future in done:
+                future.result()
+
+            scores = np.ndarray((n_rows,), dtype=np.float64, buffer=output_shm.buf).copy()
+            del shared_X
+        finally:
+            input_shm.close()
+            input_shm.unlink()
+            output_shm.close()
+            output_shm.unlink()
+
+        return scores, np.where(scores < 0, -1, 1)
+
+    def shutdown(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+parallel_scorer = ParallelScorer()
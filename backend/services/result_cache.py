@@ -0,0 +1,115 @@
+import hashlib
+from typing import BinaryIO, Dict, Hashable, List, Optional
+import numpy as np
+import pandas as pd
+from backend.core.cache import LRUCache
+from backend.core.config import settings
+from backend.core.metrics import counter, gauge
+from backend.services.model_registry import ModelVersion, model_registry
+
+HASH_BLOCK_SIZE = 1 << 20
+
+def file_digest(source: BinaryIO) -> str:
+    """sha256 of an uploaded file, read block by block; the file is rewound afterwards."""
+    digest = hashlib.sha256()
+    source.seek(0)
+    for block in iter(lambda: source.read(HASH_BLOCK_SIZE), b""):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+def row_keys(X) -> List[bytes]:
+    """One key per row: the raw bytes of its feature values (so float32 and float64 rows never collide)."""
+    matrix = np.ascontiguousarray(X.to_numpy() if isinstance(X, pd.DataFrame) else X)
+    if matrix.ndim != 2 or matrix.shape[1] == 0:
+        return [b""] * len(matrix)
+    row_dtype = np.dtype((np.void, matrix.dtype.itemsize * matrix.shape[1]))
+    return matrix.view(row_dtype).ravel().tolist()
+
+def _count(cache: str, outcome: str, amount: int = 1):
+    if amount:
+        counter("result_cache_lookups_total", "Result cache lookups by cache and outcome",
+                {"cache": cache, "outcome": outcome}).inc(amount)
+
+class UploadCache:
+    """
+    Results of recent uploads keyed by the sha256 of the uploaded bytes, the
+    model version that scored them, the top_k they were reduced to and the
+    uploader, since the cached scan_id points at that user's scan. Holds the
+    summary and flagged rows (not every scored row), LRU-evicted beyond
+    UPLOAD_CACHE_SIZE entries.
+    """
+
+    def __init__(self, maxsize: int):
+        self._cache = LRUCache(maxsize)
+
+    @property
+    def enabled(self) -> bool:
+        return self._cache.maxsize > 0
+
+    def get(self, digest: str, version: str, top_k: Optional[int], user_email: str) -> Optional[Dict]:
+        result = self._cache.get((digest, version, top_k, user_email))
+        _count("upload", "hit" if result is not None else "miss")
+        return result
+
+    def set(self, digest: str, version: str, top_k: Optional[int], user_email: str, result: Dict):
+        self._cache.set((digest, version, top_k, user_email), {key: value for key, value in result.items() if key != "flagged"})
+
+    def clear(self):
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+class RowScoreCache:
+    """
+    fraud_score of recently scored feature vectors, for uploads that overlap
+    earlier ones. Keyed by the row's raw feature bytes rather than the
+    transaction ID, since an ID says nothing about whether the features match.
+    Entries belong to one model version; activating another empties the cache.
+    """
+
+    def __init__(self, maxsize: int):
+        self._cache = LRUCache(maxsize)
+        self.version: Optional[str] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._cache.maxsize > 0
+
+    def lookup(self, version: str, keys: List[Hashable]) -> np.ndarray:
+        """Cached scores for keys, NaN where the row has not been seen under this version."""
+        if version != self.version:
+            _count("row", "miss", len(keys))
+            return np.full(len(keys), np.nan)
+        scores = np.array(self._cache.get_many(keys, np.nan), dtype=np.float64)
+        hits = int(np.count_nonzero(~np.isnan(scores)))
+        _count("row", "hit", hits)
+        _count("row", "miss", len(keys) - hits)
+        return scores
+
+    def store(self, version: str, keys: List[Hashable], scores: np.ndarray):
+        if self.version is None:
+            self.version = version
+        if version == self.version:
+            self._cache.set_many(zip(keys, scores.tolist()))
+
+    def reset(self, version: Optional[str] = None):
+        self._cache.clear()
+        self.version = version
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+upload_cache = UploadCache(settings.UPLOAD_CACHE_SIZE)
+row_cache = RowScoreCache(settings.ROW_CACHE_SIZE)
+
+def _invalidate(version: ModelVersion):
+    # Cached scores came from the previous model
+    upload_cache.clear()
+    row_cache.reset(version.version)
+
+model_registry.on_activate(_invalidate)
+
+gauge("upload_cache_entries", "Uploads held in the result cache", fn=lambda: len(upload_cache))
+gauge("row_cache_entries", "Feature vectors held in the row score cache", fn=lambda: len(row_cache))
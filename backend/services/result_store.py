@@ -0,0 +1,280 @@
+import asyncio
+import threading
+from itertools import repeat
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from backend.db.bulk import bulk_insert
+from backend.db.session import SessionLocal
+from backend.models.scan import Scan, ScanResult
+from backend.core.config import settings
+from backend.services.model_registry import ModelVersion, model_registry
+from backend.services.model_service import META_COLUMNS, explain, get_feature_names, risk_tiers
+from backend.services.score_index import ScoreIndex
+from backend.services.score_stats import score_stats
+
+SCORE_FIELDS = ["fraud_score", "flagged", "risk_tier"]
+RESULT_COLUMNS = ["scan_id", "row_index", "fraud_score", "flagged", "meta", "features"]
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+ID_BATCH_SIZE = 10000
+
+def _split_columns(result_df: pd.DataFrame, feature_names: List[str]) -> Tuple[List[str], List[str]]:
+    """Split a scored frame into (metadata, feature) columns the same way the model (with feature_names) did."""
+    model_features = set(feature_names)
+    if model_features:
+        meta_cols = [col for col in META_COLUMNS if col in result_df.columns and col not in model_features]
+    else:
+        # Without named features the model used every numeric column
+        meta_cols = [
+            col for col in META_COLUMNS
+            if col in result_df.columns and not pd.api.types.is_numeric_dtype(result_df[col])
+        ]
+    feature_cols = [col for col in result_df.columns if col not in SCORE_FIELDS and col not in meta_cols]
+    return meta_cols, feature_cols
+
+def _latest_scan_query(user_email: Optional[str] = None):
+    query = select(Scan).where(Scan.status == "completed")
+    if user_email is not None:
+        query = query.where(Scan.user_email == user_email)
+    return query.order_by(Scan.id.desc()).limit(1)
+
+def _results_query(scan_id: int, ids: List[int]):
+    return select(ScanResult).where(ScanResult.scan_id == scan_id, ScanResult.id.in_(ids))
+
+def _batches(ids: List[int]) -> Iterator[List[int]]:
+    for offset in range(0, len(ids), ID_BATCH_SIZE):
+        yield ids[offset:offset + ID_BATCH_SIZE]
+
+class ResultStore:
+    """
+    Persists scored transactions per scan in the application database.
+    When a scan completes, its (fraud_score, id) pairs are also written as a
+    ScoreIndex, which serves flagged-row pages and threshold queries.
+    """
+
+    def __init__(self):
+        # (scores, ids) of each chunk of the scans still being written
+        self._pending: Dict[int, List[Tuple[np.ndarray, np.ndarray]]] = {}
+        self._lock = threading.Lock()
+
+    def create_scan(self, user_email: str, model_version: Optional[str] = None) -> int:
+        """Open a new scan and return its id."""
+        with SessionLocal() as db:
+            scan = Scan(user_email=user_email, model_version=model_version)
+            db.add(scan)
+            db.commit()
+            return scan.id
+
+    def add_results(
+        self,
+        scan_id: int,
+        result_df: pd.DataFrame,
+        before_commit: Optional[Callable[[Session], None]] = None,
+        version: Optional[ModelVersion] = None,
+    ) -> None:
+        """
+        Bulk insert one batch of scored rows; row_index is taken from the frame index.
+        before_commit, if given, runs in the same transaction (e.g. to record progress).
+        version is the model that scored the rows (default: the scan's model version),
+        so every chunk of a scan is split into the same feature columns even if
+        another model was activated meanwhile.
+        """
+        if result_df.empty:
+            if before_commit is not None:
+                with SessionLocal() as db:
+                    before_commit(db)
+                    db.commit()
+            return
+
+        if version is None:
+            version = self._scan_version(scan_id)
+        feature_names = version.feature_names if version is not None else get_feature_names()
+        meta_cols, feature_cols = _split_columns(result_df, feature_names)
+
+        features = np.ascontiguousarray(result_df[feature_cols].to_numpy(dtype=np.float64))
+        if feature_cols:
+            # One packed float64 blob per row, sliced out of the matrix without a Python loop
+            feature_blobs = features.view(np.dtype((np.void, features.itemsize * len(feature_cols)))).ravel().tolist()
+        else:
+            feature_blobs = [b""] * len(result_df)
+        if meta_cols:
+            # pandas' C encoder writes one JSON object per line
+            meta = result_df[meta_cols].to_json(orient="records", lines=True, double_precision=15).splitlines()
+        else:
+            meta = ["{}"] * len(result_df)
+        rows = zip(
+            repeat(scan_id),
+            result_df.index.tolist(),
+            result_df["fraud_score"].tolist(),
+            result_df["flagged"].tolist(),
+            meta,
+            feature_blobs,
+        )
+
+        with SessionLocal() as db:
+            scan = db.get(Scan, scan_id)
+            if not scan.feature_names:
+                scan.feature_names = feature_cols
+            written = bulk_insert(db, ScanResult.__table__, RESULT_COLUMNS, rows)
+            # SQLite holds the write lock from the first insert until commit, so the
+            # batch got consecutive rowids ending at the current maximum (cheaper than RETURNING)
+            last_id = db.execute(select(func.max(ScanResult.id))).scalar_one()
+            ids = np.arange(last_id - written + 1, last_id + 1, dtype=np.int64)
+            scores = result_df["fraud_score"].to_numpy(dtype=np.float64)
+            score_stats.add_scores(db, scan_id, scores, int(result_df["flagged"].sum()))
+            if before_commit is not None:
+                before_commit(db)
+            db.commit()
+
+        with self._lock:
+            self._pending.setdefault(scan_id, []).append((scores, ids))
+
+    @staticmethod
+    def _scan_version(scan_id: int) -> Optional[ModelVersion]:
+        with SessionLocal() as db:
+            model_version = db.execute(select(Scan.model_version).where(Scan.id == scan_id)).scalar_one_or_none()
+        return model_registry.get(model_version) if model_version else None
+
+    def finish_scan(self, scan_id: int, total_transactions: int, flagged_count: int, status: str = "completed") -> None:
+        """
+        Record the final counts of a scan and mark it as readable. A completed
+        scan's aggregates are folded into the dashboard in the same transaction.
+        """
+        with SessionLocal() as db:
+            scan = db.get(Scan, scan_id)
+            scan.total_transactions = total_transactions
+            scan.flagged_count = flagged_count
+            scan.status = status
+            scan.completed_at = datetime.utcnow()
+            if status == "completed":
+                score_stats.merge_scan(db, scan)
+            db.commit()
+            db.refresh(scan)
+            db.expunge(scan)
+
+        with self._lock:
+            parts = self._pending.pop(scan_id, [])
+        if status != "completed":
+            return
+        if parts and sum(len(p[0]) for p in parts) == total_transactions:
+            ScoreIndex.write(scan, np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts]))
+        else:
+            # Some chunks were stored by an earlier process (a resumed job); score_index() rebuilds it from the table
+            ScoreIndex.delete(scan)
+
+    def score_index(self, scan: Scan) -> ScoreIndex:
+        """The scan's ScoreIndex, rebuilt from the stored rows if its files are missing or stale."""
+        index = ScoreIndex.load(scan)
+        if index is not None:
+            return index
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(ScanResult.id, ScanResult.fraud_score).where(ScanResult.scan_id == scan.id)
+            ).all()
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        scores = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+        return ScoreIndex.write(scan, scores, ids)
+
+    def get_scan(self, scan_id: int) -> Optional[Scan]:
+        with SessionLocal() as db:
+            return db.get(Scan, scan_id)
+
+    async def get_scan_async(self, db: AsyncSession, scan_id: int) -> Optional[Scan]:
+        return await db.get(Scan, scan_id)
+
+    def latest_scan(self, user_email: Optional[str] = None) -> Optional[Scan]:
+        """Return the most recently completed scan, of one user if user_email is given."""
+        with SessionLocal() as db:
+            return db.execute(_latest_scan_query(user_email)).scalar_one_or_none()
+
+    async def latest_scan_async(self, db: AsyncSession, user_email: Optional[str] = None) -> Optional[Scan]:
+        return (await db.execute(_latest_scan_query(user_email))).scalar_one_or_none()
+
+    def get_flagged(
+        self,
+        scan: Scan,
+        limit: Optional[int] = None,
+        after_score: Optional[float] = None,
+        after_id: Optional[int] = None,
+        max_score: Optional[float] = None,
+    ) -> Tuple[List[Dict], Optional[Tuple[float, int]]]:
+        """
+        Return flagged rows of a scan, most suspicious first, and the keyset cursor
+        (fraud_score, id) of the last row returned. Pass the cursor back as
+        after_score/after_id to continue after it. With max_score, only rows
+        scoring below it are returned.
+
+        Row ids come from the scan's ScoreIndex by binary search; flagged rows
+        are exactly those scoring below 0, so they form its leading run.
+        """
+        ids = self._page_ids(self.score_index(scan), limit, after_score, after_id, max_score)
+        by_id = {}
+        with SessionLocal() as db:
+            for batch in _batches(ids):
+                by_id.update((result.id, result) for result in db.execute(_results_query(scan.id, batch)).scalars())
+        return self._page(scan, ids, by_id)
+
+    async def get_flagged_async(
+        self,
+        db: AsyncSession,
+        scan: Scan,
+        limit: Optional[int] = None,
+        after_score: Optional[float] = None,
+        after_id: Optional[int] = None,
+        max_score: Optional[float] = None,
+    ) -> Tuple[List[Dict], Optional[Tuple[float, int]]]:
+        """get_flagged on an async session; a missing index is rebuilt off the event loop."""
+        index = ScoreIndex.load(scan) or await asyncio.to_thread(self.score_index, scan)
+        ids = self._page_ids(index, limit, after_score, after_id, max_score)
+        by_id = {}
+        for batch in _batches(ids):
+            by_id.update((result.id, result) for result in (await db.execute(_results_query(scan.id, batch))).scalars())
+        # Explanations traverse the forest; keep that off the event loop
+        return await asyncio.to_thread(self._page, scan, ids, by_id)
+
+    @staticmethod
+    def _page_ids(
+        index: ScoreIndex,
+        limit: Optional[int],
+        after_score: Optional[float],
+        after_id: Optional[int],
+        max_score: Optional[float],
+    ) -> List[int]:
+        bound = 0.0 if max_score is None else min(max_score, 0.0)
+        start = index.position_after(after_score, after_id) if after_score is not None else 0
+        return index.below(bound, start, limit).tolist()
+
+    def _page(self, scan: Scan, ids: List[int], by_id: Dict[int, ScanResult]) -> Tuple[List[Dict], Optional[Tuple[float, int]]]:
+        results = [by_id[result_id] for result_id in ids if result_id in by_id]
+        cursor = (results[-1].fraud_score, results[-1].id) if results else None
+        tiers = risk_tiers(np.array([result.fraud_score for result in results], dtype=np.float64))
+        records = [self._to_record(scan, result, tier) for result, tier in zip(results, tiers)]
+        self._explain(scan, results, records)
+        return records, cursor
+
+    @staticmethod
+    def _explain(scan: Scan, results: List[ScanResult], records: List[Dict]) -> None:
+        """Add top_features to the records if the model that scored the scan is still loaded."""
+        version = model_registry.get(scan.model_version) if scan.model_version else None
+        if not settings.EXPLAIN_TOP_K or version is None or not results or not version.feature_names:
+            return
+        if not set(version.feature_names) <= set(scan.feature_names):
+            return
+        positions = [scan.feature_names.index(name) for name in version.feature_names]
+        X = np.vstack([np.frombuffer(result.features, dtype=np.float64) for result in results])[:, positions]
+        for record, top_features in zip(records, explain(X, version)):
+            record["top_features"] = top_features
+
+    @staticmethod
+    def _to_record(scan: Scan, result: ScanResult, risk_tier: str) -> Dict:
+        values = np.frombuffer(result.features, dtype=np.float64).tolist()
+        record = dict(result.meta)
+        record["fraud_score"] = result.fraud_score
+        record["flagged"] = result.flagged
+        record["risk_tier"] = risk_tier
+        record.update(zip(scan.feature_names, values))
+        return record
@@ -0,0 +1,243 @@
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional
+import pandas as pd
+from sqlalchemy import select, update
+from backend.core.config import settings
+from backend.core.metrics import gauge, span
+from backend.db.session import SessionLocal
+from backend.models.job import ScanJob
+from backend.services.audit_service import audit_logger
+from backend.services.ingest import read_feature_chunks
+from backend.services.model_registry import ModelVersion
+from backend.services.model_service import (
+    get_model_version, predict_chunks, read_csv_chunks, score_feature_chunks, timed_chunks,
+)
+from backend.services.result_store import ResultStore
+from backend.services.velocity import base_features, uses_velocity
+
+SPOOL_BLOCK_SIZE = 1 << 20
+
+class JobQueueFull(Exception):
+    """Raised when JOB_MAX_QUEUED jobs are already waiting for a worker."""
+
+class JobStopped(Exception):
+    """Raised inside a running job when the runner shuts down; the job stays resumable."""
+
+class ScanJobRunner:
+    """
+    Runs scans of spooled uploads on JOB_WORKERS background threads.
+
+    Each chunk's rows, its dashboard aggregates and the job's progress
+    counters are committed in one transaction, so after a crash or restart
+    start() picks up every unfinished job and continues after its last stored
+    chunk. A resumed job only continues its scan if the active model is still
+    the one the scan started with; otherwise the scan is marked failed and the
+    job starts over. Assumes a single API process, like the model registry.
+
+    Velocity features of CSV uploads come from the process-wide velocity
+    state, which live traffic keeps updating, so it is not checkpointed per
+    job: rows scored after a resume see that state as restored from its last
+    snapshot plus whatever arrived since, not exactly what an uninterrupted
+    run would have seen.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or settings.JOB_WORKERS
+        self.result_store = ResultStore()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._queued = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    def start(self):
+        """Start the worker pool and resume the jobs left queued or running by the last process."""
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scan-job")
+        with SessionLocal() as db:
+            job_ids = db.execute(
+                select(ScanJob.id).where(ScanJob.status.in_(("queued", "running"))).order_by(ScanJob.created_at)
+            ).scalars().all()
+        for job_id in job_ids:
+            self._submit(job_id)
+        if job_ids:
+            print(f"Resuming {len(job_ids)} scan jobs")
+
+    def stop(self):
+        """Stop after the chunk each worker is on; unfinished jobs resume on the next start()."""
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        with self._lock:
+            self._queued = 0
+
+    def submit(self, source: BinaryIO, filename: Optional[str], fmt: str, user_email: str) -> ScanJob:
+        """Spool an upload to JOB_SPOOL_DIR and queue a job for it."""
+        if self._executor is None:
+            raise RuntimeError("Scan job runner is not running")
+        # Claim the queue slot up front so concurrent uploads cannot overshoot JOB_MAX_QUEUED
+        with self._lock:
+            if self._queued >= settings.JOB_MAX_QUEUED:
+                raise JobQueueFull(f"{self._queued} scan jobs are already waiting")
+            self._queued += 1
+        try:
+            job = self._create(source, filename, fmt, user_email)
+            self._executor.submit(self._run, job.id)
+        except BaseException:
+            with self._lock:
+                self._queued -= 1
+            raise
+        return job
+
+    def _create(self, source: BinaryIO, filename: Optional[str], fmt: str, user_email: str) -> ScanJob:
+
+        job_id = uuid.uuid4().hex
+        os.makedirs(settings.JOB_SPOOL_DIR, exist_ok=True)
+        spool_path = os.path.join(settings.JOB_SPOOL_DIR, f"{job_id}.{fmt}")
+        with span("job_spool"):
+            source.seek(0)
+            with open(spool_path, "wb") as f:
+                shutil.copyfileobj(source, f, SPOOL_BLOCK_SIZE)
+
+        with SessionLocal() as db:
+            job = ScanJob(
+                id=job_id, user_email=user_email, filename=filename or "", format=fmt,
+                spool_path=spool_path, chunk_size=settings.CSV_CHUNK_SIZE,
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            db.expunge(job)
+
+        audit_logger.log("scan_job_submitted", f"Queued job {job_id} for {filename or 'upload'} ({fmt})", user_email)
+        return job
+
+    def get(self, job_id: str) -> Optional[ScanJob]:
+        with SessionLocal() as db:
+            job = db.get(ScanJob, job_id)
+            if job is not None:
+                db.expunge(job)
+            return job
+
+    def flagged(self, job: ScanJob, limit: int) -> Optional[List[Dict]]:
+        """The most suspicious flagged rows of a completed job."""
+        if job.status != "completed" or job.scan_id is None:
+            return None
+        scan = self.result_store.get_scan(job.scan_id)
+        records, _ = self.result_store.get_flagged(scan, limit)
+        return records
+
+    def _submit(self, job_id: str):
+        if self._executor is None:
+            raise RuntimeError("Scan job runner is not running")
+        with self._lock:
+            self._queued += 1
+        self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id: str):
+        with self._lock:
+            self._queued -= 1
+        if self._stop.is_set():
+            return
+        try:
+            self._process(job_id)
+        except JobStopped:
+            print(f"Scan job {job_id} paused for shutdown; it resumes on restart")
+        except Exception as e:
+            print(f"Scan job {job_id} failed: {e}")
+            self._fail(job_id, str(e))
+
+    def _process(self, job_id: str):
+        job = self.get(job_id)
+        if job is None or job.status not in ("queued", "running"):
+            return
+
+        version = get_model_version()
+        scan_id = job.scan_id
+        if scan_id is not None:
+            scan = self.result_store.get_scan(scan_id)
+            if scan is None or scan.model_version != version.version:
+                # One scan's scores must all come from one model; start over with the active one
+                if scan is not None:
+                    self.result_store.finish_scan(scan_id, job.rows_processed, job.flagged_count, status="failed")
+                scan_id = None
+
+        if scan_id is None:
+            scan_id = self.result_store.create_scan(job.user_email, version.version)
+            self._update(job_id, status="running", scan_id=scan_id, rows_processed=0, flagged_count=0,
+                         chunks_completed=0, started_at=datetime.utcnow())
+            rows, flagged, chunks = 0, 0, 0
+        else:
+            self._update(job_id, status="running")
+            rows, flagged, chunks = job.rows_processed, job.flagged_count, job.chunks_completed
+            if job.format == "csv" and uses_velocity(version.feature_names):
+                print(f"Scan job {job_id} resumes at row {rows} with the live velocity state, not the state it paused with")
+
+        with open(job.spool_path, "rb") as source:
+            for result_df in self._scored_chunks(source, job, version, rows):
+                rows += len(result_df)
+                flagged += int(result_df["flagged"].sum())
+                chunks += 1
+                progress = update(ScanJob).where(ScanJob.id == job_id).values(
+                    rows_processed=rows, flagged_count=flagged, chunks_completed=chunks,
+                )
+                with span("persist", len(result_df)):
+                    self.result_store.add_results(
+                        scan_id, result_df, before_commit=lambda db: db.execute(progress), version=version,
+                    )
+                if self._stop.is_set():
+                    raise JobStopped()
+
+        self.result_store.finish_scan(scan_id, rows, flagged)
+        self._update(job_id, status="completed", finished_at=datetime.utcnow())
+        self._remove_spool(job.spool_path)
+        audit_logger.log("transaction_scan", f"Job {job_id}: processed {rows} transactions, {flagged} flagged", job.user_email)
+
+    @staticmethod
+    def _scored_chunks(source: BinaryIO, job: ScanJob, version: ModelVersion, skip_rows: int) -> Iterator[pd.DataFrame]:
+        """Score the upload chunk by chunk, starting after the skip_rows rows already stored."""
+        if job.format == "csv":
+            return predict_chunks(read_csv_chunks(source, job.chunk_size, version, skip_rows=skip_rows), version)
+        chunks = read_feature_chunks(source, job.format, base_features(version.feature_names), job.chunk_size)
+        # Binary formats are cut at the same offsets every time, so stored chunks are skipped whole
+        remaining = (chunk for chunk in timed_chunks(chunks, f"{job.format}_decode") if chunk.start >= skip_rows)
+        return score_feature_chunks(remaining, version)
+
+    def _fail(self, job_id: str, error: str):
+        job = self.get(job_id)
+        if job is None:
+            return
+        if job.scan_id is not None:
+            try:
+                self.result_store.finish_scan(job.scan_id, job.rows_processed, job.flagged_count, status="failed")
+            except Exception as e:
+                print(f"Failed to close scan {job.scan_id}: {e}")
+        self._update(job_id, status="failed", error=error, finished_at=datetime.utcnow())
+        self._remove_spool(job.spool_path)
+        audit_logger.log("transaction_scan", f"Job {job_id} error: {error}", job.user_email, status="error")
+
+    @staticmethod
+    def _update(job_id: str, **values):
+        with SessionLocal() as db:
+            db.execute(update(ScanJob).where(ScanJob.id == job_id).values(**values))
+            db.commit()
+
+    @staticmethod
+    def _remove_spool(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+scan_job_runner = ScanJobRunner()
+
+gauge("scan_jobs_queued", "Scan jobs waiting for a worker", fn=lambda: scan_job_runner.queue_depth)
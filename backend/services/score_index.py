@@ -0,0 +1,83 @@
+import os
+from typing import Optional
+import numpy as np
+from backend.core.config import settings
+from backend.models.scan import Scan
+
+class ScoreIndex:
+    """
+    The scan_results ids of one scan ordered by (fraud_score, id), most
+    suspicious first, stored as two .npy files and memory-mapped on load.
+
+    "Rows scoring below T" is the prefix ending at a binary search for T, and
+    "top N" is the first N entries, so neither sorts nor scans the scan's rows.
+    The order matches the (fraud_score, id) keyset used by /flagged.
+    """
+
+    def __init__(self, scores: np.ndarray, ids: np.ndarray):
+        self.scores = scores
+        self.ids = ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def _paths(scan: Scan):
+        # Scan ids are reused when the database is recreated; the creation time tells those scans apart
+        key = f"scan-{scan.id}-{scan.created_at:%Y%m%d%H%M%S%f}"
+        base = os.path.join(settings.SCORE_INDEX_DIR, key)
+        return f"{base}.scores.npy", f"{base}.ids.npy"
+
+    @classmethod
+    def write(cls, scan: Scan, scores: np.ndarray, ids: np.ndarray) -> "ScoreIndex":
+        """Sort one scan's (score, id) pairs and persist them."""
+        order = np.lexsort((ids, scores))
+        index = cls(np.ascontiguousarray(scores[order], dtype=np.float64), np.ascontiguousarray(ids[order], dtype=np.int64))
+        os.makedirs(settings.SCORE_INDEX_DIR, exist_ok=True)
+        for path, array in zip(cls._paths(scan), (index.scores, index.ids)):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, path)
+        return index
+
+    @classmethod
+    def load(cls, scan: Scan) -> Optional["ScoreIndex"]:
+        """The scan's index, or None if its files are missing or do not cover the scan's rows."""
+        scores_path, ids_path = cls._paths(scan)
+        try:
+            index = cls(np.load(scores_path, mmap_mode="r"), np.load(ids_path, mmap_mode="r"))
+        except (FileNotFoundError, ValueError):
+            return None
+        if len(index.ids) != scan.total_transactions or len(index.scores) != len(index.ids):
+            return None
+        return index
+
+    @classmethod
+    def delete(cls, scan: Scan) -> None:
+        for path in cls._paths(scan):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def count_below(self, threshold: float) -> int:
+        """Number of rows with fraud_score < threshold."""
+        return int(np.searchsorted(self.scores, threshold, side="left"))
+
+    def position_after(self, after_score: float, after_id: Optional[int] = None) -> int:
+        """Index of the first entry that sorts after the keyset cursor (after_score, after_id)."""
+        if after_id is None:
+            return int(np.searchsorted(self.scores, after_score, side="right"))
+        lo = int(np.searchsorted(self.scores, after_score, side="left"))
+        hi = int(np.searchsorted(self.scores, after_score, side="right"))
+        return lo + int(np.searchsorted(self.ids[lo:hi], after_id, side="right"))
+
+    def below(self, threshold: float, start: int = 0, limit: Optional[int] = None) -> np.ndarray:
+        """Ids of rows scoring below threshold, from position start, at most limit of them."""
+        end = self.count_below(threshold)
+        if limit is not None:
+            end = min(end, start + limit)
+        return np.asarray(self.ids[start:end])
+
+    def top(self, n: int) -> np.ndarray:
+        """Ids of the n most suspicious rows."""
+        return np.asarray(self.ids[:n])
@@ -0,0 +1,201 @@
+import numpy as np
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from backend.core.config import settings
+from backend.db.session import SessionLocal
+from backend.models.scan import Scan, ScanResult
+from backend.models.stats import ScoreAggregate, ScoreHistogramBucket
+
+# Fixed fraud_score buckets: IsolationForest decision scores fall in [-0.5, 0.5];
+# anything outside is counted in the first or last bucket
+SCORE_BUCKET_EDGES = np.linspace(-0.5, 0.5, 101)
+N_BUCKETS = len(SCORE_BUCKET_EDGES) - 1
+
+GLOBAL_KEY = ""
+
+def score_histogram(scores: np.ndarray) -> np.ndarray:
+    """Count scores per bucket; bucket i holds SCORE_BUCKET_EDGES[i] <= score < SCORE_BUCKET_EDGES[i + 1]."""
+    buckets = np.searchsorted(SCORE_BUCKET_EDGES, scores, side="right") - 1
+    return np.bincount(np.clip(buckets, 0, N_BUCKETS - 1), minlength=N_BUCKETS)
+
+def tier_counts(histogram: np.ndarray) -> Dict[str, int]:
+    """
+    Split a score histogram into high/medium/low risk counts at the configured
+    thresholds. Exact when the thresholds fall on bucket edges (multiples of
+    0.01); otherwise a threshold is rounded up to the next edge.
+    """
+    high_end = int(np.searchsorted(SCORE_BUCKET_EDGES, settings.RISK_HIGH_THRESHOLD))
+    medium_end = int(np.searchsorted(SCORE_BUCKET_EDGES, settings.RISK_MEDIUM_THRESHOLD))
+    return {
+        "high": int(histogram[:high_end].sum()),
+        "medium": int(histogram[high_end:medium_end].sum()),
+        "low": int(histogram[medium_end:].sum()),
+    }
+
+class ScoreStats:
+    """
+    Dashboard aggregates maintained incrementally as scans are stored.
+
+    Each stored chunk adds its counts and score histogram to its scan's
+    aggregate; when the scan completes, the scan aggregate is added to its
+    user's and the global aggregate in the same transaction that marks it
+    completed. Reads touch one aggregate row and at most N_BUCKETS bucket rows,
+    however many transactions have been scored. All updates are additive
+    upserts, so concurrent scans never overwrite each other's counts.
+    """
+
+    def add_scores(self, db: Session, scan_id: int, scores: np.ndarray, flagged_count: int) -> None:
+        """Add one chunk of a scan's scores to the scan aggregate (committed by the caller)."""
+        self._increment(db, "scan", str(scan_id), len(scores), flagged_count, 0, None, score_histogram(scores))
+
+    def merge_scan(self, db: Session, scan: Scan) -> None:
+        """Fold a completed scan's aggregate into its user's and the global one (committed by the caller)."""
+        aggregate = db.get(ScoreAggregate, ("scan", str(scan.id)))
+        total = aggregate.total_transactions if aggregate is not None else 0
+        flagged = aggregate.flagged_count if aggregate is not None else 0
+        histogram = self._histogram(db, "scan", str(scan.id))
+
+        self._increment(db, "scan", str(scan.id), 0, 0, 1, scan.completed_at, np.zeros(N_BUCKETS, dtype=np.int64))
+        self._increment(db, "user", scan.user_email, total, flagged, 1, scan.completed_at, histogram)
+        self._increment(db, "global", GLOBAL_KEY, total, flagged, 1, scan.completed_at, histogram)
+
+    def get(self, scope: str, key: str = GLOBAL_KEY) -> Optional[Dict]:
+        """Totals and score histogram of one aggregate, or None if nothing was recorded."""
+        with SessionLocal() as db:
+            aggregate = db.get(ScoreAggregate, (scope, key))
+            if aggregate is None:
+                return None
+            return {
+                "total_transactions": aggregate.total_transactions,
+                "flagged_count": aggregate.flagged_count,
+                "scan_count": aggregate.scan_count,
+                "last_scan_time": aggregate.last_scan_time,
+                "histogram": self._histogram(db, scope, key),
+            }
+
+    async def get_async(self, db: AsyncSession, scope: str, key: str = GLOBAL_KEY) -> Optional[Dict]:
+        """get() on an async session."""
+        aggregate = await db.get(ScoreAggregate, (scope, key))
+        if aggregate is None:
+            return None
+        return {
+            "total_transactions": aggregate.total_transactions,
+            "flagged_count": aggregate.flagged_count,
+            "scan_count": aggregate.scan_count,
+            "last_scan_time": aggregate.last_scan_time,
+            "histogram": self._to_histogram((await db.execute(self._histogram_query(scope, key))).all()),
+        }
+
+    def dashboard(self, scope: str, key: str = GLOBAL_KEY) -> Dict:
+        """DashboardStats fields for one aggregate."""
+        return self._dashboard_fields(self.get(scope, key))
+
+    async def dashboard_async(self, db: AsyncSession, scope: str, key: str = GLOBAL_KEY) -> Dict:
+        return self._dashboard_fields(await self.get_async(db, scope, key))
+
+    @staticmethod
+    def _dashboard_fields(stats: Optional[Dict]) -> Dict:
+        if stats is None:
+            stats = {"total_transactions": 0, "flagged_count": 0, "last_scan_time": None,
+                     "histogram": np.zeros(N_BUCKETS, dtype=np.int64)}
+        total = stats["total_transactions"]
+        tiers = tier_counts(stats["histogram"])
+        return {
+            "total_transactions": total,
+            "flagged_transactions": stats["flagged_count"],
+            "fraud_rate": stats["flagged_count"] / total if total else 0.0,
+            "last_scan_time": stats["last_scan_time"],
+            "high_risk_transactions": tiers["high"],
+            "medium_risk_transactions": tiers["medium"],
+            "low_risk_transactions": tiers["low"],
+        }
+
+    def rebuild(self) -> int:
+        """Recompute every aggregate from the stored scan results; returns the number of scans read."""
+        with SessionLocal() as db:
+            db.execute(delete(ScoreHistogramBucket))
+            db.execute(delete(ScoreAggregate))
+            scans = db.execute(select(Scan).order_by(Scan.id)).scalars().all()
+            for scan in scans:
+                rows = db.execute(
+                    select(ScanResult.fraud_score, ScanResult.flagged).where(ScanResult.scan_id == scan.id)
+                ).all()
+                if rows:
+                    scores = np.fromiter((row[0] for row in rows), dtype=np.float64, count=len(rows))
+                    flagged = sum(1 for row in rows if row[1])
+                    self.add_scores(db, scan.id, scores, flagged)
+                if scan.status == "completed":
+                    self.merge_scan(db, scan)
+            db.commit()
+        print(f"Rebuilt dashboard aggregates from {len(scans)} scans")
+        return len(scans)
+
+    @classmethod
+    def _histogram(cls, db: Session, scope: str, key: str) -> np.ndarray:
+        return cls._to_histogram(db.execute(cls._histogram_query(scope, key)).all())
+
+    @staticmethod
+    def _histogram_query(scope: str, key: str):
+        return (
+            select(ScoreHistogramBucket.bucket, ScoreHistogramBucket.count)
+            .where(ScoreHistogramBucket.scope == scope, ScoreHistogramBucket.key == key)
+        )
+
+    @staticmethod
+    def _to_histogram(rows) -> np.ndarray:
+        histogram = np.zeros(N_BUCKETS, dtype=np.int64)
+        for bucket, count in rows:
+            histogram[bucket] = count
+        return histogram
+
+    @staticmethod
+    def _increment(
+        db: Session,
+        scope: str,
+        key: str,
+        total: int,
+        flagged: int,
+        scans: int,
+        last_scan_time: Optional[datetime],
+        histogram: np.ndarray,
+    ) -> None:
+        stmt = sqlite_insert(ScoreAggregate).values(
+            scope=scope, key=key, total_transactions=total, flagged_count=flagged,
+            scan_count=scans, last_scan_time=last_scan_time,
+        )
+        excluded = stmt.excluded
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["scope", "key"],
+            set_={
+                "total_transactions": ScoreAggregate.total_transactions + excluded.total_transactions,
+                "flagged_count": ScoreAggregate.flagged_count + excluded.flagged_count,
+                "scan_count": ScoreAggregate.scan_count + excluded.scan_count,
+                # SQLite's scalar max() is NULL if either side is
+                "last_scan_time": func.coalesce(
+                    func.max(ScoreAggregate.last_scan_time, excluded.last_scan_time),
+                    excluded.last_scan_time,
+                    ScoreAggregate.last_scan_time,
+                ),
+            },
+        ))
+
+        nonzero = np.flatnonzero(histogram)
+        if len(nonzero) == 0:
+            return
+        stmt = sqlite_insert(ScoreHistogramBucket).values([
+            {"scope": scope, "key": key, "bucket": int(bucket), "count": int(histogram[bucket])}
+            for bucket in nonzero
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["scope", "key", "bucket"],
+            set_={"count": ScoreHistogramBucket.count + stmt.excluded.count},
+        ))
+
+score_stats = ScoreStats()
+
+if __name__ == "__main__":
+    score_stats.rebuild()
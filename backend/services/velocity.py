@@ -0,0 +1,351 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from backend.core.config import settings
+from backend.core.metrics import gauge
+
+VELOCITY_PREFIX = "vel_"
+GAP_FEATURE = "vel_seconds_since_last"
+# Epoch of a bucket that has never been written; far below any real epoch
+_EMPTY_EPOCH = np.iinfo(np.int64).min // 4
+
+def parse_windows(windows: str) -> List[int]:
+    return sorted({int(w) for w in windows.split(",") if w.strip()})
+
+def velocity_feature_names(windows: Sequence[int]) -> List[str]:
+    """Feature columns produced for the given windows, in the order they are appended."""
+    names = []
+    for window in windows:
+        names += [f"vel_count_{window}s", f"vel_amount_sum_{window}s", f"vel_amount_max_{window}s"]
+    return names + [GAP_FEATURE]
+
+def base_features(feature_names: Sequence[str]) -> List[str]:
+    """The model features that come from the input itself rather than the velocity engine."""
+    return [name for name in feature_names if not name.startswith(VELOCITY_PREFIX)]
+
+def uses_velocity(feature_names: Sequence[str]) -> bool:
+    return any(name.startswith(VELOCITY_PREFIX) for name in feature_names)
+
+def _range_max(values: np.ndarray, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """max(values[left[i]:right[i] + 1]) for every i, from a sparse table (O(n log n) to build)."""
+    result = np.empty(len(left), dtype=values.dtype)
+    if len(left) == 0:
+        return result
+    lengths = right - left + 1
+    levels = np.floor(np.log2(lengths)).astype(np.int64)
+    table = [values]
+    for level in range(1, int(levels.max()) + 1):
+        half = 1 << (level - 1)
+        previous = table[-1]
+        table.append(np.maximum(previous[:-half], previous[half:]))
+    for level in np.unique(levels):
+        rows = levels == level
+        width = 1 << int(level)
+        result[rows] = np.maximum(table[level][left[rows]], table[level][right[rows] - width + 1])
+    return result
+
+class VelocityEngine:
+    """
+    Rolling per-customer aggregates over event-time windows: transaction count,
+    amount sum, amount max and seconds since the customer's previous transaction.
+
+    Each window of W seconds is kept as `buckets` sub-buckets of W / buckets
+    seconds in flat numpy arrays indexed by customer slot, so an event costs
+    O(windows x buckets) whatever the customer's history, and a window covers
+    its last `buckets` sub-buckets (up to one sub-bucket more than W).
+    A chunk of events is processed at once: events are sorted by (customer,
+    time), in-chunk history comes from prefix sums and a sparse range-max
+    table, earlier history from the bucket arrays. Each event counts itself and
+    everything before it, so training and serving see the same values for the
+    same event stream. Events are expected in time order per customer; an
+    event older than a customer's newest bucket is scored but not stored.
+
+    Customers idle for longer than `ttl` seconds of event time are evicted when
+    slots run out, before the arrays grow. save()/load() snapshot the state.
+    """
+
+    def __init__(self, windows: Sequence[int], buckets: int = 6, ttl: float = 604800.0, capacity: int = 1024):
+        self.windows = [int(w) for w in windows]
+        self.buckets = int(buckets)
+        self.ttl = float(ttl)
+        self.feature_names = velocity_feature_names(self.windows)
+        self._widths = np.array([w / self.buckets for w in self.windows], dtype=np.float64)
+        self._slots: Dict[str, int] = {}
+        self._keys: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._now = -np.inf
+        self._lock = threading.Lock()
+        self._last_save = time.monotonic()
+        self._allocate_arrays(capacity)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _allocate_arrays(self, capacity: int):
+        shape = (capacity, len(self.windows), self.buckets)
+        self._last_time = np.full(capacity, np.nan)
+        self._epoch = np.full(shape, _EMPTY_EPOCH, dtype=np.int64)
+        self._count = np.zeros(shape, dtype=np.int32)
+        self._sum = np.zeros(shape, dtype=np.float64)
+        self._max = np.zeros(shape, dtype=np.float64)
+        self._free = list(range(capacity - 1, len(self._keys) - 1, -1))
+        self._keys += [None] * (capacity - len(self._keys))
+
+    def _grow(self):
+        old = (self._last_time, self._epoch, self._count, self._sum, self._max)
+        size = len(self._keys)
+        self._allocate_arrays(2 * size)
+        for new, previous in zip((self._last_time, self._epoch, self._count, self._sum, self._max), old):
+            new[:size] = previous
+
+    def _clear_slots(self, slots):
+        self._last_time[slots] = np.nan
+        self._epoch[slots] = _EMPTY_EPOCH
+        self._count[slots] = 0
+        self._sum[slots] = 0.0
+        self._max[slots] = 0.0
+
+    def evict_expired(self) -> int:
+        """Free the slots of customers idle for longer than ttl; returns how many were evicted."""
+        expired = np.flatnonzero(self._last_time < self._now - self.ttl)
+        for slot in expired.tolist():
+            del self._slots[self._keys[slot]]
+            self._keys[slot] = None
+            self._free.append(slot)
+        self._clear_slots(expired)
+        return len(expired)
+
+    def _assign(self, keys: np.ndarray) -> np.ndarray:
+        codes, uniques = pd.factorize(keys)
+        if len(self._free) < len(uniques):
+            self.evict_expired()
+        slots = np.empty(len(uniques), dtype=np.int64)
+        for i, key in enumerate(uniques.tolist()):
+            slot = self._slots.get(key)
+            if slot is None:
+                if not self._free:
+                    self._grow()
+                slot = self._free.pop()
+                self._slots[key] = slot
+                self._keys[slot] = key
+            slots[i] = slot
+        return slots[codes]
+
+    def update(self, keys: Optional[Sequence], times: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+        """
+        Record a chunk of events and return their feature rows (columns in
+        feature_names order). Events without a key are scored as a customer's
+        first transaction and not stored.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        amounts = np.nan_to_num(np.asarray(amounts, dtype=np.float64))
+        features = self._first_event(amounts)
+        if keys is None or len(times) == 0:
+            return features
+
+        keys = pd.Series(keys).astype("string").fillna("")
+        known = (keys != "").to_numpy(dtype=bool) & ~np.isnan(times)
+        if not known.any():
+            return features
+        rows = np.flatnonzero(known)
+        with self._lock:
+            features[rows] = self._update(keys[known].to_numpy(dtype=object), times[rows], amounts[rows])
+        self._maybe_save()
+        return features
+
+    def _first_event(self, amounts: np.ndarray) -> np.ndarray:
+        features = np.empty((len(amounts), len(self.feature_names)), dtype=np.float64)
+        for w in range(len(self.windows)):
+            features[:, 3 * w] = 1
+            features[:, 3 * w + 1] = amounts
+            features[:, 3 * w + 2] = amounts
+        features[:, -1] = self.windows[-1]
+        return features
+
+    def _update(self, keys: np.ndarray, times: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+        n = len(keys)
+        B = self.buckets
+        slots = self._assign(keys)
+        order = np.lexsort((np.arange(n), times, slots))
+        slots = slots[order]
+        t = times[order]
+        a = amounts[order]
+        sorted_features = np.empty((n, len(self.feature_names)), dtype=np.float64)
+
+        first = np.r_[True, slots[1:] != slots[:-1]]
+        last = np.r_[slots[1:] != slots[:-1], True]
+        previous = np.where(first, self._last_time[slots], np.r_[np.nan, t[:-1]])
+        sorted_features[:, -1] = np.clip(np.nan_to_num(t - previous, nan=self.windows[-1]), 0, self.windows[-1])
+
+        positions = np.arange(n)
+        prefix = np.concatenate([[0.0], np.cumsum(a)])
+        for w, width in enumerate(self._widths):
+            epochs = np.floor(t / width).astype(np.int64)
+            # (customer, epoch) as one sortable integer; rows are already in that order
+            span = int(epochs.max() - epochs.min()) + B
+            composite = slots * span + (epochs - epochs.min())
+            left = np.searchsorted(composite, composite - (B - 1), side="left")
+
+            count = (positions - left + 1).astype(np.float64)
+            total = prefix[positions + 1] - prefix[left]
+            peak = _range_max(a, left, positions)
+
+            # History from earlier chunks: the stored buckets inside this event's window
+            stored = self._epoch[slots, w]
+            live = (stored > (epochs - B)[:, None]) & (stored <= epochs[:, None])
+            count += (self._count[slots, w] * live).sum(axis=1)
+            total += (self._sum[slots, w] * live).sum(axis=1)
+            peak = np.maximum(peak, np.where(live, self._max[slots, w], -np.inf).max(axis=1))
+            sorted_features[:, 3 * w:3 * w + 3] = np.column_stack([count, total, peak])
+
+            self._store(w, composite, slots, epochs, a)
+
+        self._last_time[slots[last]] = np.fmax(self._last_time[slots[last]], t[last])
+        self._now = max(self._now, float(t.max()))
+
+        features = np.empty_like(sorted_features)
+        features[order] = sorted_features
+        return features
+
+    def _store(self, w: int, composite: np.ndarray, slots: np.ndarray, epochs: np.ndarray, amounts: np.ndarray):
+        """Fold one chunk's (customer, sub-bucket) groups into the bucket arrays of window w."""
+        starts = np.flatnonzero(np.r_[True, composite[1:] != composite[:-1]])
+        counts = np.diff(np.r_[starts, len(composite)])
+        sums = np.add.reduceat(amounts, starts)
+        peaks = np.maximum.reduceat(amounts, starts)
+        group_slots = slots[starts]
+        group_epochs = epochs[starts]
+        buckets = group_epochs % self.buckets
+
+        # Groups are in (customer, epoch) order; per ring position only the newest survives
+        ring = group_slots * self.buckets + buckets
+        _, last_in_reverse = np.unique(ring[::-1], return_index=True)
+        keep = len(ring) - 1 - last_in_reverse
+        group_slots, buckets, group_epochs = group_slots[keep], buckets[keep], group_epochs[keep]
+        counts, sums, peaks = counts[keep], sums[keep], peaks[keep]
+
+        stored = self._epoch[group_slots, w, buckets]
+        same = stored == group_epochs
+        newer = stored < group_epochs
+        s, b = group_slots[same], buckets[same]
+        self._count[s, w, b] += counts[same].astype(np.int32)
+        self._sum[s, w, b] += sums[same]
+        self._max[s, w, b] = np.maximum(self._max[s, w, b], peaks[same])
+        s, b = group_slots[newer], buckets[newer]
+        self._epoch[s, w, b] = group_epochs[newer]
+        self._count[s, w, b] = counts[newer]
+        self._sum[s, w, b] = sums[newer]
+        self._max[s, w, b] = peaks[newer]
+
+    def features_for(
+        self,
+        feature_names: Sequence[str],
+        keys: Optional[Sequence],
+        times: Optional[np.ndarray],
+        amounts: Optional[np.ndarray],
+        n_rows: int,
+    ) -> np.ndarray:
+        """
+        update() for inputs that may lack a time or amount column, returning only
+        the requested vel_* columns. Without times, every event happens now.
+        """
+        wanted = [name for name in feature_names if name.startswith(VELOCITY_PREFIX)]
+        unknown = [name for name in wanted if name not in self.feature_names]
+        if unknown:
+            raise ValueError(
+                f"Model expects velocity features {', '.join(unknown)}, "
+                f"but VELOCITY_WINDOWS={','.join(map(str, self.windows))}"
+            )
+        if times is None:
+            times = np.full(n_rows, time.time())
+        if amounts is None:
+            amounts = np.zeros(n_rows)
+        features = self.update(keys, times, amounts)
+        return features[:, [self.feature_names.index(name) for name in wanted]]
+
+    def append_features(self, df: pd.DataFrame, feature_names: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Add the vel_* columns of feature_names (all of them by default) to a frame of events."""
+        feature_names = feature_names or self.feature_names
+        key_column = next((col for col in settings.VELOCITY_KEY_COLUMNS.split(",") if col in df.columns), None)
+        features = self.features_for(
+            feature_names,
+            df[key_column].to_numpy() if key_column else None,
+            df["Time"].to_numpy(dtype=np.float64) if "Time" in df.columns else None,
+            df["Amount"].to_numpy(dtype=np.float64) if "Amount" in df.columns else None,
+            len(df),
+        )
+        wanted = [name for name in feature_names if name.startswith(VELOCITY_PREFIX)]
+        for j, name in enumerate(wanted):
+            df[name] = features[:, j]
+        return df
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Snapshot the live customers' state (compacted) to an .npz file."""
+        path = path or settings.VELOCITY_SNAPSHOT_PATH
+        with self._lock:
+            slots = np.array(sorted(self._slots.values()), dtype=np.int64)
+            arrays = {
+                "windows": np.array(self.windows, dtype=np.int64),
+                "buckets": np.array(self.buckets),
+                "now": np.array(self._now),
+                "keys": np.array([self._keys[slot] for slot in slots.tolist()], dtype=str),
+                "last_time": self._last_time[slots],
+                "epoch": self._epoch[slots],
+                "count": self._count[slots],
+                "sum": self._sum[slots],
+                "max": self._max[slots],
+            }
+            self._last_save = time.monotonic()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    def load(self, path: Optional[str] = None) -> bool:
+        """Restore a snapshot taken with the same windows and buckets; returns whether one was loaded."""
+        path = path or settings.VELOCITY_SNAPSHOT_PATH
+        try:
+            snapshot = np.load(path, allow_pickle=False)
+        except (FileNotFoundError, ValueError, OSError):
+            return False
+        with snapshot:
+            if snapshot["windows"].tolist() != self.windows or int(snapshot["buckets"]) != self.buckets:
+                print(f"Ignoring velocity snapshot {path}: taken with other windows")
+                return False
+            keys = snapshot["keys"].tolist()
+            with self._lock:
+                self._slots, self._keys = {}, []
+                self._allocate_arrays(max(len(keys) * 2, 1024))
+                n = len(keys)
+                self._last_time[:n] = snapshot["last_time"]
+                self._epoch[:n] = snapshot["epoch"]
+                self._count[:n] = snapshot["count"]
+                self._sum[:n] = snapshot["sum"]
+                self._max[:n] = snapshot["max"]
+                self._keys[:n] = keys
+                self._slots = {key: slot for slot, key in enumerate(keys)}
+                self._free = [slot for slot in self._free if slot >= n]
+                self._now = float(snapshot["now"])
+        print(f"Loaded velocity state for {len(keys)} customers from {path}")
+        return True
+
+    def _maybe_save(self):
+        if settings.VELOCITY_SNAPSHOT_INTERVAL > 0 and time.monotonic() - self._last_save >= settings.VELOCITY_SNAPSHOT_INTERVAL:
+            try:
+                self.save()
+            except Exception as e:
+                print(f"Failed to snapshot velocity state: {e}")
+
+def create_engine_from_settings() -> VelocityEngine:
+    return VelocityEngine(parse_windows(settings.VELOCITY_WINDOWS), settings.VELOCITY_BUCKETS, settings.VELOCITY_TTL)
+
+# Serving state; restored from and snapshotted to VELOCITY_SNAPSHOT_PATH by the app lifespan
+velocity_engine = create_engine_from_settings()
+
+gauge("velocity_customers", "Customers tracked by the velocity feature engine", fn=lambda: len(velocity_engine))
@@ -1,10 +1,47 @@
 import pytest
 import os
 import sys
+import tempfile
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Settings are read when backend.core.config is first imported, so point every
+# file the app writes at a scratch directory before any test imports it
+TEST_DIR = tempfile.mkdtemp(prefix="fraud-tests-")
+os.environ.update({
+    "DB_FILE": os.path.join(TEST_DIR, "test.db"),
+    "MODEL_PATH": os.path.join(TEST_DIR, "model.joblib"),
+    "SCALER_PATH": os.path.join(TEST_DIR, "scaler.joblib"),
+    "SCORE_INDEX_DIR": os.path.join(TEST_DIR, "score_index"),
+    "JOB_SPOOL_DIR": os.path.join(TEST_DIR, "job_spool"),
+    "VELOCITY_SNAPSHOT_PATH": os.path.join(TEST_DIR, "velocity_state.npz"),
+    "MODEL_WATCH_INTERVAL": "0",
+    "DRIFT_WINDOW_ROWS": "0",
+})
 
 def pytest_configure(config):
     """Configure pytest with basic settings."""
     config.addinivalue_line("markers", "slow: marks tests as slow")
     config.addinivalue_line("markers", "integration: marks tests as integration tests")
+
+@pytest.fixture(scope="session")
+def trained_model():
+    """A small model trained on synthetic transactions, saved where MODEL_PATH/SCALER_PATH point."""
+    import joblib
+    from benchmarks.synthetic import generate_transactions
+    from ml_model.train_model import preprocess, train_isolation_forest
+
+    X_scaled, y, scaler = preprocess(generate_transactions(5000, 0.01, seed=7, with_meta=False))
+    model = train_isolation_forest(X_scaled, y, n_estimators=50, n_jobs=1)
+    joblib.dump(model, os.environ["MODEL_PATH"])
+    joblib.dump(scaler, os.environ["SCALER_PATH"])
+    return model, scaler
+
+@pytest.fixture(scope="session")
+def database(trained_model):
+    """Tables created in the scratch DB_FILE."""
+    from backend.db.init_db import create_tables
+
+    create_tables()
+    return os.environ["DB_FILE"]
@@ -0,0 +1,42 @@
+import pytest
+from backend.core.config import settings
+from backend.core.metrics import counter
+from backend.services import audit_service
+from backend.services.audit_service import AuditLogger
+
+class LockedSession:
+    def __enter__(self):
+        raise RuntimeError("database is locked")
+
+    def __exit__(self, *exc):
+        return False
+
+@pytest.fixture
+def audit(database):
+    logger = AuditLogger(flush_interval=0.01)
+    logger._thread = object()  # keep log() from starting the background flusher
+    yield logger
+    logger._thread = None
+
+def test_failed_flush_keeps_records_for_the_next_one(audit, monkeypatch):
+    audit.log("retry_test", "first", "retry@example.com")
+    audit.log("retry_test", "second", "retry@example.com")
+    with monkeypatch.context() as patch:
+        patch.setattr(audit_service, "SessionLocal", LockedSession)
+        assert audit.flush() == 0
+    assert audit.queue_depth == 2
+    assert audit.flush() == 2
+    details = [entry.details for entry in audit.query(action="retry_test", user="retry@example.com")]
+    assert sorted(details) == ["first", "second"]
+
+def test_records_are_dropped_only_after_max_retries(audit, monkeypatch):
+    dropped = counter("audit_records_dropped_total", "Audit records dropped after repeated flush failures")
+    before = dropped.value
+    monkeypatch.setattr(audit_service, "SessionLocal", LockedSession)
+    audit.log("drop_test", "lost", "drop@example.com")
+    for _ in range(settings.AUDIT_MAX_RETRIES):
+        audit.flush()
+        assert audit.queue_depth == 1
+    audit.flush()
+    assert audit.queue_depth == 0
+    assert dropped.value == before + 1
@@ -0,0 +1,37 @@
+import asyncio
+import os
+import joblib
+import pytest
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+from benchmarks.synthetic import generate_transactions
+from backend.services.batcher import MicroBatcher
+from backend.services.model_registry import ModelRegistry
+from backend.services.model_service import score_matrix
+
+def test_batch_spanning_a_reload_scores_each_request_with_its_version(trained_model, tmp_path):
+    registry = ModelRegistry()
+    before = registry.load(os.environ["MODEL_PATH"], os.environ["SCALER_PATH"])
+    X = generate_transactions(2000, 0.01, seed=41, with_meta=False, with_label=False)
+    # The reloaded model has one feature fewer, so its vectors cannot share a matrix with the old ones
+    scaler = StandardScaler().fit(X.drop(columns=["Time"]))
+    model = IsolationForest(n_estimators=10, random_state=0).fit(scaler.transform(X.drop(columns=["Time"])))
+    joblib.dump(model, tmp_path / "model.joblib")
+    joblib.dump(scaler, tmp_path / "scaler.joblib")
+    after = registry.load(str(tmp_path / "model.joblib"), str(tmp_path / "scaler.joblib"))
+
+    rows = X.iloc[:6]
+    requests = [(rows[before.feature_names].to_numpy()[i], before) for i in range(3)]
+    requests += [(rows[after.feature_names].to_numpy()[i], after) for i in range(3)]
+
+    async def score_all():
+        batcher = MicroBatcher(score_matrix, max_batch_size=16, max_wait_ms=0)
+        try:
+            return await asyncio.gather(*(batcher.submit(features, version) for features, version in requests))
+        finally:
+            await batcher.stop()
+
+    results = asyncio.run(score_all())
+    for (features, version), (score, label) in zip(requests, results):
+        expected_score, expected_label = version.score(features[None, :])
+        assert score == pytest.approx(expected_score[0], abs=1e-12) and label == expected_label[0]
@@ -0,0 +1,113 @@
+import os
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+from benchmarks.synthetic import generate_transactions
+from backend.core.config import settings
+from backend.services.forest_engine import CompiledForest, export_artifact, load_artifact, read_artifact_header
+from backend.services.model_registry import ModelRegistry
+
+def heavy_tailed(rng: np.random.Generator, n_rows: int, n_features: int = 8) -> np.ndarray:
+    """Student-t features on very different scales, a lognormal Amount and a Time column."""
+    X = rng.standard_t(2, size=(n_rows, n_features)) * rng.lognormal(0, 2, n_features)
+    X[:, 0] = rng.uniform(0, 172800, n_rows).round()
+    X[:, -1] = rng.lognormal(3, 1.5, n_rows).round(2)
+    return X
+
+def on_split_boundaries(rng, model, scaler, X: np.ndarray) -> np.ndarray:
+    """Move one feature of every row onto a split threshold (in raw units), give or take a few ulps."""
+    splits = [(tree_features[e.tree_.feature[node]], e.tree_.threshold[node])
+              for e, tree_features in zip(model.estimators_, model.estimators_features_)
+              for node in np.flatnonzero(e.tree_.children_left != -1)]
+    chosen = rng.integers(0, len(splits), len(X))
+    features = np.array([splits[i][0] for i in chosen])
+    raw = np.array([splits[i][1] for i in chosen]) * scaler.scale_[features] + scaler.mean_[features]
+    X = X.copy()
+    X[np.arange(len(X)), features] = raw + np.spacing(raw) * rng.integers(-3, 4, len(X))
+    return X
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(3)
+    X_train = heavy_tailed(rng, 5000)
+    scaler = StandardScaler().fit(X_train)
+    model = IsolationForest(n_estimators=50, max_samples=512, random_state=0).fit(scaler.transform(X_train))
+    return model, scaler, CompiledForest.from_sklearn(model, scaler)
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_matches_sklearn_on_split_boundaries(fitted, dtype):
+    model, scaler, forest = fitted
+    rng = np.random.default_rng(5)
+    X = on_split_boundaries(rng, model, scaler, heavy_tailed(rng, 20000)).astype(dtype)
+
+    X_scaled = scaler.transform(X)
+    scores, labels = forest.score(X)
+    np.testing.assert_allclose(scores, model.decision_function(X_scaled), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(labels, model.predict(X_scaled))
+
+def test_matches_sklearn_on_heavy_tailed_rows(fitted):
+    model, scaler, forest = fitted
+    X = heavy_tailed(np.random.default_rng(8), 20000)
+    X_scaled = scaler.transform(X)
+    np.testing.assert_allclose(forest.score(X)[0], model.decision_function(X_scaled), rtol=0, atol=1e-12)
+
+def test_scaler_without_centering(fitted):
+    model, _, _ = fitted
+    rng = np.random.default_rng(9)
+    X = heavy_tailed(rng, 5000)
+    scaler = StandardScaler(with_mean=False).fit(X)
+    forest = CompiledForest.from_sklearn(model, scaler)
+    np.testing.assert_allclose(forest.score(X)[0], model.decision_function(scaler.transform(X)), rtol=0, atol=1e-12)
+
+def test_path_attributions_are_shares(fitted):
+    _, _, forest = fitted
+    shares = forest.path_attributions(heavy_tailed(np.random.default_rng(10), 300))
+    assert shares.shape == (300, forest.n_features)
+    assert (shares >= 0).all()
+    np.testing.assert_allclose(shares.sum(axis=1), 1.0)
+
+@pytest.fixture
+def artifact(trained_model, tmp_path):
+    model, scaler = trained_model
+    path = str(tmp_path / "model.forest")
+    digest = export_artifact(model, scaler, path)
+    return path, digest
+
+def test_artifact_scores_match_the_joblib_model(trained_model, artifact, monkeypatch):
+    model, scaler = trained_model
+    path, _ = artifact
+    X = generate_transactions(20000, 0.02, seed=13, with_meta=False, with_label=False)[scaler.feature_names_in_]
+    X_scaled = scaler.transform(X)
+
+    monkeypatch.setattr(settings, "USE_COMPILED_FOREST", False)
+    joblib_version = ModelRegistry().load(os.environ["MODEL_PATH"], os.environ["SCALER_PATH"])
+    artifact_version = ModelRegistry().load(path)
+    assert artifact_version.model is None and artifact_version.engine is not None
+    assert artifact_version.feature_names == joblib_version.feature_names
+
+    # CSV uploads are parsed to float32, JSON and Parquet rows arrive as float64
+    for rows in (X, X.astype(np.float32)):
+        scores, labels = artifact_version.score(rows.to_numpy())
+        np.testing.assert_allclose(scores, model.decision_function(scaler.transform(rows)), rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(labels, model.predict(scaler.transform(rows)))
+    np.testing.assert_allclose(artifact_version.score(X.to_numpy())[0], joblib_version.score(X)[0], rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(artifact_version.score(X.to_numpy())[1], model.predict(X_scaled))
+
+def test_artifact_rebuilds_the_scaler(trained_model, artifact):
+    _, scaler = trained_model
+    path, digest = artifact
+    forest, rebuilt, header = load_artifact(path)
+    assert isinstance(forest.mean, np.memmap) or isinstance(forest.mean.base, np.memmap)
+    assert header["digest"] == digest == read_artifact_header(path)["digest"]
+    assert list(rebuilt.feature_names_in_) == list(scaler.feature_names_in_)
+    X = generate_transactions(1000, seed=14, with_meta=False, with_label=False)[scaler.feature_names_in_]
+    np.testing.assert_array_equal(rebuilt.transform(X), scaler.transform(X))
+
+def test_one_sample_trees_score_like_sklearn():
+    X = heavy_tailed(np.random.default_rng(12), 300)
+    scaler = StandardScaler().fit(X)
+    model = IsolationForest(n_estimators=5, max_samples=1, random_state=0).fit(scaler.transform(X))
+    forest = CompiledForest.from_sklearn(model, scaler)
+    np.testing.assert_array_equal(forest.score_samples(X), model.score_samples(scaler.transform(X)))
+    np.testing.assert_array_equal(forest.score(X)[0], model.decision_function(scaler.transform(X)))
@@ -0,0 +1,99 @@
+import json
+import os
+import shutil
+import threading
+import time
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+from backend.core.config import settings
+from backend.core.metrics import counter
+from backend.services.model_registry import ModelRegistry, metadata_path, version_id
+
+@pytest.fixture
+def model_files(trained_model, tmp_path, monkeypatch):
+    model_path, scaler_path = str(tmp_path / "model.joblib"), str(tmp_path / "scaler.joblib")
+    shutil.copy(os.environ["MODEL_PATH"], model_path)
+    shutil.copy(os.environ["SCALER_PATH"], scaler_path)
+    monkeypatch.setattr(settings, "MODEL_PATH", model_path)
+    monkeypatch.setattr(settings, "SCALER_PATH", scaler_path)
+    return model_path, scaler_path
+
+def retrained(seed: int):
+    X = np.random.default_rng(seed).normal(size=(500, 30))
+    scaler = StandardScaler().fit(X)
+    return IsolationForest(n_estimators=10, random_state=seed).fit(scaler.transform(X)), scaler
+
+def write_metadata(model_path: str, version: str):
+    with open(metadata_path(model_path), "w") as f:
+        json.dump({"version": version, "trained_at": "2026-01-01T00:00:00"}, f)
+
+def test_watcher_waits_for_the_whole_set_of_files(model_files):
+    model_path, scaler_path = model_files
+    registry = ModelRegistry()
+    first = registry.reload()
+    write_metadata(model_path, first.version)
+    activated = []
+    registry.on_activate(lambda version: activated.append(version.version))
+    registry.start_watcher(interval=0.5)
+    try:
+        model, scaler = retrained(1)
+        # Written the way a slow training run would, with pauses longer than the poll
+        # interval: model, scaler, then the metadata naming the new version
+        joblib.dump(model, model_path)
+        time.sleep(1.2)
+        joblib.dump(scaler, scaler_path)
+        time.sleep(1.2)
+        assert activated == []
+        expected = version_id(model_path, scaler_path)
+        write_metadata(model_path, expected)
+
+        deadline = time.monotonic() + 5
+        while not activated and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        registry.stop()
+
+    assert activated == [expected]
+    assert expected != first.version
+    assert registry.active().metadata["version"] == expected
+
+def test_metadata_of_another_version_is_ignored(model_files):
+    model_path, scaler_path = model_files
+    write_metadata(model_path, "0123456789ab")
+    assert ModelRegistry().load(model_path, scaler_path).metadata == {}
+
+def test_shadow_backlog_is_bounded(model_files, monkeypatch):
+    monkeypatch.setattr(settings, "SHADOW_QUEUE_SIZE", 2)
+    registry = ModelRegistry()
+    registry.reload()
+    candidate = registry.load(*[str(p) for p in _write_candidate(model_files)])
+    registry.set_shadow(candidate.version)
+
+    release = threading.Event()
+    original = candidate.score
+    monkeypatch.setattr(candidate, "score", lambda X: (release.wait(5), original(X))[1])
+    dropped = counter("shadow_batches_dropped_total", "Batches not shadow-scored because the shadow queue was full")
+    before = dropped.value
+
+    X = np.zeros((4, 30))
+    for _ in range(6):
+        registry.submit_shadow(X, np.zeros(4), np.ones(4, dtype=int))
+    assert registry.shadow_queue_depth == 2
+    assert dropped.value == before + 4
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while registry.shadow_queue_depth and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert registry.shadow_queue_depth == 0
+    assert registry.shadow_stats()["rows"] == 8
+
+def _write_candidate(model_files):
+    directory = os.path.dirname(model_files[0])
+    paths = os.path.join(directory, "candidate.joblib"), os.path.join(directory, "candidate_scaler.joblib")
+    for obj, path in zip(retrained(2), paths):
+        joblib.dump(obj, path)
+    return paths
@@ -0,0 +1,104 @@
+import socket
+import time
+from email import message_from_bytes
+import pytest
+from aiosmtpd.controller import Controller
+from backend.core.config import settings
+from backend.services.audit_service import audit_logger
+from backend.services.notifier import NotificationDispatcher, SMTPConnectionPool
+
+class Inbox:
+    """aiosmtpd handler that keeps every accepted message."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(message_from_bytes(envelope.content))
+        return "250 Message accepted for delivery"
+
+def free_port() -> int:
+    """A local port nothing is listening on, so connections to it are refused."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_for(condition, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for delivery")
+        time.sleep(0.02)
+
+@pytest.fixture
+def smtp(monkeypatch):
+    inbox = Inbox()
+    controller = Controller(inbox, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    monkeypatch.setattr(settings, "SMTP_SERVER", "127.0.0.1")
+    monkeypatch.setattr(settings, "SMTP_PORT", controller.port)
+    monkeypatch.setattr(settings, "SMTP_USE_TLS", False)
+    monkeypatch.setattr(settings, "SMTP_USER", "")
+    monkeypatch.setattr(settings, "ADMIN_EMAIL", "admin@example.com")
+    monkeypatch.setattr(settings, "SMTP_TIMEOUT", 2.0)
+    monkeypatch.setattr(settings, "NOTIFY_DIGEST_WINDOW", 0.3)
+    monkeypatch.setattr(settings, "NOTIFY_RETRY_BACKOFF", 0.05)
+    yield inbox, controller.port
+    controller.stop()
+
+@pytest.fixture
+def dispatcher(database):
+    dispatcher = NotificationDispatcher(SMTPConnectionPool(1))
+    yield dispatcher
+    dispatcher.stop(timeout=5)
+
+def alert(transaction_id: int) -> list:
+    return [{"ID": transaction_id, "Name": f"c{transaction_id}", "Time": 1.0, "fraud_score": -0.2, "Amount": 10.0}]
+
+def test_alerts_within_the_window_arrive_as_one_digest(smtp, dispatcher):
+    inbox, _ = smtp
+    ids = [dispatcher.enqueue(alert(i)) for i in range(3)]
+    wait_for(lambda: all(dispatcher.status(i).status == "sent" for i in ids))
+
+    assert len(inbox.messages) == 1
+    message = inbox.messages[0]
+    assert message["To"] == "admin@example.com"
+    assert "(3 alerts)" in message["Subject"]
+    body = message.get_payload()[0].get_payload()
+    assert all(f"Transaction ID: {i}" in body for i in range(3))
+
+def test_delivery_goes_from_queued_to_sent(smtp, dispatcher):
+    delivery_id = dispatcher.enqueue(alert(1))
+    # Still inside the digest window
+    assert dispatcher.status(delivery_id).status == "queued"
+    wait_for(lambda: dispatcher.status(delivery_id).status == "sent")
+    delivery = dispatcher.status(delivery_id)
+    assert delivery.attempts == 1 and delivery.sent_at is not None and delivery.error is None
+
+def test_refused_sends_are_retried_until_the_server_answers(smtp, dispatcher, monkeypatch):
+    inbox, port = smtp
+    monkeypatch.setattr(settings, "NOTIFY_MAX_RETRIES", 5)
+    monkeypatch.setattr(settings, "SMTP_PORT", free_port())
+    delivery_id = dispatcher.enqueue(alert(7))
+    wait_for(lambda: dispatcher.status(delivery_id).status == "retrying")
+    assert dispatcher.status(delivery_id).error
+
+    monkeypatch.setattr(settings, "SMTP_PORT", port)
+    wait_for(lambda: dispatcher.status(delivery_id).status == "sent")
+    assert dispatcher.status(delivery_id).attempts >= 2
+    assert len(inbox.messages) == 1
+
+def test_failure_is_reported_without_a_final_backoff(smtp, dispatcher, monkeypatch):
+    monkeypatch.setattr(settings, "SMTP_PORT", free_port())
+    monkeypatch.setattr(settings, "NOTIFY_MAX_RETRIES", 1)
+    # The only wait is the one between the two attempts
+    monkeypatch.setattr(settings, "NOTIFY_RETRY_BACKOFF", 1.0)
+    started = time.monotonic()
+    delivery_id = dispatcher.enqueue(alert(9))
+    wait_for(lambda: dispatcher.status(delivery_id).status == "failed")
+    # Digest window + one backoff; waiting after the last attempt would add another 2s
+    assert time.monotonic() - started < 2.5
+    assert dispatcher.status(delivery_id).attempts == 2
+
+    entries = audit_logger.query(action="notification_failed", limit=1)
+    assert entries and entries[0].status == "error" and entries[0].user == "system"
@@ -0,0 +1,36 @@
+import os
+import numpy as np
+import pytest
+from benchmarks.synthetic import generate_transactions
+from backend.services.model_registry import ModelRegistry
+from backend.services.parallel_scoring import ParallelScorer
+
+def near_thresholds(model, scaler, n_rows: int, seed: int) -> np.ndarray:
+    """Synthetic rows with one feature each moved onto a split threshold (in raw units), give or take a few ulps."""
+    rng = np.random.default_rng(seed)
+    X = generate_transactions(n_rows, 0.02, seed=seed, with_meta=False, with_label=False)[scaler.feature_names_in_].to_numpy(copy=True)
+    splits = [(tree_features[e.tree_.feature[node]], e.tree_.threshold[node])
+              for e, tree_features in zip(model.estimators_, model.estimators_features_)
+              for node in np.flatnonzero(e.tree_.children_left != -1)]
+    chosen = rng.integers(0, len(splits), n_rows)
+    features = np.array([splits[i][0] for i in chosen])
+    raw = np.array([splits[i][1] for i in chosen]) * scaler.scale_[features] + scaler.mean_[features]
+    X[np.arange(n_rows), features] = raw + np.spacing(raw) * rng.integers(-3, 4, n_rows)
+    return X
+
+@pytest.fixture(scope="module")
+def scorer():
+    scorer = ParallelScorer(workers=2, min_shard_rows=1000)
+    yield scorer
+    scorer.shutdown()
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_pool_scores_match_in_process_scores(trained_model, scorer, dtype):
+    model, scaler = trained_model
+    version = ModelRegistry().load(os.environ["MODEL_PATH"], os.environ["SCALER_PATH"])
+    X = near_thresholds(model, scaler, 8320, seed=4).astype(dtype)
+
+    scores, labels = scorer.score(X, version.model_path, version.scaler_path, version.version)
+    expected_scores, expected_labels = version.score(X)
+    np.testing.assert_array_equal(scores, expected_scores)
+    np.testing.assert_array_equal(labels, expected_labels)
@@ -0,0 +1,45 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+from sqlalchemy import select
+from benchmarks.synthetic import generate_transactions
+from backend.db.session import SessionLocal
+from backend.models.scan import ScanResult
+from backend.services.model_registry import model_registry
+from backend.services.model_service import predict
+from backend.services.result_store import ResultStore
+
+@pytest.fixture
+def reloaded_without_time(database, tmp_path):
+    """Activate a model that does not use Time as a feature; the original is active again afterwards."""
+    pinned = model_registry.active()
+    X = generate_transactions(2000, 0.01, seed=31, with_meta=False, with_label=False).drop(columns=["Time"])
+    scaler = StandardScaler().fit(X)
+    model = IsolationForest(n_estimators=10, random_state=0).fit(scaler.transform(X))
+    paths = str(tmp_path / "model.joblib"), str(tmp_path / "scaler.joblib")
+    joblib.dump(model, paths[0])
+    joblib.dump(scaler, paths[1])
+    model_registry.activate(model_registry.load(*paths).version)
+    yield pinned
+    model_registry.activate(pinned.version)
+
+def test_chunks_after_a_reload_are_split_for_the_scan_model(reloaded_without_time):
+    pinned = reloaded_without_time
+    assert "Time" in pinned.feature_names
+    store = ResultStore()
+    scan_id = store.create_scan("owner@example.com", pinned.version)
+    df = generate_transactions(300, 0.02, seed=32, with_label=False)
+    for start in (0, 150):
+        # Scored by the pinned model, stored while another model is active
+        store.add_results(scan_id, predict(df.iloc[start:start + 150].copy(), pinned))
+
+    scan = store.get_scan(scan_id)
+    assert scan.feature_names == pinned.feature_names
+    with SessionLocal() as db:
+        rows = db.execute(select(ScanResult).where(ScanResult.scan_id == scan_id).order_by(ScanResult.row_index)).scalars().all()
+    assert len(rows) == 300
+    for row in rows:
+        assert len(np.frombuffer(row.features)) == len(pinned.feature_names)
+        assert "Time" not in row.meta
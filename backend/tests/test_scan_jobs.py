@@ -0,0 +1,109 @@
+import io
+import threading
+import time
+import pytest
+from sqlalchemy import func, select
+from benchmarks.synthetic import generate_transactions
+from backend.core.config import settings
+from backend.db.session import SessionLocal
+from backend.models.scan import ScanResult
+from backend.services.scan_jobs import JobQueueFull, ScanJobRunner
+
+CHUNK_SIZE = 500
+
+@pytest.fixture
+def upload(database, monkeypatch):
+    monkeypatch.setattr(settings, "CSV_CHUNK_SIZE", CHUNK_SIZE)
+    df = generate_transactions(4200, 0.02, seed=21, with_label=False)
+    return io.BytesIO(df.to_csv(index=False).encode()), len(df)
+
+@pytest.fixture
+def runners():
+    started = []
+
+    def start(workers: int = 1) -> ScanJobRunner:
+        runner = ScanJobRunner(workers)
+        runner.start()
+        started.append(runner)
+        return runner
+
+    yield start
+    for runner in started:
+        runner.stop()
+
+def wait_for(condition, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for the scan job")
+        time.sleep(0.02)
+
+def stored_rows(scan_id: int):
+    with SessionLocal() as db:
+        return db.execute(
+            select(func.count(), func.count(func.distinct(ScanResult.row_index)),
+                   func.min(ScanResult.row_index), func.max(ScanResult.row_index))
+            .where(ScanResult.scan_id == scan_id)
+        ).one()
+
+def test_job_stopped_mid_scan_resumes_after_its_last_chunk(upload, runners):
+    source, n_rows = upload
+    runner = runners()
+    stored = runner.result_store.add_results
+    chunks = []
+
+    def add_results(*args, **kwargs):
+        stored(*args, **kwargs)
+        chunks.append(len(args[1]))
+        if len(chunks) == 3:
+            # What stop() does, without joining the worker from inside it
+            runner._stop.set()
+
+    runner.result_store.add_results = add_results
+    job = runner.submit(source, "upload.csv", "csv", "owner@example.com")
+    wait_for(lambda: len(chunks) == 3)
+    runner.stop()
+
+    paused = runner.get(job.id)
+    assert paused.status == "running"
+    assert paused.rows_processed == paused.chunks_completed * CHUNK_SIZE == 3 * CHUNK_SIZE
+    assert stored_rows(paused.scan_id)[0] == 3 * CHUNK_SIZE
+
+    restarted = runners()
+    wait_for(lambda: restarted.get(job.id).status == "completed")
+    finished = restarted.get(job.id)
+    assert finished.scan_id == paused.scan_id
+    assert finished.rows_processed == n_rows
+    assert finished.chunks_completed == -(-n_rows // CHUNK_SIZE)
+    assert tuple(stored_rows(finished.scan_id)) == (n_rows, n_rows, 0, n_rows - 1)
+    assert restarted.result_store.get_scan(finished.scan_id).total_transactions == n_rows
+
+def test_concurrent_submits_never_exceed_the_queue_limit(upload, runners, monkeypatch):
+    source, _ = upload
+    monkeypatch.setattr(settings, "JOB_MAX_QUEUED", 3)
+    runner = runners()
+    busy, release = threading.Event(), threading.Event()
+    monkeypatch.setattr(runner, "_process", lambda job_id: (busy.set(), release.wait(10)))
+
+    # Occupy the only worker so every later job has to wait in the queue
+    runner.submit(io.BytesIO(source.getvalue()), "first.csv", "csv", "owner@example.com")
+    assert busy.wait(5)
+
+    accepted, rejected = [], []
+    barrier = threading.Barrier(10)
+
+    def submit(i: int):
+        barrier.wait()
+        try:
+            accepted.append(runner.submit(io.BytesIO(source.getvalue()), f"{i}.csv", "csv", "owner@example.com"))
+        except JobQueueFull:
+            rejected.append(i)
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    release.set()
+
+    assert len(accepted) == 3 and len(rejected) == 7
@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from sqlalchemy import select
+from benchmarks.synthetic import generate_transactions
+from backend.db.session import AsyncSessionLocal, SessionLocal
+from backend.models.scan import Scan, ScanResult
+from backend.services.model_service import predict
+from backend.services.result_store import ResultStore
+from backend.services.score_index import ScoreIndex
+
+@pytest.fixture(scope="module")
+def scanned(database):
+    """A completed scan stored in three chunks; returns (store, scan)."""
+    store = ResultStore()
+    scan_id = store.create_scan("owner@example.com")
+    df = generate_transactions(6000, 0.02, seed=11, with_label=False)
+    # Repeat some rows so the index has to break score ties by id
+    df.iloc[3000:3100] = df.iloc[:100].to_numpy()
+    for start in range(0, len(df), 2000):
+        store.add_results(scan_id, predict(df.iloc[start:start + 2000].copy()).sort_index())
+    flagged = int((predict(df.copy())["flagged"]).sum())
+    store.finish_scan(scan_id, len(df), flagged)
+    return store, store.get_scan(scan_id)
+
+def sorted_flagged(scan: Scan, max_score: float = 0.0):
+    """The reference order: a sorted query over the scan's rows."""
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(ScanResult.id, ScanResult.fraud_score)
+            .where(ScanResult.scan_id == scan.id, ScanResult.fraud_score < max_score)
+            .order_by(ScanResult.fraud_score, ScanResult.id)
+        ).all()
+    return [(score, row_id) for row_id, score in rows]
+
+def page_through(store: ResultStore, scan: Scan, limit: int, **kwargs):
+    seen, cursor = [], None
+    while True:
+        after = {"after_score": cursor[0], "after_id": cursor[1]} if cursor else {}
+        records, cursor = store.get_flagged(scan, limit, **after, **kwargs)
+        assert len(records) <= limit
+        seen.extend(record["fraud_score"] for record in records)
+        if len(records) < limit:
+            return seen
+
+def test_index_matches_sorted_query(scanned):
+    store, scan = scanned
+    index = store.score_index(scan)
+    expected = sorted_flagged(scan)
+    n = index.count_below(0.0)
+    assert n == len(expected) == scan.flagged_count
+    assert list(zip(index.scores[:n].tolist(), index.ids[:n].tolist())) == expected
+
+def test_cursor_pages_cover_every_flagged_row_once(scanned):
+    store, scan = scanned
+    expected = [score for score, _ in sorted_flagged(scan)]
+    for limit in (1, 7, 50, len(expected) + 1):
+        assert page_through(store, scan, limit) == expected
+
+def test_cursor_resumes_inside_score_ties(scanned):
+    store, scan = scanned
+    expected = sorted_flagged(scan)
+    ties = [i for i in range(1, len(expected)) if expected[i][0] == expected[i - 1][0]]
+    assert ties, "fixture should contain duplicate scores"
+    score, row_id = expected[ties[0] - 1]
+    _, cursor = store.get_flagged(scan, 1, after_score=score, after_id=row_id)
+    assert cursor == expected[ties[0]]
+
+def test_max_score_bound(scanned):
+    store, scan = scanned
+    records, _ = store.get_flagged(scan, max_score=-0.05)
+    assert [record["fraud_score"] for record in records] == [score for score, _ in sorted_flagged(scan, -0.05)]
+
+def test_async_pages_match_sync(scanned):
+    store, scan = scanned
+
+    async def first_page():
+        async with AsyncSessionLocal() as db:
+            return await store.get_flagged_async(db, scan, 25)
+
+    assert asyncio.run(first_page()) == store.get_flagged(scan, 25)
+
+def test_stale_files_of_a_reused_scan_id_are_ignored(scanned):
+    store, scan = scanned
+    # Same id, created later: what a recreated database hands out
+    reused = Scan(id=scan.id, user_email="other@example.com", total_transactions=scan.total_transactions,
+                  created_at=scan.created_at + timedelta(days=1))
+    assert ScoreIndex.load(scan) is not None
+    assert ScoreIndex.load(reused) is None
+
+def test_index_with_wrong_row_count_is_rebuilt(scanned):
+    store, scan = scanned
+    ScoreIndex.write(scan, np.array([-1.0]), np.array([1]))
+    assert ScoreIndex.load(scan) is None
+    assert len(store.score_index(scan)) == scan.total_transactions
+
+def test_rows_of_other_scans_are_never_returned(scanned):
+    store, scan = scanned
+    other = Scan(id=scan.id + 1000, user_email="other@example.com", total_transactions=1,
+                 created_at=datetime.utcnow())
+    # An index naming another scan's row ids must not leak those rows
+    ids = sorted_flagged(scan)[:1]
+    ScoreIndex.write(other, np.array([ids[0][0]]), np.array([ids[0][1]]))
+    records, cursor = store.get_flagged(other, 10)
+    assert records == [] and cursor is None
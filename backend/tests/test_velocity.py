@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from backend.services.velocity import VelocityEngine
+
+WINDOWS = [60, 600, 3600]
+BUCKETS = 6
+
+def events(n_events: int = 3000, seed: int = 0):
+    """A time-ordered stream over 40 customers, with bursts and repeated timestamps."""
+    rng = np.random.default_rng(seed)
+    times = np.cumsum(rng.exponential(6.0, n_events)).round()
+    keys = np.array([f"c{k}" for k in rng.zipf(1.5, n_events) % 40])
+    amounts = rng.lognormal(3, 1.5, n_events).round(2)
+    return keys, times, amounts
+
+def reference(keys: np.ndarray, times: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+    """Per-event features straight from the definition: O(n^2) over each customer's history."""
+    features = np.empty((len(keys), 3 * len(WINDOWS) + 1))
+    for i in range(len(keys)):
+        history = np.flatnonzero(keys[:i + 1] == keys[i])
+        for w, window in enumerate(WINDOWS):
+            width = window / BUCKETS
+            epoch = np.floor(times[i] / width)
+            # Every sub-bucket of the window ending at this event's sub-bucket
+            inside = history[np.floor(times[history] / width) > epoch - BUCKETS]
+            features[i, 3 * w:3 * w + 3] = len(inside), amounts[inside].sum(), amounts[inside].max()
+        gap = times[i] - times[history[-2]] if len(history) > 1 else WINDOWS[-1]
+        features[i, -1] = min(max(gap, 0), WINDOWS[-1])
+    return features
+
+@pytest.fixture(scope="module")
+def stream():
+    keys, times, amounts = events()
+    return keys, times, amounts, reference(keys, times, amounts)
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 250, 3000])
+def test_matches_per_event_reference_at_any_chunk_size(stream, chunk_size):
+    keys, times, amounts, expected = stream
+    # A small capacity makes the engine grow its arrays mid-stream
+    engine = VelocityEngine(WINDOWS, BUCKETS, capacity=4)
+    features = np.vstack([
+        engine.update(keys[start:start + chunk_size], times[start:start + chunk_size], amounts[start:start + chunk_size])
+        for start in range(0, len(keys), chunk_size)
+    ])
+    np.testing.assert_allclose(features, expected, rtol=1e-9, atol=1e-9)
+
+def test_snapshot_continues_the_stream(stream, tmp_path):
+    keys, times, amounts, expected = stream
+    half = len(keys) // 2
+    engine = VelocityEngine(WINDOWS, BUCKETS)
+    engine.update(keys[:half], times[:half], amounts[:half])
+    engine.save(str(tmp_path / "velocity.npz"))
+
+    restored = VelocityEngine(WINDOWS, BUCKETS)
+    assert restored.load(str(tmp_path / "velocity.npz"))
+    np.testing.assert_allclose(restored.update(keys[half:], times[half:], amounts[half:]), expected[half:],
+                               rtol=1e-9, atol=1e-9)
@@ -0,0 +1,222 @@
+"""
+Compare the old and new database paths under concurrent reads and writes.
+
+old: plain create_engine (default rollback journal, no pragmas), reader
+     threads on sync sessions, the writer inserting scan rows through the ORM.
+new: the tuned engines from backend.db.session (WAL, busy timeout, statement
+     caches), readers as asyncio tasks on aiosqlite sessions, the writer
+     using bulk_insert.
+
+Readers repeat what an authenticated /flagged request does (principal lookup
+plus one page of a scan's flagged rows) while one writer stores batches of
+scored rows. Each path runs on its own temporary database file.
+
+Usage (from the project root):
+    python -m benchmarks.bench_db_concurrency --readers 8 --seconds 10 --batch 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from backend.db.base import Base
+from backend.db.bulk import bulk_insert
+from backend.db.session import create_tuned_async_engine, create_tuned_engine
+from backend.models import audit, job, scan, stats, user  # noqa: F401 (register tables)
+from backend.models.scan import Scan, ScanResult
+from backend.models.user import User
+from backend.services.result_store import RESULT_COLUMNS
+
+N_FEATURES = 30
+PAGE_SIZE = 100
+
+class Recorder:
+    """Latencies and lock errors of one kind of operation, shared between threads."""
+
+    def __init__(self):
+        self.latencies = []
+        self.lock_errors = 0
+        self.rows = 0
+        self._lock = threading.Lock()
+
+    def timed(self, fn):
+        start = time.perf_counter()
+        try:
+            rows = fn()
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            with self._lock:
+                self.lock_errors += 1
+            return
+        with self._lock:
+            self.latencies.append(time.perf_counter() - start)
+            self.rows += rows or 0
+
+    async def timed_async(self, coro_fn):
+        start = time.perf_counter()
+        try:
+            await coro_fn()
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            self.lock_errors += 1
+            return
+        self.latencies.append(time.perf_counter() - start)
+
+    def report(self, label: str, seconds: float) -> str:
+        if not self.latencies:
+            return f"{label}: no successful operations, lock errors={self.lock_errors}"
+        p50, p95 = np.percentile(np.array(self.latencies) * 1000, [50, 95])
+        line = f"{label}: {len(self.latencies) / seconds:9.1f} ops/s  p50={p50:7.2f}ms  p95={p95:7.2f}ms  lock errors={self.lock_errors}"
+        if self.rows:
+            line += f"  rows/s={self.rows / seconds:,.0f}"
+        return line
+
+def make_batch(rng, scan_id: int, start: int, n: int):
+    """One batch of scored rows as (scores, flagged, meta dicts, feature blobs)."""
+    scores = rng.normal(0.1, 0.08, n)
+    features = rng.standard_normal((n, N_FEATURES))
+    meta = [{"ID": start + i, "Name": f"customer_{(start + i) % 997}"} for i in range(n)]
+    return scan_id, list(range(start, start + n)), scores.tolist(), (scores < 0).tolist(), meta, [row.tobytes() for row in features]
+
+def orm_rows(batch):
+    scan_id, row_index, scores, flagged, meta, features = batch
+    return [
+        {"scan_id": scan_id, "row_index": i, "fraud_score": s, "flagged": f, "meta": m, "features": b}
+        for i, s, f, m, b in zip(row_index, scores, flagged, meta, features)
+    ]
+
+def tuple_rows(batch):
+    scan_id, row_index, scores, flagged, meta, features = batch
+    return [
+        (scan_id, i, s, int(f), json.dumps(m), b)
+        for i, s, f, m, b in zip(row_index, scores, flagged, meta, features)
+    ]
+
+def seed(engine, seed_rows: int):
+    """Create the schema, one user and one scan holding seed_rows results; returns (user_id, scan_id)."""
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add(User(email="bench@example.com", password_hash="x"))
+        db.add(Scan(user_email="bench@example.com", status="completed"))
+        db.commit()
+        user_id = db.execute(select(User.id)).scalar_one()
+        scan_id = db.execute(select(Scan.id)).scalar_one()
+        batch = make_batch(np.random.default_rng(0), scan_id, 0, seed_rows)
+        bulk_insert(db, ScanResult.__table__, RESULT_COLUMNS, tuple_rows(batch))
+        db.commit()
+    return user_id, scan_id
+
+def flagged_page(scan_id: int):
+    return (
+        select(ScanResult)
+        .where(ScanResult.scan_id == scan_id, ScanResult.flagged.is_(True))
+        .order_by(ScanResult.fraud_score, ScanResult.id)
+        .limit(PAGE_SIZE)
+    )
+
+def run_writer(Session, write, scan_id: int, start: int, batch_size: int, stop: threading.Event, recorder: Recorder):
+    rng = np.random.default_rng(1)
+    while not stop.is_set():
+        batch = make_batch(rng, scan_id, start, batch_size)
+        start += batch_size
+
+        def store():
+            with Session() as db:
+                write(db, batch)
+                db.commit()
+            return batch_size
+
+        recorder.timed(store)
+
+def old_path(path: str, args) -> tuple:
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    user_id, scan_id = seed(engine, args.seed_rows)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    reads, writes = Recorder(), Recorder()
+    stop = threading.Event()
+
+    def read():
+        with Session() as db:
+            db.get(User, user_id)
+            db.execute(flagged_page(scan_id)).scalars().all()
+
+    def reader():
+        while not stop.is_set():
+            reads.timed(read)
+
+    def orm_write(db, batch):
+        db.execute(insert(ScanResult), orm_rows(batch))
+
+    with ThreadPoolExecutor(max_workers=args.readers + 1) as pool:
+        pool.submit(run_writer, Session, orm_write, scan_id, args.seed_rows, args.batch, stop, writes)
+        for _ in range(args.readers):
+            pool.submit(reader)
+        time.sleep(args.seconds)
+        stop.set()
+    engine.dispose()
+    return reads, writes
+
+async def new_path_async(path: str, args) -> tuple:
+    engine = create_tuned_engine(path)
+    async_engine = create_tuned_async_engine(path)
+    user_id, scan_id = seed(engine, args.seed_rows)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+    reads, writes = Recorder(), Recorder()
+    stop = threading.Event()
+
+    async def read():
+        async with AsyncSession() as db:
+            await db.get(User, user_id)
+            (await db.execute(flagged_page(scan_id))).scalars().all()
+
+    async def reader():
+        while not stop.is_set():
+            await reads.timed_async(read)
+
+    def bulk_write(db, batch):
+        bulk_insert(db, ScanResult.__table__, RESULT_COLUMNS, tuple_rows(batch))
+
+    writer = threading.Thread(
+        target=run_writer, args=(Session, bulk_write, scan_id, args.seed_rows, args.batch, stop, writes),
+    )
+    writer.start()
+    tasks = [asyncio.create_task(reader()) for _ in range(args.readers)]
+    await asyncio.sleep(args.seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    writer.join()
+    await async_engine.dispose()
+    engine.dispose()
+    return reads, writes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--batch", type=int, default=5000, help="Rows per writer transaction")
+    parser.add_argument("--seed-rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"readers={args.readers} writer batch={args.batch} rows, {args.seconds:.0f}s per path")
+        reads, writes = old_path(os.path.join(tmp, "old.db"), args)
+        print(reads.report("old reads ", args.seconds))
+        print(writes.report("old writes", args.seconds))
+        reads, writes = asyncio.run(new_path_async(os.path.join(tmp, "new.db"), args))
+        print(reads.report("new reads ", args.seconds))
+        print(writes.report("new writes", args.seconds))
+
+if __name__ == "__main__":
+    main()
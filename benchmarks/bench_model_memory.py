@@ -0,0 +1,112 @@
+"""
+Per-worker memory of the pickled model against the memory-mapped forest artifact.
+
+For each path, --workers processes are spawned the way uvicorn --workers starts
+them, each loading the model on its own:
+
+joblib:   joblib.load of model.joblib and scaler.joblib, compiled into a
+          CompiledForest (what every worker did before artifacts)
+artifact: load_artifact of a .forest file exported from the same pair
+
+After loading, each worker reads every forest array once (the worst case for
+the mapped path, where untouched pages are never read in) and scores a batch.
+Memory is taken from /proc/self/smaps_rollup while all workers are still
+alive: RSS counts shared page-cache pages in every worker, USS only private
+pages, and PSS splits shared pages between the processes mapping them.
+Linux only.
+
+Usage (from the project root):
+    python -m benchmarks.bench_model_memory --workers 4
+"""
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import time
+import numpy as np
+from backend.core.config import settings
+
+def memory_mb() -> dict:
+    """RSS, PSS and USS of this process in MB."""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+def worker(mode: str, model_path: str, scaler_path: str, artifact_path: str, loaded, done, results):
+    import joblib
+    from backend.services.forest_engine import CompiledForest, load_artifact
+
+    before = memory_mb()
+    start = time.perf_counter()
+    if mode == "joblib":
+        model = joblib.load(model_path)
+        scaler = joblib.load(scaler_path)
+        forest = CompiledForest.from_sklearn(model, scaler)
+    else:
+        forest, scaler, _ = load_artifact(artifact_path)
+    load_seconds = time.perf_counter() - start
+
+    for name in ("feature", "threshold", "children", "path_length", "node_samples"):
+        np.asarray(getattr(forest, name)).sum()
+    X = np.random.default_rng(os.getpid()).normal(scaler.mean_, scaler.scale_, size=(2000, forest.n_features))
+    forest.score(X)
+
+    # Measure only once every worker holds the model, so PSS reflects the sharing
+    loaded.wait()
+    after = memory_mb()
+    results.put({"mode": mode, "pid": os.getpid(), "load_seconds": load_seconds, "before": before, "after": after})
+    done.wait()
+
+def run(mode: str, args, artifact_path: str) -> list:
+    ctx = mp.get_context("spawn")
+    loaded, done = ctx.Barrier(args.workers + 1), ctx.Barrier(args.workers + 1)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=worker, args=(mode, args.model, args.scaler, artifact_path, loaded, done, results))
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    loaded.wait()
+    reports = [results.get() for _ in processes]
+    done.wait()
+    for process in processes:
+        process.join()
+    return sorted(reports, key=lambda report: report["pid"])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--model", default=settings.MODEL_PATH)
+    parser.add_argument("--scaler", default=settings.SCALER_PATH)
+    args = parser.parse_args()
+
+    import joblib
+    from backend.services.forest_engine import export_artifact
+
+    with tempfile.TemporaryDirectory() as tmp:
+        artifact_path = os.path.join(tmp, "model.forest")
+        export_artifact(joblib.load(args.model), joblib.load(args.scaler), artifact_path)
+        print(f"{args.model}: {os.path.getsize(args.model) / 1e6:.1f} MB, "
+              f"artifact: {os.path.getsize(artifact_path) / 1e6:.1f} MB, {args.workers} workers")
+        print(f"{'path':>8} {'pid':>7} {'load ms':>8} {'RSS +MB':>8} {'USS +MB':>8} {'PSS +MB':>8}")
+        for mode in ("joblib", "artifact"):
+            reports = run(mode, args, artifact_path)
+            totals = np.zeros(3)
+            for report in reports:
+                delta = np.array([report["after"][key] - report["before"][key] for key in ("rss", "uss", "pss")])
+                totals += delta
+                print(f"{mode:>8} {report['pid']:>7} {report['load_seconds'] * 1000:>8.1f} "
+                      f"{delta[0]:>8.1f} {delta[1]:>8.1f} {delta[2]:>8.1f}")
+            print(f"{mode:>8} {'total':>7} {'':>8} {totals[0]:>8.1f} {totals[1]:>8.1f} {totals[2]:>8.1f}")
+
+if __name__ == "__main__":
+    main()
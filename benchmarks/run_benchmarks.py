@@ -0,0 +1,226 @@
+"""
+Benchmark suite for the scoring and training pipeline.
+
+Each (stage, size) pair runs in its own subprocess so peak RSS is measured per
+stage. Stages:
+    predict     model_service.predict on a transactions DataFrame
+    transform   scaler.transform on the feature columns
+    csv_parse   model_service.read_csv_chunks over a CSV on disk
+    train       train_isolation_forest on scaled features
+
+Usage (from the project root):
+    python -m benchmarks.run_benchmarks run --out bench.json
+    python -m benchmarks.run_benchmarks run --sizes 10000 100000 --stages predict transform --compare bench.json
+    python -m benchmarks.run_benchmarks compare baseline.json bench.json --threshold 0.15
+
+Unless --model/--scaler are given, a reference model is trained on synthetic
+data first, so runs on different checkouts score with the same model. compare
+(and run --compare) exit with status 1 when a stage got slower or used more
+memory than the baseline by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import joblib
+import numpy as np
+import sklearn
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ["predict", "transform", "csv_parse", "train"]
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+# Metrics where a larger value is a regression
+COMPARED_METRICS = ["seconds", "peak_rss_mb"]
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+# Stage worker (runs in the subprocess)
+
+def run_stage(stage: str, rows: int, repeat: int, fraud_rate: float, n_estimators: int) -> dict:
+    from benchmarks.synthetic import generate_transactions, write_csv
+
+    if stage == "predict":
+        from backend.services.model_service import get_model_version, predict
+        get_model_version()
+        df = generate_transactions(rows, fraud_rate, with_label=False)
+        fn = lambda: predict(df)
+    elif stage == "transform":
+        scaler = joblib.load(os.environ["MODEL_SCALER"])
+        X = generate_transactions(rows, fraud_rate, with_label=False)[list(scaler.feature_names_in_)]
+        fn = lambda: scaler.transform(X)
+    elif stage == "csv_parse":
+        from backend.services.model_service import get_model_version, read_csv_chunks
+        get_model_version()
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-"), "transactions.csv")
+        write_csv(path, rows, fraud_rate, with_label=False)
+        fn = lambda: sum(len(chunk) for chunk in read_csv_chunks(path))
+    elif stage == "train":
+        from ml_model.train_model import preprocess, train_isolation_forest
+        X_scaled, y, _ = preprocess(generate_transactions(rows, fraud_rate, with_meta=False))
+        repeat = 1
+        fn = lambda: train_isolation_forest(X_scaled, y, n_estimators=n_estimators)
+    else:
+        raise ValueError(f"Unknown stage {stage}")
+
+    setup_rss = peak_rss_mb()
+    seconds = best_of(fn, repeat)
+    return {
+        "stage": stage,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds else None,
+        "setup_rss_mb": setup_rss,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+# Orchestration
+
+def train_reference_model(directory: str, fraud_rate: float):
+    from benchmarks.synthetic import generate_transactions
+    from ml_model.train_model import preprocess, train_isolation_forest
+
+    X_scaled, y, scaler = preprocess(generate_transactions(20_000, fraud_rate, seed=1234, with_meta=False))
+    model = train_isolation_forest(X_scaled, y)
+    model_path = os.path.join(directory, "model.joblib")
+    scaler_path = os.path.join(directory, "scaler.joblib")
+    joblib.dump(model, model_path)
+    joblib.dump(scaler, scaler_path)
+    return model_path, scaler_path
+
+def run_suite(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    if args.model and args.scaler:
+        model_path, scaler_path = os.path.abspath(args.model), os.path.abspath(args.scaler)
+    else:
+        print("Training reference model...")
+        model_path, scaler_path = train_reference_model(workdir, args.fraud_rate)
+
+    env = dict(os.environ, MODEL_PATH=model_path, SCALER_PATH=scaler_path, MODEL_SCALER=scaler_path,
+               MODEL_WATCH_INTERVAL="0", DB_FILE=os.path.join(workdir, "bench.db"))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+
+    results = []
+    for stage in args.stages:
+        for rows in args.sizes:
+            command = [
+                sys.executable, "-m", "benchmarks.run_benchmarks", "_stage", stage, str(rows),
+                "--repeat", str(args.repeat), "--fraud-rate", str(args.fraud_rate),
+                "--n-estimators", str(args.n_estimators),
+            ]
+            proc = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(f"{stage} @ {rows} rows failed:\n{proc.stderr}")
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{stage:>10} {rows:>9} rows  {result['seconds']:8.3f}s  "
+                  f"{result['rows_per_sec']:>12,.0f} rows/s  peak {result['peak_rss_mb']:8.1f} MB")
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "sklearn": sklearn.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "model": args.model or "reference",
+        },
+        "results": results,
+    }
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """Print a comparison table and return the regressions (stage, rows, metric, old, new)."""
+    base = {(r["stage"], r["rows"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"{'stage':>10} {'rows':>9} {'metric':>12} {'baseline':>10} {'current':>10} {'change':>8}")
+    for result in current["results"]:
+        old = base.get((result["stage"], result["rows"]))
+        if old is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if not old.get(metric) or result.get(metric) is None:
+                continue
+            change = result[metric] / old[metric] - 1
+            flag = "  REGRESSION" if change > threshold else ""
+            print(f"{result['stage']:>10} {result['rows']:>9} {metric:>12} {old[metric]:>10.3f} "
+                  f"{result[metric]:>10.3f} {change:>+7.1%}{flag}")
+            if flag:
+                regressions.append((result["stage"], result["rows"], metric, old[metric], result[metric]))
+    return regressions
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the suite and write results as JSON")
+    run.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    run.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    run.add_argument("--repeat", type=int, default=3, help="Best-of repeats (train always runs once)")
+    run.add_argument("--fraud-rate", type=float, default=0.0017)
+    run.add_argument("--n-estimators", type=int, default=100, help="Trees built by the train stage")
+    run.add_argument("--model", help="Score with this model instead of a synthetic reference model")
+    run.add_argument("--scaler")
+    run.add_argument("--out", default="benchmark_results.json")
+    run.add_argument("--compare", help="Baseline JSON to compare against")
+    run.add_argument("--threshold", type=float, default=0.15, help="Allowed relative regression")
+
+    cmp = commands.add_parser("compare", help="Compare two result files")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.15)
+
+    stage = commands.add_parser("_stage", help=argparse.SUPPRESS)
+    stage.add_argument("stage", choices=STAGES)
+    stage.add_argument("rows", type=int)
+    stage.add_argument("--repeat", type=int, default=3)
+    stage.add_argument("--fraud-rate", type=float, default=0.0017)
+    stage.add_argument("--n-estimators", type=int, default=100)
+
+    args = parser.parse_args()
+
+    if args.command == "_stage":
+        print(json.dumps(run_stage(args.stage, args.rows, args.repeat, args.fraud_rate, args.n_estimators)))
+        return
+
+    if args.command == "compare":
+        baseline, current = load(args.baseline), load(args.current)
+    else:
+        current = run_suite(args)
+        with open(args.out, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Results written to {args.out}")
+        if not args.compare:
+            return
+        baseline = load(args.compare)
+
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
+    print("No regressions")
+
+if __name__ == "__main__":
+    main()
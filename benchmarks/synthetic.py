@@ -0,0 +1,71 @@
+"""
+Synthetic transactions in the creditcard.csv / sample_transaction.csv schema:
+ID, Name, Time, V1..V28, Amount and, optionally, the Class label.
+
+Usage (from the project root):
+    python -m benchmarks.synthetic --rows 100000 --fraud-rate 0.002 --out transactions.csv
+"""
+import argparse
+import numpy as np
+import pandas as pd
+
+FEATURES = ["Time"] + [f"V{i}" for i in range(1, 29)] + ["Amount"]
+
+# Components that separate fraud in the real dataset, with the shift applied to fraud rows
+FRAUD_SHIFTS = {"V4": 4.0, "V10": -5.0, "V12": -6.0, "V14": -7.0, "V17": -6.0}
+
+def generate_transactions(
+    n_rows: int,
+    fraud_rate: float = 0.0017,
+    seed: int = 0,
+    with_meta: bool = True,
+    with_label: bool = True,
+    start_id: int = 0,
+) -> pd.DataFrame:
+    """Return n_rows transactions; fraud rows are shifted along FRAUD_SHIFTS and spend more."""
+    rng = np.random.default_rng(seed)
+    fraud = rng.random(n_rows) < fraud_rate
+
+    V = rng.standard_normal((n_rows, 28), dtype=np.float64)
+    for name, shift in FRAUD_SHIFTS.items():
+        V[fraud, int(name[1:]) - 1] += shift
+
+    data = {"Time": np.sort(rng.uniform(0, 172800, n_rows)).round()}
+    for i in range(28):
+        data[f"V{i + 1}"] = V[:, i]
+    amount = rng.lognormal(3.0, 1.2, n_rows)
+    amount[fraud] *= 3
+    data["Amount"] = amount.round(2)
+
+    df = pd.DataFrame(data, columns=FEATURES)
+    if with_meta:
+        ids = np.arange(start_id, start_id + n_rows)
+        df.insert(0, "Name", [f"customer_{i}" for i in rng.integers(0, max(n_rows // 20, 1), n_rows)])
+        df.insert(0, "ID", ids)
+    if with_label:
+        df["Class"] = fraud.astype(np.int64)
+    return df
+
+def write_csv(path: str, n_rows: int, fraud_rate: float = 0.0017, seed: int = 0,
+              with_label: bool = True, chunk_size: int = 200_000):
+    """Write a synthetic CSV without holding more than chunk_size rows in memory."""
+    for i, start in enumerate(range(0, n_rows, chunk_size)):
+        chunk = generate_transactions(
+            min(chunk_size, n_rows - start), fraud_rate, seed + i, with_label=with_label, start_id=start,
+        )
+        chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--fraud-rate", type=float, default=0.0017)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-label", action="store_true", help="Leave out the Class column")
+    parser.add_argument("--out", default="synthetic_transactions.csv")
+    args = parser.parse_args()
+
+    write_csv(args.out, args.rows, args.fraud_rate, args.seed, with_label=not args.no_label)
+    print(f"Wrote {args.rows} rows to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import os
+import sys
 import pandas as pd
 import numpy as np
 import joblib
@@ -5,6 +7,10 @@ from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, accuracy_score
 
+# Feature attributions come from the same compiled forest the API explains with
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.services.forest_engine import CompiledForest
+
 def load_data(path: str = "creditcard.csv"):
     df = pd.read_csv(path)
     print(f"Data loaded successfully: {df.shape[0]} rows, {df.shape[1]} columns")
@@ -32,7 +38,7 @@ def preprocess(df: pd.DataFrame):
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
 
-    return X_scaled, y, scaler
+    return X_scaled, y, scaler, list(X.columns)
 
 
 def train_isolation_forest(X_scaled: np.ndarray, y: np.ndarray = None):
@@ -80,7 +86,7 @@ def main():
     SCALER_PATH = "ml_model/scaler.joblib"
 
     df = load_data(DATA_PATH)
-    X_scaled, y, scaler = preprocess(df)
+    X_scaled, y, scaler, feature_names = preprocess(df)
     model = train_isolation_forest(X_scaled, y)
     evaluate_model(model, X_scaled, y)
 
@@ -90,13 +96,17 @@ def main():
     print(f"\nModel saved to {MODEL_PATH}")
     print(f"Scaler saved to {SCALER_PATH}")
 
-    # Optional: show feature importances
-    importance_df = pd.DataFrame({
-        "Feature": [f"V{i}" for i in range(1, 29)] + ["Amount"],
-        "Importance": model.feature_importances_
-    }).sort_values(by="Importance", ascending=False)
-    print("\nTop Features Influencing Anomaly Detection:")
-    print(importance_df.head(10))
+    # IsolationForest has no feature_importances_; average how much each
+    # feature isolated the rows the model flags instead
+    flagged = X_scaled[model.predict(X_scaled) == -1]
+    if len(flagged):
+        attributions = CompiledForest.from_sklearn(model).path_attributions(flagged)
+        importance_df = pd.DataFrame({
+            "Feature": feature_names,
+            "Importance": attributions.mean(axis=0)
+        }).sort_values(by="Importance", ascending=False)
+        print("\nTop Features Influencing Anomaly Detection:")
+        print(importance_df.head(10))
 
 
 if __name__ == "__main__":
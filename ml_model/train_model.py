@@ -1,3 +1,9 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
 import pandas as pd
 import numpy as np
 import joblib
@@ -5,15 +11,29 @@ from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, accuracy_score
 
+# Velocity features are computed by the same engine the API serves with
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.core.config import settings
+from backend.services.drift import reference_histograms
+from backend.services.forest_engine import ARTIFACT_SUFFIX, export_artifact
+from backend.services.model_registry import metadata_path, version_id
+from backend.services.velocity import create_engine_from_settings
+
 def load_data(path: str = "creditcard.csv"):
     df = pd.read_csv(path)
     print(f"Data loaded: {df.shape}")
     return df
 
-def preprocess(df: pd.DataFrame):
+def preprocess(df: pd.DataFrame, velocity: bool = False):
     # Drop nulls if any
     df = df.dropna()
 
+    if velocity:
+        # Replay the transactions in time order, as the API would have seen them
+        if "Time" in df.columns:
+            df = df.sort_values("Time", kind="stable")
+        df = create_engine_from_settings().append_features(df)
+
     # Separate target if available
     if "Class" in df.columns:
         y = df["Class"]
@@ -24,7 +44,7 @@ def preprocess(df: pd.DataFrame):
 
     # Drop non-numeric columns
     for col in X.columns:
-        if pd.api.types.is_datetime64_any_dtype(X[col]) or X[col].dtype == object:
+        if not pd.api.types.is_numeric_dtype(X[col]):
             print(f"Dropping non-numeric column: {col}")
             X = X.drop(columns=[col])
 
@@ -32,21 +52,23 @@ def preprocess(df: pd.DataFrame):
     X_scaled = scaler.fit_transform(X)
     return X_scaled, y, scaler
 
-def train_isolation_forest(X_scaled: np.ndarray, y: np.ndarray = None):
+def train_isolation_forest(X_scaled: np.ndarray, y: np.ndarray = None, n_estimators: int = 100,
+                           n_jobs: int = -1, outlier_fraction: float = None):
     print("Training Isolation Forest...")
-    outlier_fraction = None
-    if y is not None:
+    if outlier_fraction is None and y is not None:
         n_fraud = len(y[y == 1])
         n_valid = len(y[y == 0])
         outlier_fraction = n_fraud / float(n_valid)
+    if outlier_fraction:
         print(f"Outlier fraction: {outlier_fraction:.5f}")
     contamination = outlier_fraction if outlier_fraction else 0.01
 
     model = IsolationForest(
-        n_estimators=100,
+        n_estimators=n_estimators,
         max_samples=len(X_scaled),
         contamination=contamination,
         random_state=42,
+        n_jobs=n_jobs,
         verbose=0
     )
     model.fit(X_scaled)
@@ -62,20 +84,209 @@ def evaluate_model(model, X_scaled, y):
         print("Classification Report:")
         print(classification_report(y, y_pred))
 
+# Out-of-core training: the CSV is only ever read chunk by chunk, so memory
+# scales with the reservoir sample rather than with the dataset.
+
+def iter_chunks(path: str, chunk_size: int, velocity: bool = False):
+    """
+    Yield (X, y) DataFrame/Series pairs per chunk, with preprocess()'s column rules.
+    With velocity, each pass replays the file through a fresh velocity engine,
+    so the file must already be in time order.
+    """
+    columns = None
+    engine = create_engine_from_settings() if velocity else None
+    for chunk in pd.read_csv(path, chunksize=chunk_size):
+        chunk = chunk.dropna()
+        y = chunk.pop("Class") if "Class" in chunk.columns else None
+        if engine is not None:
+            chunk = engine.append_features(chunk)
+        if columns is None:
+            # Decide on the numeric columns once so every chunk has the same layout
+            columns = [col for col in chunk.columns if pd.api.types.is_numeric_dtype(chunk[col])]
+            for col in chunk.columns.difference(columns):
+                print(f"Dropping non-numeric column: {col}")
+        yield chunk[columns], y
+
+def holdout_masks(seed: int, test_size: float):
+    """Per-chunk held-out masks; the same seed gives the same split on every pass."""
+    rng = np.random.default_rng(seed)
+    return lambda n_rows: rng.random(n_rows) < test_size
+
+def reservoir_update(reservoir: np.ndarray, seen: int, rows: np.ndarray, rng: np.random.Generator) -> int:
+    """
+    Add rows to a uniform reservoir sample (Algorithm R, vectorised per chunk).
+    Returns the number of rows seen so far.
+    """
+    size = len(reservoir)
+    fill = min(max(size - seen, 0), len(rows))
+    reservoir[seen:seen + fill] = rows[:fill]
+
+    rest = rows[fill:]
+    if len(rest):
+        # Row number i (0-based, over the whole stream) replaces a random slot with probability size / (i + 1)
+        positions = np.arange(seen + fill, seen + len(rows)) + 1
+        slots = (rng.random(len(rest)) * positions).astype(np.int64)
+        keep = slots < size
+        reservoir[slots[keep]] = rest[keep]
+    return seen + len(rows)
+
+def fit_streaming(path: str, chunk_size: int, sample_size: int, test_size: float, seed: int = 42,
+                  velocity: bool = False):
+    """
+    One pass over the CSV: fit the scaler with partial_fit, count classes and
+    reservoir-sample the training rows. Returns (sample_scaled, scaler, outlier_fraction, n_train).
+    """
+    scaler = StandardScaler()
+    rng = np.random.default_rng(seed)
+    is_holdout = holdout_masks(seed, test_size)
+    reservoir = None
+    seen = n_fraud = n_valid = 0
+
+    for X, y in iter_chunks(path, chunk_size, velocity):
+        train = ~is_holdout(len(X))
+        X_train = X[train]
+        if X_train.empty:
+            continue
+        scaler.partial_fit(X_train)
+        if y is not None:
+            n_fraud += int((y[train] == 1).sum())
+            n_valid += int((y[train] == 0).sum())
+        if reservoir is None:
+            reservoir = np.empty((sample_size, X.shape[1]), dtype=np.float64)
+        seen = reservoir_update(reservoir, seen, X_train.to_numpy(dtype=np.float64), rng)
+
+    if reservoir is None:
+        raise ValueError(f"No training rows found in {path}")
+    sample = pd.DataFrame(reservoir[:min(seen, sample_size)], columns=scaler.feature_names_in_)
+    print(f"Scanned {seen} training rows, sampled {len(sample)}")
+    outlier_fraction = n_fraud / float(n_valid) if n_valid else None
+    return scaler.transform(sample), scaler, outlier_fraction, seen
+
+def evaluate_streaming(model, scaler, path: str, chunk_size: int, test_size: float, seed: int = 42,
+                       velocity: bool = False):
+    """Score the held-out rows chunk by chunk, accumulating only a confusion matrix."""
+    is_holdout = holdout_masks(seed, test_size)
+    confusion = np.zeros((2, 2), dtype=np.int64)
+    for X, y in iter_chunks(path, chunk_size, velocity):
+        holdout = is_holdout(len(X))
+        if y is None or not holdout.any():
+            continue
+        y_pred = (model.predict(scaler.transform(X[holdout])) == -1).astype(np.int64)
+        y_true = y[holdout].to_numpy(dtype=np.int64)
+        confusion += np.bincount(2 * y_true + y_pred, minlength=4).reshape(2, 2)
+
+    total = confusion.sum()
+    if total == 0:
+        print("No labelled held-out rows to evaluate")
+        return confusion
+
+    print("Accuracy:", np.trace(confusion) / total)
+    print("Confusion matrix (rows: actual 0/1, columns: predicted 0/1):")
+    print(confusion)
+    print(f"{'class':>8} {'precision':>10} {'recall':>10} {'f1-score':>10} {'support':>10}")
+    for label in (0, 1):
+        tp = confusion[label, label]
+        predicted = confusion[:, label].sum()
+        support = confusion[label].sum()
+        precision = tp / predicted if predicted else 0.0
+        recall = tp / support if support else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        print(f"{label:>8} {precision:>10.2f} {recall:>10.2f} {f1:>10.2f} {support:>10}")
+    return confusion
+
+def drift_reference(model, scaler, X_scaled: np.ndarray, max_rows: int = 100000) -> dict:
+    """Feature and score histograms of (an even stride through) the training rows, for the API's drift monitor."""
+    sample = X_scaled[::max(1, -(-len(X_scaled) // max_rows))]
+    feature_names = getattr(scaler, "feature_names_in_", [str(i) for i in range(X_scaled.shape[1])])
+    return reference_histograms(sample, model.decision_function(sample), feature_names)
+
+def save_metadata(model, scaler, model_path: str, n_samples: int, velocity: bool = False,
+                  reference: dict = None, versions: dict = None):
+    """
+    Write training metadata next to the model; the API's model registry reads it.
+    versions records which model files it describes ("version" for the joblib pair,
+    "artifact_version" for the .forest), so the registry can tell a finished set
+    of files from one still being replaced.
+    """
+    metadata = {
+        **(versions or {}),
+        "trained_at": datetime.utcnow().isoformat(),
+        "features": [str(name) for name in getattr(scaler, "feature_names_in_", [])],
+        "contamination": model.contamination,
+        "n_estimators": model.n_estimators,
+        "n_samples": int(n_samples),
+    }
+    if velocity:
+        metadata["velocity"] = {"windows": settings.VELOCITY_WINDOWS, "buckets": settings.VELOCITY_BUCKETS}
+    if reference is not None:
+        metadata["drift_reference"] = reference
+    path = metadata_path(model_path)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    print(f"Metadata saved to {path}")
+
+def dump_atomically(obj, path: str):
+    """joblib.dump to a temporary file, then rename it over path."""
+    joblib.dump(obj, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the IsolationForest fraud model")
+    parser.add_argument("--data", default=os.path.join("ml_model", "data", "creditcard.csv"))
+    parser.add_argument("--model", default=os.path.join("ml_model", "model.joblib"))
+    parser.add_argument("--scaler", default=os.path.join("ml_model", "scaler.joblib"))
+    parser.add_argument("--stream", action="store_true",
+                        help="Read the CSV in chunks and train on a reservoir sample instead of loading it all")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--sample-size", type=int, default=100000, help="Reservoir size in --stream mode")
+    parser.add_argument("--test-size", type=float, default=0.2, help="Held-out fraction in --stream mode")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Cores used to build trees (-1 = all)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--artifact", default=None,
+                        help="Where to export the compiled forest artifact (default: the model path with "
+                             f"{ARTIFACT_SUFFIX}; empty to skip)")
+    parser.add_argument("--velocity", action="store_true",
+                        help="Append per-customer velocity features (VELOCITY_WINDOWS); rows must be in time order")
+    return parser.parse_args()
+
 def main():
-    DATA_PATH = "ml_model\data\creditcard.csv"
-    MODEL_PATH = "ml_model/model.joblib"
-    SCALER_PATH = "ml_model/scaler.joblib"
-
-    df = load_data(DATA_PATH)
-    X_scaled, y, scaler = preprocess(df)
-    model = train_isolation_forest(X_scaled, y)
-    evaluate_model(model, X_scaled, y)
-
-    joblib.dump(model, MODEL_PATH)
-    joblib.dump(scaler, SCALER_PATH)
-    print(f"Model saved to {MODEL_PATH}")
-    print(f"Scaler saved to {SCALER_PATH}")
+    args = parse_args()
+    started = time.perf_counter()
+
+    if args.stream:
+        X_scaled, scaler, outlier_fraction, n_train = fit_streaming(
+            args.data, args.chunk_size, args.sample_size, args.test_size, args.seed, args.velocity)
+        model = train_isolation_forest(X_scaled, n_estimators=args.n_estimators, n_jobs=args.n_jobs,
+                                       outlier_fraction=outlier_fraction)
+        evaluate_streaming(model, scaler, args.data, args.chunk_size, args.test_size, args.seed, args.velocity)
+        n_samples = len(X_scaled)
+    else:
+        df = load_data(args.data)
+        X_scaled, y, scaler = preprocess(df, args.velocity)
+        model = train_isolation_forest(X_scaled, y, n_estimators=args.n_estimators, n_jobs=args.n_jobs)
+        evaluate_model(model, X_scaled, y)
+        n_samples = len(X_scaled)
+
+    # Each file is written to a temporary name and renamed, so the API's model watcher never
+    # reads a half-written file; the metadata goes last and settles the new set of files
+    dump_atomically(model, args.model)
+    dump_atomically(scaler, args.scaler)
+    print(f"Model saved to {args.model}")
+    print(f"Scaler saved to {args.scaler}")
+
+    versions = {"version": version_id(args.model, args.scaler)}
+
+    # The flat, memory-mappable copy of model + scaler that API workers can share
+    artifact = os.path.splitext(args.model)[0] + ARTIFACT_SUFFIX if args.artifact is None else args.artifact
+    if artifact:
+        versions["artifact_version"] = export_artifact(model, scaler, artifact)[:12]
+        print(f"Artifact saved to {artifact} ({os.path.getsize(artifact) / 1e6:.1f} MB, "
+              f"{os.path.basename(args.model)} {os.path.getsize(args.model) / 1e6:.1f} MB)")
+    save_metadata(model, scaler, args.model, n_samples, args.velocity, drift_reference(model, scaler, X_scaled),
+                  versions)
+    print(f"Training took {time.perf_counter() - started:.1f}s")
 
 if __name__ == "__main__":
     main()